@@ -5,6 +5,8 @@ from celery import Celery
 # Set the default Django settings module for the 'celery' program.
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
+from config import celery_metrics  # noqa: E402, F401 - подключает сигналы метрик задач после выбора настроек
+
 app = Celery('config')
 
 app.config_from_object('django.conf:settings', namespace='CELERY')
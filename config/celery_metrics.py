@@ -0,0 +1,136 @@
+import logging
+import os
+import threading
+import time
+from functools import partial
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from celery import signals
+from django.conf import settings
+from kombu.exceptions import OperationalError
+from prometheus_client import multiprocess
+
+from config.metrics import CONTENT_TYPE, REGISTRY, multiprocess_dir
+
+logger = logging.getLogger(__name__)
+
+ENQUEUED_AT_HEADER = "enqueued_at"
+
+TASKS_PUBLISHED = REGISTRY.counter("celery_tasks_published", "Количество поставленных в очередь задач.", ("task",))
+TASK_QUEUE_WAIT = REGISTRY.histogram(
+    "celery_task_queue_wait_seconds", "Время от постановки задачи в очередь до начала выполнения.", ("task",)
+)
+TASK_RUNTIME = REGISTRY.histogram(
+    "celery_task_runtime_seconds", "Время выполнения задачи.", ("task", "state"),
+    buckets=(0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0, 1800.0),
+)
+TASK_RETRIES = REGISTRY.counter("celery_task_retries", "Количество повторов задач.", ("task",))
+TASK_FAILURES = REGISTRY.counter(
+    "celery_task_failures", "Количество задач, завершившихся ошибкой.", ("task", "exception")
+)
+TASKS_RUNNING = REGISTRY.gauge(
+    "celery_tasks_running", "Количество выполняемых сейчас задач.", ("task",), multiprocess_mode="livesum"
+)
+QUEUE_DEPTH = REGISTRY.gauge("celery_queue_depth", "Количество сообщений, ожидающих в очереди брокера.", ("queue",))
+
+# Время начала выполнения по ID задачи (task_prerun -> task_postrun)
+task_started_at = {}
+
+
+@signals.before_task_publish.connect
+def record_publish(sender=None, headers=None, **kwargs):
+    """Добавляет в заголовки сообщения время постановки в очередь."""
+    if headers is not None:
+        headers[ENQUEUED_AT_HEADER] = time.time()
+    TASKS_PUBLISHED.inc(task=sender)
+
+
+@signals.task_prerun.connect
+def record_start(sender=None, task_id=None, task=None, **kwargs):
+    task_started_at[task_id] = time.perf_counter()
+    TASKS_RUNNING.inc(task=sender.name)
+    enqueued_at = getattr(task.request, ENQUEUED_AT_HEADER, None)
+    if enqueued_at is not None:
+        TASK_QUEUE_WAIT.observe(max(time.time() - enqueued_at, 0.0), task=sender.name)
+
+
+@signals.task_postrun.connect
+def record_finish(sender=None, task_id=None, state=None, **kwargs):
+    started = task_started_at.pop(task_id, None)
+    TASKS_RUNNING.dec(task=sender.name)
+    if started is not None:
+        TASK_RUNTIME.observe(time.perf_counter() - started, task=sender.name, state=state or "UNKNOWN")
+
+
+@signals.task_retry.connect
+def record_retry(sender=None, **kwargs):
+    TASK_RETRIES.inc(task=sender.name)
+
+
+@signals.task_failure.connect
+def record_failure(sender=None, exception=None, **kwargs):
+    TASK_FAILURES.inc(task=sender.name, exception=type(exception).__name__)
+
+
+def collect_queue_depth(app):
+    """
+    Запрашивает у брокера количество сообщений в каждой очереди приложения.
+
+    Если брокер недоступен или очередь еще не объявлена, значение не обновляется:
+    выдача метрик не должна падать из-за брокера.
+    """
+    with app.connection_for_read() as connection:
+        try:
+            connection.ensure_connection(max_retries=1)
+        except OperationalError:
+            logger.warning("Broker is unavailable, queue depth is not collected")
+            return
+        channel = connection.default_channel
+        for name in app.amqp.queues:
+            try:
+                QUEUE_DEPTH.set(channel.queue_declare(queue=name, passive=True).message_count, queue=name)
+            except Exception as error:
+                logger.warning("Queue depth of %s is not collected: %r", name, error)
+
+
+@signals.worker_process_shutdown.connect
+def mark_worker_process_dead(**kwargs):
+    """Исключает значения завершающегося дочернего процесса prefork из gauge-метрик режима livesum."""
+    if multiprocess_dir():
+        multiprocess.mark_process_dead(os.getpid())
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    """Отдает метрики процесса воркера в текстовом формате Prometheus."""
+
+    def do_GET(self):
+        payload = REGISTRY.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port):
+    """Запускает HTTP-сервер метрик в фоновом потоке и возвращает его."""
+    server = ThreadingHTTPServer(("", port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+@signals.worker_init.connect
+def start_worker_metrics(sender=None, **kwargs):
+    """
+    Отдает метрики воркера на порту WORKER_METRICS_PORT (если задан).
+
+    Для пулов solo и threads задачи выполняются в процессе сервера. Задачи пула prefork
+    выполняются в дочерних процессах, поэтому для него задается PROMETHEUS_MULTIPROC_DIR:
+    дочерние процессы пишут метрики в общий каталог, и сервер выдает их сумму.
+    """
+    REGISTRY.add_collector(partial(collect_queue_depth, sender.app))
+    if settings.WORKER_METRICS_PORT:
+        start_metrics_server(settings.WORKER_METRICS_PORT)
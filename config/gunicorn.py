@@ -0,0 +1,19 @@
+import glob
+import os
+
+from prometheus_client import multiprocess
+
+
+def on_starting(server):
+    """Удаляет файлы метрик прошлого запуска: иначе счетчики продолжат старые значения."""
+    directory = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+        for path in glob.glob(os.path.join(directory, "*.db")):
+            os.remove(path)
+
+
+def child_exit(server, worker):
+    """Исключает значения завершившегося воркера из gauge-метрик режима livesum."""
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,188 @@
+import ipaddress
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import prometheus_client
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, generate_latest, multiprocess
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CONTENT_TYPE = CONTENT_TYPE_LATEST
+
+# Серии *_created не нужны для дашбордов и удваивают объем выдачи
+prometheus_client.disable_created_metrics()
+
+
+def multiprocess_dir():
+    """
+    Возвращает каталог общих файлов метрик или None, если процессы хранят метрики только в памяти.
+
+    Каталог задается переменной окружения PROMETHEUS_MULTIPROC_DIR до запуска процесса:
+    prometheus_client выбирает хранилище значений при импорте.
+    """
+    return os.environ.get("PROMETHEUS_MULTIPROC_DIR") or None
+
+
+# Метрики без меток создают файл значения сразу при объявлении, каталог должен существовать
+if multiprocess_dir():
+    os.makedirs(multiprocess_dir(), exist_ok=True)
+
+
+class Metric:
+    """
+        Метрика prometheus_client с метками, передаваемыми именованными аргументами.
+
+        В режиме нескольких процессов (PROMETHEUS_MULTIPROC_DIR) значения пишутся в файлы
+        процесса в общем каталоге, и выдача метрик суммирует их по всем процессам:
+        воркерам gunicorn и дочерним процессам воркера Celery.
+
+        Атрибуты
+        - name: Имя метрики в формате Prometheus.
+        - documentation: Описание метрики (строка HELP).
+        - labelnames: Имена меток.
+        """
+    metric_class = None
+
+    def __init__(self, name, documentation, labelnames=(), **kwargs):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.metric = self.metric_class(name, documentation, self.labelnames, registry=None, **kwargs)
+
+    def label_values(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def child(self, labels):
+        return self.metric.labels(*self.label_values(labels)) if self.labelnames else self.metric
+
+    def sample_value(self, suffix, labels):
+        """Возвращает значение серии метрики в текущем процессе (0, если серии нет)."""
+        expected = dict(zip(self.labelnames, self.label_values(labels)))
+        for family in self.metric.collect():
+            for sample in family.samples:
+                if sample.name == self.name + suffix and sample.labels == expected:
+                    return sample.value
+        return 0
+
+
+class Counter(Metric):
+    """Монотонно растущий счетчик."""
+    metric_class = prometheus_client.Counter
+
+    def inc(self, amount=1, **labels):
+        self.child(labels).inc(amount)
+
+    def get(self, **labels):
+        return self.sample_value("_total", labels)
+
+
+class Gauge(Metric):
+    """
+        Значение, которое может как расти, так и уменьшаться.
+
+        multiprocess_mode задает объединение значений процессов: "livesum" - сумма по живым
+        процессам, "mostrecent" - последнее записанное значение (для значений из общего источника).
+        """
+    metric_class = prometheus_client.Gauge
+
+    def set(self, value, **labels):
+        self.child(labels).set(value)
+
+    def inc(self, amount=1, **labels):
+        self.child(labels).inc(amount)
+
+    def dec(self, amount=1, **labels):
+        self.child(labels).dec(amount)
+
+    def get(self, **labels):
+        return self.sample_value("", labels)
+
+
+class Histogram(Metric):
+    """Гистограмма распределения значений (например, длительности) по корзинам."""
+    metric_class = prometheus_client.Histogram
+
+    def observe(self, value, **labels):
+        self.child(labels).observe(value)
+
+    @contextmanager
+    def time(self, **labels):
+        """Измеряет длительность блока в секундах."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def get_count(self, **labels):
+        return self.sample_value("_count", labels)
+
+
+class Registry:
+    """
+        Реестр метрик приложения.
+
+        Метрики создаются методами counter, gauge и histogram: повторный вызов с тем же
+        именем возвращает уже зарегистрированную метрику, поэтому модули могут объявлять
+        метрики на уровне модуля без конфликтов при повторном импорте.
+        """
+
+    def __init__(self):
+        self._metrics = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+        self._registry = CollectorRegistry(auto_describe=True)
+
+    def add_collector(self, collector):
+        """Регистрирует функцию, обновляющую метрики перед выдачей (например, значения из общего кеша)."""
+        if collector not in self._collectors:
+            self._collectors.append(collector)
+
+    def register(self, metric_class, name, *args, **kwargs):
+        with self._lock:
+            if name not in self._metrics:
+                metric = self._metrics[name] = metric_class(name, *args, **kwargs)
+                self._registry.register(metric.metric)
+            return self._metrics[name]
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter, name, documentation, labelnames)
+
+    def gauge(self, name, documentation, labelnames=(), multiprocess_mode="mostrecent"):
+        return self.register(Gauge, name, documentation, labelnames, multiprocess_mode=multiprocess_mode)
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def render(self):
+        """Возвращает метрики в текстовом формате Prometheus (в режиме нескольких процессов - по всем процессам)."""
+        for collector in self._collectors:
+            collector()
+        directory = multiprocess_dir()
+        if directory is None:
+            return generate_latest(self._registry).decode()
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry, path=directory)
+        return generate_latest(registry).decode()
+
+
+REGISTRY = Registry()
+
+
+def is_metrics_client_allowed(request):
+    """Проверяет, что адрес клиента входит в одну из сетей настройки METRICS_ALLOWED_NETWORKS."""
+    try:
+        address = ipaddress.ip_address(request.META.get("REMOTE_ADDR", ""))
+    except ValueError:
+        return False
+    return any(address in ipaddress.ip_network(network) for network in settings.METRICS_ALLOWED_NETWORKS)
+
+
+def metrics_view(request):
+    """Отдает метрики в текстовом формате Prometheus адресам из METRICS_ALLOWED_NETWORKS."""
+    if not is_metrics_client_allowed(request):
+        return HttpResponseForbidden()
+    return HttpResponse(REGISTRY.render(), content_type=CONTENT_TYPE)
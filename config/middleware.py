@@ -0,0 +1,158 @@
+import logging
+import random
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from rest_framework.serializers import ListSerializer
+
+from config.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+QUERY_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100, 200, 500)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+IN_LIST_RE = re.compile(r"\(\s*%s(?:\s*,\s*%s)*\s*\)")
+
+REQUEST_DURATION = REGISTRY.histogram(
+    "http_request_duration_seconds", "Полное время обработки запроса.", ("view", "method")
+)
+DB_DURATION = REGISTRY.histogram(
+    "http_request_db_duration_seconds", "Суммарное время SQL-запросов за запрос.", ("view",)
+)
+DB_QUERIES = REGISTRY.histogram(
+    "http_request_db_queries", "Количество SQL-запросов за запрос.", ("view",), buckets=QUERY_BUCKETS
+)
+SERIALIZER_DURATION = REGISTRY.histogram(
+    "http_serializer_duration_seconds", "Время вычисления serializer.data (to_representation) за запрос.", ("view",)
+)
+RENDER_DURATION = REGISTRY.histogram(
+    "http_response_render_duration_seconds", "Время рендеринга готовых данных ответа DRF в JSON.", ("view",)
+)
+RESPONSE_SIZE = REGISTRY.histogram(
+    "http_response_size_bytes", "Размер тела ответа.", ("view",), buckets=SIZE_BUCKETS
+)
+REQUESTS = REGISTRY.counter("http_requests", "Количество обработанных запросов.", ("view", "method", "status"))
+
+
+def query_fingerprint(sql):
+    """Приводит SQL к виду без длины списков IN (...), чтобы одинаковые запросы совпадали."""
+    return IN_LIST_RE.sub("(...)", sql)
+
+
+class QueryRecorder:
+    """Обертка execute_wrapper: считает SQL-запросы, их время и повторы."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.fingerprints = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+            self.fingerprints[query_fingerprint(sql)] += 1
+
+
+class PerformanceMetricsMiddleware:
+    """
+        Собирает метрики производительности запросов по имени представления.
+
+        Для каждого запроса (с вероятностью PERFORMANCE_METRICS_SAMPLE_RATE) записывает
+        в реестр config.metrics количество и время SQL-запросов, время сериализации
+        (сериализаторы с TimedSerializerMixin), время рендеринга ответа DRF в JSON,
+        размер ответа и полное время. Повторяющиеся запросы (N+1) и медленные запросы
+        пишутся в лог. Метрики отдаются эндпоинтом /metrics.
+
+        Включается настройкой PERFORMANCE_METRICS_ENABLED; при выключенной настройке
+        Django исключает middleware из цепочки и накладных расходов нет.
+        """
+
+    def __init__(self, get_response):
+        if not settings.PERFORMANCE_METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.sample_rate = settings.PERFORMANCE_METRICS_SAMPLE_RATE
+        self.duplicate_threshold = settings.PERFORMANCE_DUPLICATE_QUERY_THRESHOLD
+        self.slow_request_seconds = settings.PERFORMANCE_SLOW_REQUEST_SECONDS
+
+    def __call__(self, request):
+        if self.sample_rate < 1 and random.random() >= self.sample_rate:
+            return self.get_response(request)
+
+        recorder = QueryRecorder()
+        request._serializer_duration = 0.0
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+        duration = time.perf_counter() - started
+
+        match = request.resolver_match
+        view = match.view_name if match else "unresolved"
+        REQUEST_DURATION.observe(duration, view=view, method=request.method)
+        DB_DURATION.observe(recorder.duration, view=view)
+        DB_QUERIES.observe(recorder.count, view=view)
+        REQUESTS.inc(view=view, method=request.method, status=response.status_code)
+        if request._serializer_duration:
+            SERIALIZER_DURATION.observe(request._serializer_duration, view=view)
+        render_duration = getattr(response, "_render_duration", None)
+        if render_duration is not None:
+            RENDER_DURATION.observe(render_duration, view=view)
+        if not response.streaming:
+            RESPONSE_SIZE.observe(len(response.content), view=view)
+
+        self.log_duplicates(view, recorder)
+        if duration >= self.slow_request_seconds:
+            logger.warning(
+                "Slow request %s %s (%s): %.3fs, %s queries, %.3fs in DB",
+                request.method, request.path, view, duration, recorder.count, recorder.duration,
+            )
+        return response
+
+    def process_template_response(self, request, response):
+        """Засекает время рендеринга ответа DRF: данные сериализатора к этому моменту уже вычислены."""
+        started = time.perf_counter()
+
+        def record_render_duration(rendered):
+            rendered._render_duration = time.perf_counter() - started
+            return rendered
+
+        response.add_post_render_callback(record_render_duration)
+        return response
+
+    def log_duplicates(self, view, recorder):
+        for fingerprint, count in recorder.fingerprints.items():
+            if count >= self.duplicate_threshold:
+                logger.warning("Duplicate query in %s executed %s times: %s", view, count, fingerprint)
+
+
+class TimedSerializerMixin:
+    """
+        Замеряет время преобразования объектов в данные ответа (serializer.data).
+
+        Время внешнего сериализатора (для many=True - каждого элемента списка) добавляется
+        к запросу, который замеряет PerformanceMetricsMiddleware; вложенные сериализаторы
+        входят во время внешнего. Вне замеряемых запросов таймер не запускается.
+        """
+
+    def to_representation(self, instance):
+        request = getattr(self.context.get("request"), "_request", None)
+        parent = self.parent
+        is_outer = parent is None or (isinstance(parent, ListSerializer) and parent.parent is None)
+        if not is_outer or not hasattr(request, "_serializer_duration"):
+            return super().to_representation(instance)
+        started = time.perf_counter()
+        try:
+            return super().to_representation(instance)
+        finally:
+            request._serializer_duration += time.perf_counter() - started
@@ -3,6 +3,7 @@ import sys
 from datetime import timedelta
 from pathlib import Path
 from celery.schedules import crontab
+from kombu import Queue
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -42,6 +43,21 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "config.middleware.PerformanceMetricsMiddleware",
+]
+
+# Метрики производительности запросов (config.middleware): включение, доля замеряемых запросов,
+# порог повторов одного SQL-запроса и порог медленного запроса (секунды) для записи в лог
+PERFORMANCE_METRICS_ENABLED = os.getenv("PERFORMANCE_METRICS_ENABLED") == "True"
+PERFORMANCE_METRICS_SAMPLE_RATE = float(os.getenv("PERFORMANCE_METRICS_SAMPLE_RATE", 1.0))
+PERFORMANCE_DUPLICATE_QUERY_THRESHOLD = int(os.getenv("PERFORMANCE_DUPLICATE_QUERY_THRESHOLD", 5))
+PERFORMANCE_SLOW_REQUEST_SECONDS = float(os.getenv("PERFORMANCE_SLOW_REQUEST_SECONDS", 1.0))
+
+# Сети, из которых доступна выдача метрик /metrics (через запятую, адреса или CIDR). По умолчанию -
+# только локальный адрес; docker-compose.yml добавляет сети docker, из которых Prometheus снимает app:8000
+METRICS_ALLOWED_NETWORKS = [
+    network.strip() for network in os.getenv("METRICS_ALLOWED_NETWORKS", "127.0.0.1/32,::1/128").split(",")
+    if network.strip()
 ]
 
 ROOT_URLCONF = "config.urls"
@@ -66,7 +82,9 @@ WSGI_APPLICATION = "config.wsgi.application"
 
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
-if "test" in sys.argv:
+# Тесты по умолчанию идут на SQLite; TEST_ON_POSTGRES=1 запускает их на PostgreSQL
+# (нужно для проверки планов запросов и индексов, см. IndexUsageTestCase)
+if "test" in sys.argv and not os.getenv("TEST_ON_POSTGRES"):
     DATABASES = {
         "default": {
             "ENGINE": "django.db.backends.sqlite3",
@@ -132,19 +150,85 @@ REST_FRAMEWORK = {
     ]
 }
 
+# Хосты, ссылки на которые разрешены в поле video_url урока
+YOUTUBE_ALLOWED_HOSTS = ("youtube.com", "www.youtube.com", "m.youtube.com", "youtu.be")
+
+# Размер пачки уроков при массовом импорте (по умолчанию и максимальный)
+LESSON_IMPORT_BATCH_SIZE = 500
+LESSON_IMPORT_MAX_BATCH_SIZE = 5000
+
+# Время хранения в кеше ответов списков и карточек курсов и уроков (секунды)
+MATERIALS_CACHE_TIMEOUT = 300
+
+# Время хранения в кеше отчетов по платежам (секунды); сбрасываются при изменении платежей
+PAYMENTS_REPORT_CACHE_TIMEOUT = 600
+
+# Время хранения в кеше признака членства пользователя в группе модераторов (секунды)
+MODERATORS_CACHE_TIMEOUT = 60
+
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=15),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
 }
 
 STRIPE_API_KEY = os.getenv('STRIPE_API_KEY')
+# Адрес API Stripe (в тестах и при локальной разработке - фейковый сервер)
+STRIPE_API_BASE = os.getenv('STRIPE_API_BASE', 'https://api.stripe.com')
+# Таймаут (в секундах), число повторов сетевых ошибок и размер пула соединений клиента Stripe
+STRIPE_TIMEOUT = float(os.getenv('STRIPE_TIMEOUT', 10))
+STRIPE_MAX_NETWORK_RETRIES = int(os.getenv('STRIPE_MAX_NETWORK_RETRIES', 2))
+STRIPE_POOL_SIZE = int(os.getenv('STRIPE_POOL_SIZE', 10))
+# Время жизни (в секундах) кеша соответствия курс/урок + сумма -> цена Stripe
+STRIPE_PRICE_CACHE_TIMEOUT = 60 * 60 * 24
 
 CELERY_TIMEZONE = TIME_ZONE
 CELERY_TASK_TRACK_STARTED = True
 CELERY_TASK_TIME_LIMIT = 30 * 60
 
+# Очереди задач: рассылки, обслуживающие задачи и платежи обрабатываются разными воркерами
+# (см. docker-compose.yml), поэтому медленный SMTP не задерживает платежи и ночные задачи.
+# Передача outbox выполняется отдельным воркером, чтобы не ждать поставленные ею же рассылки
+CELERY_TASK_DEFAULT_QUEUE = "default"
+CELERY_TASK_QUEUES = (
+    Queue("default"),
+    Queue("notifications"),
+    Queue("outbox"),
+    Queue("maintenance"),
+    Queue("payments"),
+)
+CELERY_TASK_ROUTES = {
+    "materials.tasks.send_course_update_email": {"queue": "notifications"},
+    "materials.tasks.notify_course_subscribers": {"queue": "notifications"},
+    "materials.tasks.relay_notification_outbox": {"queue": "outbox"},
+    "materials.tasks.deactivate_inactive_users": {"queue": "maintenance"},
+    "users.tasks.*": {"queue": "payments"},
+}
+# Подтверждение сообщения после выполнения задачи: при падении воркера задача вернется в очередь.
+# Все задачи допускают повторный запуск (прогресс в кеше, ключи идемпотентности Stripe)
+CELERY_TASK_ACKS_LATE = True
+CELERY_TASK_REJECT_ON_WORKER_LOST = True
+# Redis возвращает в очередь неподтвержденное сообщение через visibility_timeout секунд, даже если
+# задача еще выполняется. Значение должно быть больше самой долгой задачи: пулы threads и solo
+# не прерывают задачи по CELERY_TASK_TIME_LIMIT, поэтому рассылка сама ограничивает время
+# выполнения (NOTIFICATION_TASK_TIME_BUDGET)
+CELERY_BROKER_TRANSPORT_OPTIONS = {
+    "visibility_timeout": int(os.getenv("CELERY_VISIBILITY_TIMEOUT", 2 * 60 * 60)),
+}
+# Сколько сообщений каждый поток/процесс воркера забирает заранее
+CELERY_WORKER_PREFETCH_MULTIPLIER = int(os.getenv("CELERY_WORKER_PREFETCH_MULTIPLIER", 1))
+# Ограничения частоты запуска задач на воркер (лимиты SMTP-сервера и API Stripe). Celery ограничивает
+# частоту отдельных задач, а не очередей: пропускная способность очереди задается числом потоков
+# и prefetch ее воркера (docker-compose.yml)
+CELERY_TASK_ANNOTATIONS = {
+    "materials.tasks.send_course_update_email": {"rate_limit": os.getenv("NOTIFICATION_EMAIL_RATE_LIMIT", "10/s")},
+    "materials.tasks.notify_course_subscribers": {"rate_limit": os.getenv("NOTIFICATION_BATCH_RATE_LIMIT", "60/m")},
+    "users.tasks.create_checkout_session": {"rate_limit": os.getenv("PAYMENTS_TASK_RATE_LIMIT", "20/s")},
+}
+
 
 CELERY_BROKER_URL = os.getenv("CELERY_BROKER_URL")
+# Порт HTTP-сервера метрик воркера Celery (config.celery_metrics); пусто - сервер не запускается
+WORKER_METRICS_PORT = int(os.getenv("WORKER_METRICS_PORT") or 0) or None
 CELERY_RESULT_BACKEND = os.getenv("CELERY_RESULT_BACKEND")
 
 EMAIL_HOST = os.getenv('EMAIL_HOST')
@@ -153,17 +237,51 @@ EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER')
 EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD')
 EMAIL_USE_TLS = True
 EMAIL_USE_SSL = False
+# Таймаут (в секундах) операций SMTP: медленный сервер не должен держать поток воркера бесконечно
+EMAIL_TIMEOUT = int(os.getenv("EMAIL_TIMEOUT", 10))
+# Сколько секунд поток воркера переиспользует открытое SMTP-соединение (materials.mailing)
+EMAIL_CONNECTION_MAX_AGE = int(os.getenv("EMAIL_CONNECTION_MAX_AGE", 300))
+
+# Размер пачки писем, отправляемых через одно SMTP-соединение при рассылке об обновлении курса
+COURSE_UPDATE_EMAIL_BATCH_SIZE = int(os.getenv("COURSE_UPDATE_EMAIL_BATCH_SIZE", 100))
+# Время (в секундах), после которого рассылка передает оставшиеся письма новой задаче. Проверяется
+# между пачками, поэтому вместе с пачкой (до BATCH_SIZE * EMAIL_TIMEOUT) должно быть меньше visibility_timeout
+NOTIFICATION_TASK_TIME_BUDGET = int(os.getenv("NOTIFICATION_TASK_TIME_BUDGET", 20 * 60))
+
+# Количество строк, читаемых из БД за раз при потоковой выгрузке платежей
+PAYMENTS_EXPORT_CHUNK_SIZE = int(os.getenv("PAYMENTS_EXPORT_CHUNK_SIZE", 2000))
+
+# Пачка и пауза (в секундах) между UPDATE при ночной деактивации неактивных пользователей
+DEACTIVATE_USERS_BATCH_SIZE = int(os.getenv("DEACTIVATE_USERS_BATCH_SIZE", 1000))
+DEACTIVATE_USERS_BATCH_PAUSE = float(os.getenv("DEACTIVATE_USERS_BATCH_PAUSE", 0.1))
+
+# Пачка записей outbox, передаваемых в Celery за одну транзакцию, и интервал (в секундах) запуска передачи
+NOTIFICATION_OUTBOX_BATCH_SIZE = int(os.getenv("NOTIFICATION_OUTBOX_BATCH_SIZE", 500))
+NOTIFICATION_OUTBOX_RELAY_INTERVAL = int(os.getenv("NOTIFICATION_OUTBOX_RELAY_INTERVAL", 5))
 
 CELERY_BEAT_SCHEDULE = {
+    'relay-notification-outbox': {
+        'task': 'materials.tasks.relay_notification_outbox',
+        'schedule': timedelta(seconds=NOTIFICATION_OUTBOX_RELAY_INTERVAL),
+        # Не выполненный до следующего запуска вызов отбрасывается, а не копится в очереди
+        'options': {'expires': NOTIFICATION_OUTBOX_RELAY_INTERVAL},
+    },
     'deactivate-inactive-users-every-day': {
         'task': 'materials.tasks.deactivate_inactive_users',
         'schedule': crontab(hour=0, minute=0),  # каждый день в полночь
     },
 }
 
-CACHES = {
-    "default": {
-        "BACKEND": "django.core.cache.backends.redis.RedisCache",
-        "LOCATION": "redis://127.0.0.1:6379/1",
+if "test" in sys.argv:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": "redis://127.0.0.1:6379/1",
+        }
     }
-}
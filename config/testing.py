@@ -0,0 +1,59 @@
+from unittest import skipUnless
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+
+
+class QueryBudgetMixin:
+    """
+        Проверка числа SQL-запросов маршрута для тестов APITestCase.
+
+        Бюджет задается точным числом запросов: тест падает, если изменение
+        добавляет запросы на каждую строку или меняет план выборки.
+        """
+
+    def assertBudget(self, method, url, num_queries, data=None, expected_status=status.HTTP_200_OK):
+        """Выполняет запрос клиентом теста и проверяет число SQL-запросов и статус ответа."""
+        with self.assertNumQueries(num_queries):
+            response = getattr(self.client, method)(url, data=data)
+        self.assertEqual(response.status_code, expected_status)
+        return response
+
+
+requires_postgresql = skipUnless(
+    connection.vendor == "postgresql", "Планы запросов проверяются на PostgreSQL (TEST_ON_POSTGRES=1)"
+)
+
+
+class IndexUsageMixin:
+    """
+        Проверка, что реальные запросы эндпоинтов и задач могут использовать индексы миграций.
+
+        Запрос перехватывается при выполнении кода, затем для него строится EXPLAIN
+        с запретом последовательного сканирования: на маленьких тестовых таблицах
+        PostgreSQL иначе выбирает seq scan, и план не показывает, подходит ли индекс.
+        """
+
+    @staticmethod
+    def analyze(*models):
+        """Обновляет статистику таблиц после наполнения, иначе планировщик оценивает их как пустые."""
+        with connection.cursor() as cursor:
+            for model in models:
+                cursor.execute(f"ANALYZE {connection.ops.quote_name(model._meta.db_table)}")
+
+    def capture_query(self, fragment, func, *args, **kwargs):
+        """Выполняет func и возвращает первый SQL-запрос, содержащий fragment."""
+        with CaptureQueriesContext(connection) as queries:
+            func(*args, **kwargs)
+        for query in queries:
+            if fragment in query["sql"]:
+                return query["sql"]
+        self.fail(f"Запрос с {fragment!r} не выполнялся: {[query['sql'] for query in queries]}")
+
+    def assertUsesIndex(self, sql, index_name):
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off")
+            cursor.execute(f"EXPLAIN {sql}")
+            plan = "\n".join(row[0] for row in cursor.fetchall())
+        self.assertIn(index_name, plan, plan)
@@ -5,6 +5,8 @@ from rest_framework import permissions
 from drf_yasg.views import get_schema_view
 from drf_yasg import openapi
 
+from config.metrics import metrics_view
+
 schema_view = get_schema_view(
     openapi.Info(
         title="API Documentation",
@@ -22,6 +24,7 @@ urlpatterns = [
     path("admin/", admin.site.urls),
     path("", include("materials.urls", namespace="materials")),
     path("users/", include("users.urls", namespace="users")),
+    path("metrics", metrics_view, name="metrics"),
 
     path('swagger<format>/', schema_view.without_ui(cache_timeout=0), name='schema-json'),
     path('swagger/', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
@@ -0,0 +1,169 @@
+import codecs
+import json
+import re
+from collections import Counter
+
+from django.db import transaction
+
+from materials.cache import bump_course_version
+from materials.models import Course, Lesson
+from materials.serializers import LessonImportSerializer
+from materials.services import change_course_counter
+from materials.utils import batched
+from materials.validators import extract_youtube_video_id
+
+CHUNK_SIZE = 64 * 1024
+WHITESPACE = re.compile(r"\s*")
+
+
+def iter_text(stream, chunk_size=CHUNK_SIZE):
+    """Читает поток байтов частями и декодирует их как UTF-8."""
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    while chunk := stream.read(chunk_size):
+        if text := decoder.decode(chunk):
+            yield text
+    if text := decoder.decode(b"", final=True):
+        yield text
+
+
+def iter_ndjson(stream):
+    """
+    Потоково разбирает NDJSON: по одному JSON-объекту в строке.
+
+    Строки с ошибкой разбора возвращаются как исключение json.JSONDecodeError,
+    чтобы вызывающий код мог записать ошибку строки и продолжить импорт.
+    """
+    tail = ""
+    for text in iter_text(stream):
+        lines = (tail + text).split("\n")
+        tail = lines.pop()
+        for line in lines:
+            if line.strip():
+                yield parse_json_line(line)
+    if tail.strip():
+        yield parse_json_line(tail)
+
+
+def parse_json_line(line):
+    try:
+        return json.loads(line)
+    except json.JSONDecodeError as error:
+        return error
+
+
+def is_value_complete(buffer, end):
+    """Проверяет, что разобранное значение не может продолжиться в следующей части потока."""
+    return buffer[end - 1] in '}]"' or (end < len(buffer) and buffer[end] in ",] \t\r\n")
+
+
+def iter_json_array(stream):
+    """
+    Потоково разбирает JSON-массив, не загружая весь документ в память.
+
+    Исключения
+    - ValueError: Если документ не является корректным JSON-массивом.
+    """
+    decoder = json.JSONDecoder()
+    chunks = iter_text(stream)
+    buffer, position, eof = "", 0, False
+    state = "start"
+    while True:
+        position = WHITESPACE.match(buffer, position).end()
+        if position == len(buffer):
+            chunk = next(chunks, None)
+            if chunk is None:
+                raise ValueError("Неожиданный конец JSON-массива.")
+            buffer, position = chunk, 0
+            continue
+        char = buffer[position]
+        if state == "start":
+            if char != "[":
+                raise ValueError("Ожидается JSON-массив.")
+            position += 1
+            state = "first"
+        elif state in ("first", "separator") and char == "]":
+            return
+        elif state == "separator":
+            if char != ",":
+                raise ValueError(f"Ожидается ',' или ']', получено {char!r}.")
+            position += 1
+            state = "value"
+        else:
+            try:
+                row, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                row, end = None, None
+            if end is None or (not eof and not is_value_complete(buffer, end)):
+                chunk = next(chunks, None)
+                if chunk is None:
+                    if end is None:
+                        raise ValueError("Некорректный JSON-массив.")
+                    eof = True
+                else:
+                    buffer, position = buffer[position:] + chunk, 0
+                continue
+            yield row
+            position = end
+            state = "separator"
+
+
+def import_lessons(rows, owner, batch_size):
+    """
+    Валидирует и создает уроки пачками.
+
+    Каждая пачка проверяется одним запросом к курсам и сохраняется bulk_create
+    в отдельной транзакции, поэтому в памяти находится не больше batch_size строк.
+    bulk_create не отправляет post_save, поэтому счетчики и кеш курсов обновляются здесь.
+
+    Аргументы
+    - rows: Итерируемый объект со словарями уроков (или исключениями разбора строки).
+    - owner (User): Владелец создаваемых уроков.
+    - batch_size (int): Размер пачки.
+
+    Результат
+    - dict: {"created": int, "errors": [{"index": int, "errors": ...}]}, а при ошибке
+      разбора потока еще и "detail" (уже сохраненные пачки остаются в базе).
+    """
+    result = {"created": 0, "errors": []}
+    try:
+        for batch in batched(enumerate(rows), batch_size):
+            result["created"] += import_batch(batch, owner, batch_size, result["errors"])
+    except ValueError as error:
+        result["detail"] = str(error)
+    return result
+
+
+def import_batch(batch, owner, batch_size, errors):
+    """Валидирует и сохраняет одну пачку уроков, возвращает количество созданных."""
+    course_ids = set()
+    for _, row in batch:
+        if isinstance(row, dict):
+            try:
+                course_ids.add(int(row.get("course")))
+            except (TypeError, ValueError):
+                pass
+    context = {"course_ids": set(Course.objects.filter(pk__in=course_ids).values_list("pk", flat=True))}
+    lessons = []
+    for index, row in batch:
+        if not isinstance(row, dict):
+            message = str(row) if isinstance(row, json.JSONDecodeError) else "Ожидается JSON-объект."
+            errors.append({"index": index, "errors": {"non_field_errors": [message]}})
+            continue
+        serializer = LessonImportSerializer(data=row, context=context)
+        if not serializer.is_valid():
+            errors.append({"index": index, "errors": serializer.errors})
+            continue
+        data = dict(serializer.validated_data)
+        # bulk_create не вызывает Lesson.save, поэтому ID видео вычисляется здесь
+        data["video_id"] = extract_youtube_video_id(data.get("video_url"))
+        lessons.append(Lesson(course_id=data.pop("course"), owner=owner, **data))
+    if not lessons:
+        return 0
+    created_per_course = Counter(lesson.course_id for lesson in lessons)
+    with transaction.atomic():
+        Lesson.objects.bulk_create(lessons, batch_size=batch_size)
+        for course_id, count in created_per_course.items():
+            change_course_counter(course_id, "lesson_count", count)
+    for course_id in created_per_course:
+        bump_course_version(course_id)
+    return len(lessons)
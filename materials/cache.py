@@ -0,0 +1,127 @@
+import time
+from functools import partial
+
+from django.core.cache import cache
+from django.db import transaction
+
+from config.metrics import REGISTRY
+
+CATALOG_VERSION_KEY = "materials:catalog:version"
+CACHE_HITS_KEY = "materials:cache:hits"
+CACHE_MISSES_KEY = "materials:cache:misses"
+
+CACHE_HITS = REGISTRY.gauge("materials_cache_hits", "Попадания в кеш ответов materials (все процессы).")
+CACHE_MISSES = REGISTRY.gauge("materials_cache_misses", "Промахи кеша ответов materials (все процессы).")
+
+
+def course_version_key(course_id):
+    """Возвращает ключ версии закешированных данных курса."""
+    return f"materials:course:{course_id}:version"
+
+
+def lesson_version_key(lesson_id):
+    """Возвращает ключ версии закешированного ответа урока."""
+    return f"materials:lesson:{lesson_id}:version"
+
+
+def initial_version():
+    """
+    Возвращает начальное значение версии - текущее время в наносекундах.
+
+    Ключ версии может быть вытеснен из Redis. Версия, созданная заново, больше любой
+    выданной раньше (увеличений меньше, чем прошло наносекунд), поэтому записи,
+    сохраненные под старыми версиями, не будут отданы повторно.
+    """
+    return time.time_ns()
+
+
+def get_version(key):
+    """Возвращает текущую версию по ключу, создавая ее при первом обращении."""
+    version = cache.get(key)
+    if version is None:
+        seed = initial_version()
+        cache.add(key, seed, None)
+        version = cache.get(key, seed)
+    return version
+
+
+def bump_version(key):
+    """Увеличивает версию, делая недействительными все ключи, построенные на ней."""
+    cache.add(key, initial_version(), None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, initial_version(), None)
+
+
+def get_course_version(course_id):
+    return get_version(course_version_key(course_id))
+
+
+def get_lesson_version(lesson_id):
+    return get_version(lesson_version_key(lesson_id))
+
+
+def get_catalog_version():
+    return get_version(CATALOG_VERSION_KEY)
+
+
+def bump_versions(*keys):
+    """
+    Увеличивает версии после фиксации текущей транзакции (сразу, если транзакции нет).
+
+    Если увеличить версию до COMMIT, параллельный запрос успеет прочитать старые
+    данные и сохранить их в кеше под новой версией.
+    """
+    transaction.on_commit(partial(_bump_versions, keys))
+
+
+def _bump_versions(keys):
+    for key in keys:
+        bump_version(key)
+
+
+def bump_course_version(course_id):
+    """Сбрасывает кеш курса и всех списков каталога."""
+    bump_versions(course_version_key(course_id), CATALOG_VERSION_KEY)
+
+
+def bump_lesson_version(lesson_id):
+    """Сбрасывает кеш ответа урока."""
+    bump_versions(lesson_version_key(lesson_id))
+
+
+def increment_counter(key):
+    if not cache.add(key, 1, None):
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 1, None)
+
+
+def get_cache_stats():
+    """
+    Возвращает счетчики попаданий и промахов кеша ответов materials.
+
+    Результат
+    - dict: {"hits": int, "misses": int}
+    """
+    stats = cache.get_many([CACHE_HITS_KEY, CACHE_MISSES_KEY])
+    return {"hits": stats.get(CACHE_HITS_KEY, 0), "misses": stats.get(CACHE_MISSES_KEY, 0)}
+
+
+def get_cached(key):
+    """Читает значение из кеша ответов и учитывает попадание или промах."""
+    value = cache.get(key)
+    increment_counter(CACHE_MISSES_KEY if value is None else CACHE_HITS_KEY)
+    return value
+
+
+def collect_cache_metrics():
+    """Переносит счетчики кеша ответов из общего кеша в метрики процесса."""
+    stats = get_cache_stats()
+    CACHE_HITS.set(stats["hits"])
+    CACHE_MISSES.set(stats["misses"])
+
+
+REGISTRY.add_collector(collect_cache_metrics)
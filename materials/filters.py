@@ -0,0 +1,17 @@
+from rest_framework.filters import OrderingFilter
+
+
+class StableOrderingFilter(OrderingFilter):
+    """
+        Сортировка по параметру ?ordering с id последним ключом.
+
+        Без него строки с одинаковым значением (например, subscriber_count) идут в
+        произвольном порядке, и между страницами объекты повторяются или пропадают.
+        Порядок (-subscriber_count, id) совпадает с индексом course_popularity_idx.
+        """
+
+    def get_ordering(self, request, queryset, view):
+        ordering = super().get_ordering(request, queryset, view)
+        if ordering and not {"id", "-id", "pk", "-pk"}.intersection(ordering):
+            ordering = [*ordering, "id"]
+        return ordering
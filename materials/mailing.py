@@ -0,0 +1,150 @@
+import logging
+import smtplib
+import threading
+import time
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from config.metrics import REGISTRY
+
+NOTIFICATION_FROM_EMAIL = 'noreply@yourdomain.com'
+SENT = "sent"
+FAILED = "failed"
+
+MAIL_MESSAGES = REGISTRY.counter("mail_messages", "Количество писем по статусу доставки.", ("status",))
+MAIL_SEND_DURATION = REGISTRY.histogram("mail_send_duration_seconds", "Время отправки одного письма.")
+
+logger = logging.getLogger(__name__)
+
+# Соединение с почтовым сервером для каждого потока воркера (пулы solo/threads/prefork)
+local = threading.local()
+
+
+def course_update_message(course_title, update_type):
+    """Возвращает тему и текст письма об обновлении курса."""
+    return (
+        f'Обновление курса: {course_title}',
+        f'В вашем курсе "{course_title}" появилось новое обновление: {update_type}.',
+    )
+
+
+class CourseUpdateTemplate:
+    """
+        Письмо об обновлении курса, сформированное один раз для всей рассылки.
+
+        Тема и текст не зависят от получателя, поэтому для каждого адреса
+        создается только EmailMessage с готовыми строками.
+
+        Атрибуты
+        - subject: Тема письма.
+        - body: Текст письма.
+        - from_email: Адрес отправителя.
+        """
+
+    def __init__(self, course_title, update_type, from_email=NOTIFICATION_FROM_EMAIL):
+        self.subject, self.body = course_update_message(course_title, update_type)
+        self.from_email = from_email
+
+    def personalize(self, recipient):
+        return EmailMessage(self.subject, self.body, self.from_email, [recipient])
+
+
+def get_pooled_connection():
+    """
+    Возвращает открытое соединение с почтовым сервером для текущего потока.
+
+    Соединение (для SMTP - сессия с TLS и авторизацией) открывается один раз
+    и переиспользуется задачами потока, пока не станет старше EMAIL_CONNECTION_MAX_AGE
+    секунд: серверы закрывают долго простаивающие сессии.
+    """
+    connection = getattr(local, "connection", None)
+    if connection is None or time.monotonic() - local.opened_at > settings.EMAIL_CONNECTION_MAX_AGE:
+        close_pooled_connection()
+        connection = get_connection()
+        connection.open()
+        local.connection = connection
+        local.opened_at = time.monotonic()
+    return connection
+
+
+def close_pooled_connection():
+    connection = getattr(local, "connection", None)
+    local.connection = None
+    if connection is not None:
+        try:
+            connection.close()
+        except (smtplib.SMTPException, OSError):
+            pass
+
+
+@receiver(setting_changed)
+def reset_pooled_connection(setting, **kwargs):
+    if setting.startswith("EMAIL_"):
+        close_pooled_connection()
+
+
+def is_permanent_error(error):
+    """
+    Ошибки, относящиеся к конкретному письму, повтор которого не поможет.
+
+    Отказ по адресам постоянный, только если все адреса отклонены кодом 5xx: код 4xx
+    (ящик переполнен, greylisting) временный. Отказ отправителя относится ко всей
+    рассылке, поэтому задача должна повторить отправку, а не помечать письма.
+    """
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in error.recipients.values())
+    if isinstance(error, smtplib.SMTPSenderRefused):
+        return False
+    return isinstance(error, smtplib.SMTPResponseException) and error.smtp_code >= 500
+
+
+def send_pooled_message(message):
+    """Отправляет письмо через соединение потока; при разрыве соединения переподключается один раз."""
+    try:
+        return get_pooled_connection().send_messages([message])
+    except smtplib.SMTPServerDisconnected:
+        close_pooled_connection()
+        return get_pooled_connection().send_messages([message])
+
+
+def deliver(messages, connection=None, results=None):
+    """
+    Отправляет письма по одному через общее соединение и возвращает статус каждого.
+
+    Отказ сервера принять конкретное письмо (неверный адрес, код 5xx) записывается
+    в статус письма, остальные письма продолжают отправляться. Временные ошибки
+    (код 4xx, отказ отправителя, недоступность сервера) пробрасываются, чтобы задача
+    выполнила повтор.
+
+    Аргументы
+    - messages (Iterable[EmailMessage]): Письма для отправки.
+    - connection: Соединение почтового бэкенда (по умолчанию - соединение потока).
+    - results (list): Список, в который добавляются статусы. Если отправка прервана
+      исключением, в нем остаются статусы уже обработанных писем.
+
+    Результат
+    - list[dict]: {"to": str, "status": "sent" | "failed", "error": str | None} для каждого письма.
+
+    Исключения
+    - smtplib.SMTPException, OSError: Временная ошибка почтового сервера.
+    """
+    results = [] if results is None else results
+    for message in messages:
+        recipient = ", ".join(message.to)
+        started = time.perf_counter()
+        try:
+            sent = connection.send_messages([message]) if connection is not None else send_pooled_message(message)
+        except (smtplib.SMTPException, OSError) as error:
+            if not is_permanent_error(error):
+                raise
+            logger.warning("Mail to %s was rejected: %r", recipient, error)
+            result = {"to": recipient, "status": FAILED, "error": repr(error)}
+        else:
+            result = {"to": recipient, "status": SENT if sent else FAILED, "error": None}
+        MAIL_SEND_DURATION.observe(time.perf_counter() - started)
+        MAIL_MESSAGES.inc(status=result["status"])
+        results.append(result)
+    return results
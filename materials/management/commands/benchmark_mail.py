@@ -0,0 +1,66 @@
+import time
+from io import StringIO
+
+from django.core.mail import get_connection, send_mail
+from django.core.management.base import BaseCommand
+
+from materials.mailing import NOTIFICATION_FROM_EMAIL, SENT, CourseUpdateTemplate, course_update_message, deliver
+
+BACKENDS = {
+    "locmem": "django.core.mail.backends.locmem.EmailBackend",
+    "console": "django.core.mail.backends.console.EmailBackend",
+    "smtp": "django.core.mail.backends.smtp.EmailBackend",
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare per-message send_mail with the pooled templated delivery of materials.mailing. "
+        "For SMTP run a local debugging server, e.g. `python -m aiosmtpd -n -l localhost:1025`."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--backend", choices=BACKENDS, default="locmem", help="Mail backend to benchmark")
+        parser.add_argument("--count", type=int, default=200, help="Messages sent by each strategy")
+        parser.add_argument("--host", default="localhost", help="SMTP host (smtp backend only)")
+        parser.add_argument("--port", type=int, default=1025, help="SMTP port (smtp backend only)")
+        parser.add_argument("--tls", action="store_true", help="Use STARTTLS (smtp backend only)")
+
+    def handle(self, *args, **options):
+        self.backend = BACKENDS[options["backend"]]
+        if options["backend"] == "smtp":
+            self.backend_options = {
+                "host": options["host"], "port": options["port"], "use_tls": options["tls"], "use_ssl": False,
+            }
+        elif options["backend"] == "console":
+            self.backend_options = {"stream": StringIO()}
+        else:
+            self.backend_options = {}
+
+        recipients = [f"user{i}@example.com" for i in range(options["count"])]
+        for name, strategy in (("send_mail", self.send_per_message), ("pooled", self.send_pooled)):
+            started = time.perf_counter()
+            sent = strategy(recipients)
+            duration = time.perf_counter() - started
+            self.stdout.write(
+                f"{name}: {sent}/{len(recipients)} sent in {duration:.3f}s "
+                f"({len(recipients) / duration:.1f} messages/s)"
+            )
+
+    def send_per_message(self, recipients):
+        """Прежний способ: тема и текст формируются и соединение открывается для каждого письма."""
+        sent = 0
+        for recipient in recipients:
+            subject, message = course_update_message("Benchmark", "курс")
+            sent += send_mail(
+                subject, message, NOTIFICATION_FROM_EMAIL, [recipient],
+                connection=get_connection(self.backend, **self.backend_options),
+            )
+        return sent
+
+    def send_pooled(self, recipients):
+        """Письмо формируется один раз, все письма уходят через одно открытое соединение."""
+        template = CourseUpdateTemplate("Benchmark", "курс")
+        with get_connection(self.backend, **self.backend_options) as connection:
+            results = deliver((template.personalize(recipient) for recipient in recipients), connection)
+        return sum(result["status"] == SENT for result in results)
@@ -0,0 +1,55 @@
+import re
+import time
+
+from django.core.management.base import BaseCommand
+
+from materials.validators import (
+    SHORT_LINK_HOSTS, SHORT_LINK_PATTERN, URL_RE, VIDEO_ID_PATTERNS, extract_youtube_video_id, get_allowed_hosts,
+)
+
+URLS = (
+    "https://www.youtube.com/watch?v=dQw4w9WgXcQ",
+    "https://m.youtube.com/watch?feature=share&v=dQw4w9WgXcQ",
+    "youtu.be/dQw4w9WgXcQ?t=10",
+    "https://www.youtube.com/embed/dQw4w9WgXcQ",
+    "https://youtube.com/shorts/dQw4w9WgXcQ",
+    "https://example.com/watch?v=dQw4w9WgXcQ",
+)
+
+
+def extract_per_call(url):
+    """Прежний способ: регулярные выражения компилируются при каждом вызове."""
+    match = re.compile(URL_RE.pattern, URL_RE.flags).match(url or "")
+    if match is None:
+        return None
+    host = match["host"].lower()
+    if host not in get_allowed_hosts():
+        return None
+    rest = match["rest"] or ""
+    patterns = (SHORT_LINK_PATTERN,) if host in SHORT_LINK_HOSTS else VIDEO_ID_PATTERNS
+    for pattern in patterns:
+        video_match = re.compile(pattern.pattern, pattern.flags).match(rest)
+        if video_match:
+            return video_match["video_id"]
+    return None
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare extract_youtube_video_id with precompiled patterns against compiling them on every call. "
+        "re.compile keeps its own small cache, so the difference is the cost of that lookup and argument checks."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--count", type=int, default=10000, help="Iterations over the sample URLs")
+
+    def handle(self, *args, **options):
+        count = options["count"]
+        for name, extract in (("per-call re.compile", extract_per_call), ("precompiled", extract_youtube_video_id)):
+            started = time.perf_counter()
+            for _ in range(count):
+                for url in URLS:
+                    extract(url)
+            duration = time.perf_counter() - started
+            calls = count * len(URLS)
+            self.stdout.write(f"{name}: {calls} calls in {duration:.3f}s ({calls / duration:.0f} calls/s)")
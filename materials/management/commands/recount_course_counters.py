@@ -0,0 +1,65 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from materials.cache import bump_course_version
+from materials.models import Course, Lesson, Subscription
+from materials.utils import batched
+
+
+def count_subquery(model):
+    """Возвращает подзапрос с количеством объектов модели для курса."""
+    return Coalesce(
+        Subquery(
+            model.objects.filter(course=OuterRef("pk"))
+            .order_by()
+            .values("course")
+            .annotate(total=Count("pk"))
+            .values("total")
+        ),
+        0,
+    )
+
+
+class Command(BaseCommand):
+    help = "Recount denormalized course counters (lesson_count, subscriber_count) and report drift"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true", help="Only report drift, do not fix it")
+        parser.add_argument("--batch-size", type=int, default=1000, help="Courses updated per UPDATE")
+
+    def handle(self, *args, **options):
+        drifted = (
+            Course.objects.annotate(
+                actual_lessons=count_subquery(Lesson),
+                actual_subscribers=count_subquery(Subscription),
+            )
+            .filter(~Q(lesson_count=F("actual_lessons")) | ~Q(subscriber_count=F("actual_subscribers")))
+            .order_by("pk")
+            .values_list("pk", "lesson_count", "actual_lessons", "subscriber_count", "actual_subscribers")
+        )
+
+        total = 0
+        for batch in batched(drifted.iterator(chunk_size=options["batch_size"]), options["batch_size"]):
+            total += len(batch)
+            for pk, lesson_count, actual_lessons, subscriber_count, actual_subscribers in batch:
+                self.stdout.write(
+                    f"Course {pk}: lesson_count {lesson_count} -> {actual_lessons}, "
+                    f"subscriber_count {subscriber_count} -> {actual_subscribers}"
+                )
+            if options["dry_run"]:
+                continue
+            ids = [row[0] for row in batch]
+            Course.objects.filter(pk__in=ids).update(
+                lesson_count=count_subquery(Lesson),
+                subscriber_count=count_subquery(Subscription),
+            )
+            for pk in ids:
+                bump_course_version(pk)
+
+        if not total:
+            self.stdout.write(self.style.SUCCESS("No drift found."))
+        elif options["dry_run"]:
+            self.stdout.write(self.style.WARNING(f"Drift found in {total} course(s)."))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Fixed drift in {total} course(s)."))
@@ -0,0 +1,28 @@
+# Generated by Django 5.1.7 on 2026-10-17 22:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("materials", "0005_subscription_is_active"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="course",
+            name="last_notified_at",
+            field=models.DateTimeField(
+                blank=True,
+                editable=False,
+                null=True,
+                verbose_name="Дата последней рассылки",
+            ),
+        ),
+        migrations.AddField(
+            model_name="course",
+            name="last_updated",
+            field=models.DateTimeField(auto_now=True, verbose_name="Дата обновления"),
+        ),
+    ]
@@ -0,0 +1,21 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("materials", "0006_course_last_updated_last_notified_at"),
+    ]
+
+    operations = [
+        migrations.RenameField(
+            model_name="course",
+            old_name="last_updated",
+            new_name="updated_at",
+        ),
+        migrations.AddField(
+            model_name="lesson",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True, verbose_name="Дата обновления"),
+        ),
+    ]
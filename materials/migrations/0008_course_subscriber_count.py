@@ -0,0 +1,36 @@
+# Generated by Django 5.1.7 on 2026-10-17 23:02
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_subscriber_count(apps, schema_editor):
+    Course = apps.get_model("materials", "Course")
+    Subscription = apps.get_model("materials", "Subscription")
+    counts = (
+        Subscription.objects.filter(course=OuterRef("pk"))
+        .order_by()
+        .values("course")
+        .annotate(total=Count("pk"))
+        .values("total")
+    )
+    Course.objects.update(subscriber_count=Coalesce(Subquery(counts), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("materials", "0007_rename_last_updated_course_updated_at_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="course",
+            name="subscriber_count",
+            field=models.PositiveIntegerField(
+                default=0, editable=False, verbose_name="Количество подписчиков"
+            ),
+        ),
+        migrations.RunPython(fill_subscriber_count, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.1.7 on 2026-10-17 23:03
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_lesson_count(apps, schema_editor):
+    Course = apps.get_model("materials", "Course")
+    Lesson = apps.get_model("materials", "Lesson")
+    counts = (
+        Lesson.objects.filter(course=OuterRef("pk"))
+        .order_by()
+        .values("course")
+        .annotate(total=Count("pk"))
+        .values("total")
+    )
+    Course.objects.update(lesson_count=Coalesce(Subquery(counts), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("materials", "0008_course_subscriber_count"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="course",
+            name="lesson_count",
+            field=models.PositiveIntegerField(
+                default=0, editable=False, verbose_name="Количество уроков"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="course",
+            index=models.Index(
+                fields=["-subscriber_count", "id"], name="course_popularity_idx"
+            ),
+        ),
+        migrations.RunPython(fill_lesson_count, migrations.RunPython.noop),
+    ]
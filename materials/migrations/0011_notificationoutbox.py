@@ -0,0 +1,51 @@
+# Generated by Django 5.1.7 on 2026-10-17 23:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("materials", "0010_subscription_course_id_idx"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="NotificationOutbox",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "update_type",
+                    models.CharField(max_length=255, verbose_name="Обновление"),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(
+                        auto_now_add=True, verbose_name="Дата создания"
+                    ),
+                ),
+                (
+                    "course",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="outbox",
+                        to="materials.course",
+                        verbose_name="Курс",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Уведомление к отправке",
+                "verbose_name_plural": "Уведомления к отправке",
+            },
+        ),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 5.1.7 on 2026-10-17 23:43
+
+import re
+
+from django.db import migrations, models
+
+# Копия разбора ссылок materials.validators на момент миграции: изменения модуля не должны менять миграцию
+URL_RE = re.compile(r"(?:https?://)?(?P<host>[^/?#:]+)(?::\d+)?(?P<rest>[/?#].*)?$", re.DOTALL)
+VIDEO_ID = r"(?P<video_id>[A-Za-z0-9_-]{11})"
+VIDEO_ID_PATTERNS = (
+    re.compile(rf"^/(?:embed|shorts|live|v)/{VIDEO_ID}(?:[/?#]|$)"),
+    re.compile(rf"^/watch/?\?(?:.*&)?v={VIDEO_ID}(?:[&#]|$)"),
+)
+SHORT_LINK_PATTERN = re.compile(rf"^/{VIDEO_ID}(?:[/?#]|$)")
+ALLOWED_HOSTS = frozenset({"youtube.com", "www.youtube.com", "m.youtube.com", "youtu.be"})
+SHORT_LINK_HOSTS = frozenset({"youtu.be"})
+BATCH_SIZE = 1000
+
+
+def extract_video_id(url):
+    match = URL_RE.match(url)
+    if match is None or match["host"].lower() not in ALLOWED_HOSTS:
+        return None
+    host = match["host"].lower()
+    patterns = (SHORT_LINK_PATTERN,) if host in SHORT_LINK_HOSTS else VIDEO_ID_PATTERNS
+    for pattern in patterns:
+        video_match = pattern.match(match["rest"] or "")
+        if video_match:
+            return video_match["video_id"]
+    return None
+
+
+def fill_video_id(apps, schema_editor):
+    Lesson = apps.get_model("materials", "Lesson")
+    lessons = Lesson.objects.exclude(video_url=None).exclude(video_url="").only("pk", "video_url")
+    batch = []
+    for lesson in lessons.iterator(chunk_size=BATCH_SIZE):
+        lesson.video_id = extract_video_id(lesson.video_url)
+        if lesson.video_id is not None:
+            batch.append(lesson)
+        if len(batch) == BATCH_SIZE:
+            Lesson.objects.bulk_update(batch, ["video_id"])
+            batch = []
+    if batch:
+        Lesson.objects.bulk_update(batch, ["video_id"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("materials", "0011_notificationoutbox"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="lesson",
+            name="video_id",
+            field=models.CharField(
+                blank=True,
+                db_index=True,
+                editable=False,
+                max_length=11,
+                null=True,
+                verbose_name="ID видео YouTube",
+            ),
+        ),
+        migrations.RunPython(fill_video_id, migrations.RunPython.noop),
+    ]
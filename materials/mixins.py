@@ -0,0 +1,129 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.http import parse_etags, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+
+from materials.cache import get_cached, get_catalog_version, get_course_version
+
+
+class CachedResponseMixin:
+    """
+        Кеширует ответы list и retrieve в общем кеше (Redis).
+
+        Списки версионируются версией каталога, отдельные объекты - своей версией (get_cache_version).
+        Версии увеличиваются сигналами post_save/post_delete моделей Course, Lesson и Subscription
+        после фиксации транзакции. Версия читается до загрузки объекта: изменение, попавшее между
+        чтением версии и загрузкой, увеличит версию, и закешированная запись не будет использована.
+        Поля, зависящие от пользователя (personal_fields), хранятся в кеше со значением False
+        и заполняются для каждого запроса методом personalize.
+
+        Атрибуты
+        - cache_prefix: Префикс ключей кеша представления.
+        - permission_object_attrs: Атрибуты объекта, нужные для проверки прав без его загрузки.
+        - personal_fields: Поля ответа, зависящие от текущего пользователя.
+
+        Методы
+        - get_cache_version: Возвращает версию ответа retrieve по pk (по умолчанию - версию курса).
+        """
+    cache_prefix = None
+    permission_object_attrs = ()
+    personal_fields = ()
+
+    def get_cache_version(self, pk):
+        return get_course_version(pk)
+
+    def personalize(self, request, items):
+        """Заполняет поля personal_fields для текущего пользователя."""
+
+    def get_shared_data(self, data):
+        """Возвращает копию данных ответа без значений, зависящих от пользователя."""
+        if not self.personal_fields:
+            return data
+        shared = {field: False for field in self.personal_fields}
+        if isinstance(data, dict) and "results" in data:
+            return {**data, "results": [{**item, **shared} for item in data["results"]]}
+        return {**data, **shared}
+
+    def list(self, request, *args, **kwargs):
+        key = f"{self.cache_prefix}:list:{get_catalog_version()}:{request.build_absolute_uri()}"
+        data = get_cached(key)
+        if data is None:
+            response = super().list(request, *args, **kwargs)
+            cache.set(key, self.get_shared_data(response.data), settings.MATERIALS_CACHE_TIMEOUT)
+            return response
+        self.personalize(request, data["results"] if "results" in data else data)
+        return Response(data)
+
+    def retrieve(self, request, *args, **kwargs):
+        pk = kwargs[self.lookup_url_kwarg or self.lookup_field]
+        key = f"{self.cache_prefix}:detail:{pk}"
+        version = self.get_cache_version(pk)
+        entry = get_cached(key)
+        if entry is not None and entry["version"] == version:
+            instance = self.get_queryset().model(**entry["attrs"])
+            self.check_object_permissions(request, instance)
+            data = entry["data"]
+            self.personalize(request, [data])
+            return Response(data)
+
+        instance = self.get_object()
+        data = self.get_serializer(instance).data
+        entry = {
+            "version": version,
+            "attrs": {attr: getattr(instance, attr) for attr in ("pk", *self.permission_object_attrs)},
+            "data": self.get_shared_data(data),
+        }
+        cache.set(key, entry, settings.MATERIALS_CACHE_TIMEOUT)
+        return Response(data)
+
+
+class ConditionalRetrieveMixin:
+    """
+        Поддержка ETag и условного GET (If-None-Match) для retrieve.
+
+        ETag строится из дешевой версии объекта (get_etag_values - один запрос по полям
+        updated_at), а не из тела ответа. При совпадении с If-None-Match ответ 304
+        возвращается до сериализации и без загрузки вложенных объектов.
+
+        Атрибуты
+        - permission_object_attrs: Атрибуты объекта, нужные для проверки прав без его загрузки.
+
+        Методы
+        - get_etag_values: Возвращает словарь значений версии объекта или None, если объекта нет.
+          Обязателен: класс представления без него не создается (ImproperlyConfigured при импорте).
+        """
+    permission_object_attrs = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if cls.get_etag_values is ConditionalRetrieveMixin.get_etag_values:
+            raise ImproperlyConfigured(f"{cls.__name__} должен определить get_etag_values(request, pk)")
+
+    def get_etag_values(self, request, pk):
+        raise NotImplementedError
+
+    def retrieve(self, request, *args, **kwargs):
+        pk = kwargs[self.lookup_url_kwarg or self.lookup_field]
+        values = self.get_etag_values(request, pk)
+        if values is None:
+            return super().retrieve(request, *args, **kwargs)
+
+        instance = self.get_queryset().model(
+            **{attr: values[attr] for attr in ("pk", *self.permission_object_attrs)}
+        )
+        self.check_object_permissions(request, instance)
+
+        etag = quote_etag(hashlib.md5(repr(sorted(values.items())).encode()).hexdigest())
+        if_none_match = request.headers.get("If-None-Match")
+        if if_none_match:
+            etags = [tag.removeprefix("W/") for tag in parse_etags(if_none_match)]
+            if "*" in etags or etag in etags:
+                return Response(status=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+        response = super().retrieve(request, *args, **kwargs)
+        response["ETag"] = etag
+        return response
@@ -1,6 +1,8 @@
 from django.conf import settings
 from django.db import models
 
+from materials.validators import extract_youtube_video_id
+
 
 class Course(models.Model):
     """
@@ -11,6 +13,13 @@ class Course(models.Model):
        - preview: Превью-изображение курса (опционально).
        - description: Описание курса (опционально).
        - owner: Владелец курса (пользователь, опционально).
+       - updated_at: Дата и время последнего изменения курса.
+       - last_notified_at: Дата и время последней рассылки подписчикам об обновлении.
+       - lesson_count: Количество уроков (денормализованный счетчик).
+       - subscriber_count: Количество подписчиков (денормализованный счетчик).
+
+       Счетчики обновляются F-выражениями при создании и удалении уроков и подписок
+       и пересчитываются командой recount_course_counters.
 
        Методы
        - __str__: Возвращает название курса.
@@ -29,6 +38,16 @@ class Course(models.Model):
         blank=True,
         null=True,
     )
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата обновления")
+    last_notified_at = models.DateTimeField(
+        verbose_name="Дата последней рассылки", blank=True, null=True, editable=False
+    )
+    lesson_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name="Количество уроков"
+    )
+    subscriber_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name="Количество подписчиков"
+    )
 
     def __str__(self):
         return self.title
@@ -36,6 +55,9 @@ class Course(models.Model):
     class Meta:
         verbose_name = "Курс"
         verbose_name_plural = "Курсы"
+        indexes = [
+            models.Index(fields=["-subscriber_count", "id"], name="course_popularity_idx"),
+        ]
 
 
 class Lesson(models.Model):
@@ -47,11 +69,16 @@ class Lesson(models.Model):
         - description: Описание урока (опционально).
         - preview: Превью-изображение урока (опционально).
         - video_url: Ссылка на видео (опционально).
+        - video_id: ID видео YouTube из video_url: по нему находятся одинаковые видео
+          в разных уроках независимо от формы ссылки (заполняется при сохранении).
         - course: Курс, к которому относится урок.
         - owner: Владелец урока (пользователь, опционально).
+        - updated_at: Дата и время последнего изменения урока.
 
         Методы
         - __str__: Возвращает название урока.
+        - from_db: Запоминает исходный курс урока, чтобы при переносе урока обновить счетчики обоих курсов.
+        - save: Пересчитывает video_id по ссылке на видео.
         """
     title = models.CharField(max_length=100, verbose_name="Название урока")
     description = models.TextField(verbose_name="Описание урока", blank=True, null=True)
@@ -59,6 +86,9 @@ class Lesson(models.Model):
         upload_to="materials/lessons/preview", blank=True, null=True
     )
     video_url = models.URLField(verbose_name="Ссылка на видео", blank=True, null=True)
+    video_id = models.CharField(
+        max_length=11, blank=True, null=True, editable=False, db_index=True, verbose_name="ID видео YouTube"
+    )
     course = models.ForeignKey(
         Course, on_delete=models.CASCADE, related_name="lessons", verbose_name="Курс"
     )
@@ -69,6 +99,20 @@ class Lesson(models.Model):
         blank=True,
         null=True,
     )
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата обновления")
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_course_id = instance.__dict__.get("course_id")
+        return instance
+
+    def save(self, *args, **kwargs):
+        self.video_id = extract_youtube_video_id(self.video_url)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "video_url" in update_fields:
+            kwargs["update_fields"] = {*update_fields, "video_id"}
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return self.title
@@ -93,6 +137,7 @@ class Subscription(models.Model):
 
         Meta
         - unique_together: Ограничение уникальности по комбинации пользователь+курс.
+        - indexes: Индекс (course, id) для чтения подписчиков курса при рассылке.
         """
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
@@ -104,15 +149,49 @@ class Subscription(models.Model):
         Course,
         on_delete=models.CASCADE,
         related_name="subscriptions",
-        verbose_name="Курс"
+        verbose_name="Курс",
+        db_index=False,
     )
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата подписки")
     is_active = models.BooleanField(default=False)
 
     class Meta:
         unique_together = ('user', 'course')
+        # Рассылка читает подписки курса в порядке id: индекс (course, id) отдает их без сортировки
+        # и заменяет одиночный индекс внешнего ключа course
+        indexes = [models.Index(fields=["course", "id"], name="subscription_course_id_idx")]
         verbose_name = "Подписка"
         verbose_name_plural = "Подписки"
 
     def __str__(self):
         return f"{self.user} -> {self.course}"
+
+
+class NotificationOutbox(models.Model):
+    """
+        Исходящее уведомление подписчикам курса (transactional outbox).
+
+        Запись создается в той же транзакции, что и изменение курса или урока, поэтому
+        уведомление не теряется при недоступности брокера и не уходит при откате.
+        Задача relay_notification_outbox пачками передает записи в Celery и удаляет их.
+
+        Атрибуты
+        - course: Курс, подписчикам которого нужно отправить уведомление.
+        - update_type: Описание обновления для текста письма.
+        - created_at: Дата и время создания записи.
+        """
+    course = models.ForeignKey(
+        Course,
+        on_delete=models.CASCADE,
+        related_name="outbox",
+        verbose_name="Курс"
+    )
+    update_type = models.CharField(max_length=255, verbose_name="Обновление")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
+
+    class Meta:
+        verbose_name = "Уведомление к отправке"
+        verbose_name_plural = "Уведомления к отправке"
+
+    def __str__(self):
+        return f"{self.course_id}: {self.update_type}"
@@ -1,6 +1,25 @@
 from rest_framework import pagination
 
 
+class CustomCursorPagination(pagination.CursorPagination):
+    """
+        Курсорная (keyset) пагинация с теми же размерами страниц, что и CustomPagination.
+
+        Не выполняет COUNT(*) и не использует OFFSET, поэтому глубокие страницы
+        отдаются за постоянное время.
+
+        Атрибуты
+        - page_size: Количество объектов на одной странице по умолчанию (10).
+        - page_size_query_param: Имя GET-параметра для изменения размера страницы ("page_size").
+        - max_page_size: Максимально допустимое количество объектов на странице (100).
+        - ordering: Порядок, по которому строится курсор (по умолчанию по id).
+        """
+    page_size = 10
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    ordering = ("id",)
+
+
 class CustomPagination(pagination.PageNumberPagination):
     """
         Кастомная пагинация для отображения списка объектов с поддержкой изменения размера страницы по запросу
@@ -10,7 +29,43 @@ class CustomPagination(pagination.PageNumberPagination):
         - page_size: Количество объектов на одной странице по умолчанию (10).
         - page_size_query_param: Имя GET-параметра, позволяющего клиенту изменять размер страницы ("page_size").
         - max_page_size: Максимально допустимое количество объектов на странице (100).
+        - mode_query_param: Имя GET-параметра для выбора режима пагинации ("pagination").
+        - cursor_pagination_class: Класс пагинации, используемый в курсорном режиме.
+
+        Курсорный режим включается параметром ?pagination=cursor, наличием параметра cursor
+        или атрибутом представления pagination_mode = "cursor". Порядок курсора задается
+        атрибутом представления cursor_ordering, например ("created_at", "id").
         """
     page_size = 10
     page_size_query_param = "page_size"
     max_page_size = 100
+    mode_query_param = "pagination"
+    cursor_pagination_class = CustomCursorPagination
+
+    cursor_paginator = None
+
+    def use_cursor(self, request, view=None):
+        """Определяет, нужно ли использовать курсорный режим для запроса."""
+        mode = request.query_params.get(self.mode_query_param)
+        if mode:
+            return mode == "cursor"
+        if self.cursor_pagination_class.cursor_query_param in request.query_params:
+            return True
+        return getattr(view, "pagination_mode", None) == "cursor"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if not self.use_cursor(request, view):
+            return super().paginate_queryset(queryset, request, view)
+        self.cursor_paginator = self.cursor_pagination_class()
+        self.cursor_paginator.page_size = self.page_size
+        self.cursor_paginator.page_size_query_param = self.page_size_query_param
+        self.cursor_paginator.max_page_size = self.max_page_size
+        ordering = getattr(view, "cursor_ordering", None)
+        if ordering:
+            self.cursor_paginator.ordering = ordering
+        return self.cursor_paginator.paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
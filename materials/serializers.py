@@ -1,11 +1,12 @@
 from rest_framework import serializers
-from rest_framework.serializers import ModelSerializer, SerializerMethodField
+from rest_framework.serializers import ModelSerializer
 
+from config.middleware import TimedSerializerMixin
 from materials.models import Course, Lesson, Subscription
 from materials.validators import UrlValidator
 
 
-class LessonSerializer(ModelSerializer):
+class LessonSerializer(TimedSerializerMixin, ModelSerializer):
     """
         Сериализатор для модели Lesson.
 
@@ -20,7 +21,27 @@ class LessonSerializer(ModelSerializer):
         validators = [UrlValidator(field="video_url")]
 
 
-class SubscriptionSerializer(serializers.ModelSerializer):
+class LessonImportSerializer(ModelSerializer):
+    """
+        Сериализатор строки массового импорта уроков.
+
+        Курс проверяется по множеству существующих ID из контекста ("course_ids"),
+        поэтому валидация строки не выполняет запросов к базе данных.
+        """
+    course = serializers.IntegerField()
+
+    class Meta:
+        model = Lesson
+        fields = ("title", "description", "video_url", "course")
+        validators = [UrlValidator(field="video_url")]
+
+    def validate_course(self, value):
+        if value not in self.context["course_ids"]:
+            raise serializers.ValidationError("Курс не найден.")
+        return value
+
+
+class SubscriptionSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """
         Сериализатор для модели Subscription.
 
@@ -31,20 +52,23 @@ class SubscriptionSerializer(serializers.ModelSerializer):
         fields = "__all__"
 
 
-class CourseSerializer(ModelSerializer):
+class CourseSerializer(TimedSerializerMixin, ModelSerializer):
     """
         Сериализатор для модели Course.
 
         Добавляет к стандартным полям курса дополнительные вычисляемые поля:
-        - lesson_count: Количество уроков в курсе.
         - lessons: Список сериализованных уроков, входящих в курс.
         - is_subscribed: Признак того, подписан ли текущий пользователь на курс.
 
+        Количество уроков и подписчиков (lesson_count, subscriber_count) хранится в самой
+        модели курса и выводится без дополнительных запросов.
+
         Методы
-        - get_lesson_count: Получает количество уроков для курса.
         - get_is_subscribed: Проверяет активную подписку пользователя на курс.
+
+        Если курс получен из CourseViewSet.get_queryset, признак is_subscribed берется
+        из аннотации без дополнительного запроса.
         """
-    lesson_count = SerializerMethodField()
     lessons = LessonSerializer(many=True, read_only=True)
     is_subscribed = serializers.SerializerMethodField()
 
@@ -59,18 +83,6 @@ class CourseSerializer(ModelSerializer):
     #     user = self.context["request"].user
     #     return Subscription.objects.filter(user=user).filter(course=instance).exists()
 
-    def get_lesson_count(self, obj):
-        """
-                Возвращает количество уроков, связанных с данным курсом.
-
-                Аргументы
-                - obj: Экземпляр курса.
-
-                Результат
-                - int: Количество уроков.
-                """
-        return obj.lessons.count()
-
     def get_is_subscribed(self, obj):
         """
                 Проверяет, подписан ли текущий пользователь на курс.
@@ -81,6 +93,8 @@ class CourseSerializer(ModelSerializer):
                 Результат
                 - bool: True, если подписка оформлена, иначе False.
                 """
+        if hasattr(obj, "is_subscribed"):
+            return obj.is_subscribed
         request = self.context.get('request')
         if request and request.user.is_authenticated:
             return Subscription.objects.filter(course=obj, user=request.user).exists()
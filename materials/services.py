@@ -0,0 +1,163 @@
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from materials.cache import bump_course_version
+from materials.models import Course, NotificationOutbox, Subscription
+
+NOTIFICATION_INTERVAL = timedelta(hours=4)
+
+
+def claim_notification_window(course_id):
+    """
+    Атомарно занимает окно рассылки об обновлении курса.
+
+    Выполняет один условный UPDATE ... WHERE last_notified_at < now - 4h, поэтому
+    при одновременных изменениях рассылку запускает только один процесс за окно.
+
+    Аргументы
+    - course_id (int): ID курса.
+
+    Результат
+    - bool: True, если окно занято этим вызовом и рассылку нужно запустить.
+    """
+    now = timezone.now()
+    claimed = (
+        Course.objects.filter(pk=course_id)
+        .filter(Q(last_notified_at__isnull=True) | Q(last_notified_at__lt=now - NOTIFICATION_INTERVAL))
+        .update(last_notified_at=now)
+    )
+    return claimed == 1
+
+
+def enqueue_course_notification(course_id, update_type):
+    """
+    Записывает уведомление подписчикам курса в outbox, если окно рассылки свободно.
+
+    Вызывается в транзакции изменения курса или урока: запись и занятое окно
+    фиксируются вместе с изменением или откатываются вместе с ним. Брокер в запросе
+    не используется - записи отправляет в Celery задача relay_notification_outbox.
+
+    Аргументы
+    - course_id (int): ID курса.
+    - update_type (str): Описание обновления для текста письма.
+
+    Результат
+    - bool: True, если уведомление поставлено в outbox.
+    """
+    if not claim_notification_window(course_id):
+        return False
+    NotificationOutbox.objects.create(course_id=course_id, update_type=update_type)
+    return True
+
+
+def change_course_counter(course_id, field, delta):
+    """
+    Изменяет денормализованный счетчик курса (lesson_count, subscriber_count) F-выражением.
+
+    Уменьшение не опускает счетчик ниже нуля: расхождения исправляет команда recount_course_counters.
+
+    Результат
+    - int: Количество обновленных строк (0, если курса нет).
+    """
+    courses = Course.objects.filter(pk=course_id)
+    if delta < 0:
+        courses = courses.filter(**{f"{field}__gte": -delta})
+    return courses.update(**{field: F(field) + delta})
+
+
+def subscribe(user, course_id, is_active=False):
+    """
+    Подписывает пользователя на курс одним INSERT ... ON CONFLICT DO NOTHING.
+
+    Счетчик Course.subscriber_count увеличивается, только если строка вставлена, поэтому
+    повторный или одновременный запрос не меняет счетчик и не приводит к IntegrityError.
+
+    Результат
+    - bool: True, если подписка создана этим вызовом.
+
+    Исключения
+    - Course.DoesNotExist: Если курса не существует.
+    """
+    table = connection.ops.quote_name(Subscription._meta.db_table)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {table} (user_id, course_id, created_at, is_active) "
+            f"VALUES (%s, %s, %s, %s) ON CONFLICT DO NOTHING",
+            [user.pk, course_id, connection.ops.adapt_datetimefield_value(timezone.now()), is_active],
+        )
+        created = cursor.rowcount
+        if created and not change_course_counter(course_id, "subscriber_count", created):
+            raise Course.DoesNotExist
+    if created:
+        bump_course_version(course_id)
+    return bool(created)
+
+
+def unsubscribe(user, course_id):
+    """
+    Отменяет подписку одним DELETE; счетчик уменьшается, только если строка удалена.
+
+    Результат
+    - bool: True, если подписка удалена этим вызовом.
+    """
+    table = connection.ops.quote_name(Subscription._meta.db_table)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {table} WHERE user_id = %s AND course_id = %s", [user.pk, course_id])
+        deleted = cursor.rowcount
+        if deleted:
+            change_course_counter(course_id, "subscriber_count", -deleted)
+    if deleted:
+        bump_course_version(course_id)
+    return bool(deleted)
+
+
+def toggle_subscription(user, course_id, is_active=False):
+    """
+    Подписывает пользователя на курс или отменяет подписку.
+
+    На PostgreSQL удаление или вставка выполняются одним запросом (DELETE ... RETURNING
+    и INSERT ... ON CONFLICT DO NOTHING в WITH), затем счетчик Course.subscriber_count
+    меняется F-выражением на результат запроса в той же транзакции: два запроса на любое
+    действие. Если одновременный запрос уже создал подписку, вставка пропускается,
+    и подписка считается оформленной без изменения счетчика. Другие СУБД не поддерживают
+    изменение данных в WITH: для них выполняется unsubscribe, а если удалять нечего - subscribe.
+
+    Аргументы
+    - user (User): Пользователь.
+    - course_id (int): ID курса.
+    - is_active (bool): Признак активности создаваемой подписки.
+
+    Результат
+    - bool: True, если подписка добавлена (или уже оформлена), False, если удалена.
+
+    Исключения
+    - Course.DoesNotExist: Если курса не существует.
+    """
+    if connection.vendor != "postgresql":
+        if unsubscribe(user, course_id):
+            return False
+        subscribe(user, course_id, is_active)
+        return True
+
+    table = connection.ops.quote_name(Subscription._meta.db_table)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f"WITH deleted AS ("
+            f"DELETE FROM {table} WHERE user_id = %s AND course_id = %s RETURNING 1"
+            f"), inserted AS ("
+            f"INSERT INTO {table} (user_id, course_id, created_at, is_active) "
+            f"SELECT %s, %s, %s, %s WHERE NOT EXISTS (SELECT 1 FROM deleted) ON CONFLICT DO NOTHING RETURNING 1"
+            f") SELECT (SELECT count(*) FROM inserted) - (SELECT count(*) FROM deleted)",
+            [user.pk, course_id, user.pk, course_id, timezone.now(), is_active],
+        )
+        delta = cursor.fetchone()[0]
+        if delta > 0 and not change_course_counter(course_id, "subscriber_count", delta):
+            raise Course.DoesNotExist
+        if delta < 0:
+            change_course_counter(course_id, "subscriber_count", delta)
+    if delta:
+        bump_course_version(course_id)
+    return delta >= 0
@@ -0,0 +1,62 @@
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from materials.cache import bump_course_version, bump_lesson_version
+from materials.models import Course, Lesson, Subscription
+from materials.services import change_course_counter
+
+
+def is_course_deletion(origin):
+    """Проверяет, что удаление запущено удалением самого курса (каскад)."""
+    if isinstance(origin, QuerySet):
+        return origin.model is Course
+    return isinstance(origin, Course)
+
+
+@receiver([post_save, post_delete], sender=Course)
+def reset_course_cache(sender, instance, **kwargs):
+    """Сбрасывает закешированные ответы курса при его изменении или удалении."""
+    bump_course_version(instance.pk)
+
+
+@receiver(post_save, sender=Lesson)
+def lesson_saved(sender, instance, created, **kwargs):
+    """
+    Обновляет счетчик уроков (в том числе при переносе урока) и сбрасывает кеш урока
+    и курса; при переносе сбрасывается и кеш прежнего курса.
+    """
+    loaded_course_id = getattr(instance, "_loaded_course_id", None)
+    if created:
+        change_course_counter(instance.course_id, "lesson_count", 1)
+    elif loaded_course_id is not None and loaded_course_id != instance.course_id:
+        change_course_counter(loaded_course_id, "lesson_count", -1)
+        change_course_counter(instance.course_id, "lesson_count", 1)
+        bump_course_version(loaded_course_id)
+    instance._loaded_course_id = instance.course_id
+    bump_lesson_version(instance.pk)
+    bump_course_version(instance.course_id)
+
+
+@receiver(post_save, sender=Subscription)
+def subscription_saved(sender, instance, created, **kwargs):
+    """Обновляет счетчик подписчиков и сбрасывает кеш курса."""
+    if created:
+        change_course_counter(instance.course_id, "subscriber_count", 1)
+    bump_course_version(instance.course_id)
+
+
+@receiver(post_delete, sender=Lesson)
+@receiver(post_delete, sender=Subscription)
+def course_item_deleted(sender, instance, origin=None, **kwargs):
+    """
+    Уменьшает счетчик курса и сбрасывает его кеш при удалении урока или подписки.
+    При каскадном удалении курса только сбрасывает кеш удаленных уроков: курс удаляется целиком.
+    """
+    if sender is Lesson:
+        bump_lesson_version(instance.pk)
+    if is_course_deletion(origin):
+        return
+    field = "lesson_count" if sender is Lesson else "subscriber_count"
+    change_course_counter(instance.course_id, field, -1)
+    bump_course_version(instance.course_id)
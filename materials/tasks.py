@@ -1,26 +1,160 @@
-from django.core.mail import send_mail
+import logging
+import time
+from smtplib import SMTPException
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
 from celery import shared_task
 from django.utils import timezone
 from datetime import timedelta
 from django.contrib.auth import get_user_model
 
+from materials.mailing import SENT, CourseUpdateTemplate, deliver
+from materials.models import Course, NotificationOutbox, Subscription
+from materials.utils import batched
+
+NOTIFICATION_PROGRESS_TIMEOUT = 60 * 60 * 24
+INACTIVITY_PERIOD = timedelta(days=30)
+
+logger = logging.getLogger(__name__)
+
 
 @shared_task
 def send_course_update_email(user_email, course_title, update_type):
-    send_mail(
-        subject=f'Обновление курса: {course_title}',
-        message=f'В вашем курсе "{course_title}" появилось новое обновление: {update_type}.',
-        from_email='noreply@yourdomain.com',
-        recipient_list=[user_email],
+    """Отправляет письмо об обновлении курса через соединение потока воркера и возвращает статус доставки."""
+    return deliver([CourseUpdateTemplate(course_title, update_type).personalize(user_email)])[0]
+
+
+@shared_task(bind=True, autoretry_for=(SMTPException, OSError), retry_backoff=True, max_retries=5)
+def notify_course_subscribers(self, course_id, update_type, notification_key=None):
+    """
+    Рассылает письмо об обновлении курса всем подписчикам пачками.
+
+    Адреса читаются потоком через values_list().iterator() в порядке id подписки.
+    Письмо формируется один раз, все письма уходят через SMTP-соединение потока
+    воркера (materials.mailing). После каждой пачки из COURSE_UPDATE_EMAIL_BATCH_SIZE
+    писем, а при ошибке - после последнего обработанного письма, в кеш записывается id
+    подписки, поэтому повторный запуск (retry) продолжает рассылку со следующего письма.
+    Повторно может уйти только письмо, принятое сервером в момент аварийной остановки
+    воркера (доставка "хотя бы один раз").
+
+    Пул threads не прерывает задачу по CELERY_TASK_TIME_LIMIT, поэтому после
+    NOTIFICATION_TASK_TIME_BUDGET секунд задача ставит в очередь продолжение с тем же
+    ключом прогресса и завершается: иначе Redis вернул бы неподтвержденное сообщение
+    в очередь по visibility_timeout, пока рассылка еще идет.
+
+    Аргументы
+    - course_id (int): ID курса.
+    - update_type (str): Описание обновления для текста письма.
+    - notification_key (str): Ключ прогресса рассылки (по умолчанию ID задачи).
+
+    Результат
+    - int: Количество отправленных писем.
+    """
+    course_title = Course.objects.filter(pk=course_id).values_list("title", flat=True).first()
+    if course_title is None:
+        return 0
+
+    notification_key = notification_key or self.request.id
+    progress_key = f"materials:notify:{notification_key}"
+    last_subscription_id = cache.get(progress_key, 0)
+    batch_size = settings.COURSE_UPDATE_EMAIL_BATCH_SIZE
+    template = CourseUpdateTemplate(course_title, update_type)
+    subscribers = (
+        Subscription.objects.filter(course_id=course_id, pk__gt=last_subscription_id)
+        .order_by("pk")
+        .values_list("pk", "user__email")
+        .iterator(chunk_size=batch_size)
     )
 
+    sent = 0
+    deadline = time.monotonic() + settings.NOTIFICATION_TASK_TIME_BUDGET
+    for index, batch in enumerate(batched(subscribers, batch_size)):
+        if index and time.monotonic() >= deadline:
+            self.apply_async((course_id, update_type), {"notification_key": notification_key})
+            return sent
+        results = []
+        try:
+            deliver((template.personalize(email) for _, email in batch), results=results)
+        finally:
+            if results:
+                cache.set(progress_key, batch[len(results) - 1][0], NOTIFICATION_PROGRESS_TIMEOUT)
+        sent += sum(result["status"] == SENT for result in results)
+    cache.delete(progress_key)
+    return sent
+
 
 @shared_task
 def deactivate_inactive_users():
+    """
+    Деактивирует пользователей, не заходивших больше 30 дней.
+
+    Пользователи обрабатываются пачками по возрастанию pk: каждая пачка - отдельный
+    короткий UPDATE, между пачками задача делает паузу, чтобы не держать блокировки
+    строк и не создавать всплеск записи в журнал. Позиция между запусками не хранится:
+    уже деактивированные пользователи не попадают в выборку, поэтому после перезапуска
+    воркера следующий запуск обрабатывает только оставшихся.
+
+    Размер пачки и пауза задаются настройками DEACTIVATE_USERS_BATCH_SIZE и
+    DEACTIVATE_USERS_BATCH_PAUSE.
+
+    Результат
+    - dict: {"deactivated": int, "batches": int}
+    """
     User = get_user_model()
-    month_ago = timezone.now() - timedelta(days=30)
-    users_to_deactivate = User.objects.filter(
-        last_login__lt=month_ago,
-        is_active=True
-    )
-    users_to_deactivate.update(is_active=False)
+    batch_size = settings.DEACTIVATE_USERS_BATCH_SIZE
+    pause = settings.DEACTIVATE_USERS_BATCH_PAUSE
+    month_ago = timezone.now() - INACTIVITY_PERIOD
+    inactive_users = User.objects.filter(last_login__lt=month_ago, is_active=True)
+
+    last_pk = 0
+    stats = {"deactivated": 0, "batches": 0}
+    while True:
+        pks = list(inactive_users.filter(pk__gt=last_pk).order_by("pk").values_list("pk", flat=True)[:batch_size])
+        if not pks:
+            break
+        stats["deactivated"] += inactive_users.filter(pk__in=pks).update(is_active=False)
+        stats["batches"] += 1
+        last_pk = pks[-1]
+        logger.info("deactivate_inactive_users: batch %s, last pk %s, deactivated %s",
+                    stats["batches"], last_pk, stats["deactivated"])
+        if len(pks) < batch_size:
+            break
+        time.sleep(pause)
+
+    logger.info("deactivate_inactive_users: done, deactivated %s users in %s batches",
+                stats["deactivated"], stats["batches"])
+    return stats
+
+
+@shared_task
+def relay_notification_outbox():
+    """
+    Передает уведомления из outbox в Celery пачками.
+
+    Пачка из NOTIFICATION_OUTBOX_BATCH_SIZE записей выбирается SELECT ... FOR UPDATE
+    SKIP LOCKED, поэтому несколько одновременных запусков не делят записи между собой
+    и не ждут друг друга. Записи удаляются в той же транзакции после постановки задач
+    в очередь; если брокер недоступен, транзакция откатывается и записи отправит
+    следующий запуск. Доставка - "хотя бы один раз": ключ notification_key по ID записи
+    позволяет повторной задаче продолжить рассылку с места остановки.
+
+    Результат
+    - int: Количество переданных уведомлений.
+    """
+    batch_size = settings.NOTIFICATION_OUTBOX_BATCH_SIZE
+    relayed = 0
+    while True:
+        with transaction.atomic():
+            entries = list(
+                NotificationOutbox.objects.select_for_update(skip_locked=True)
+                .order_by("pk")
+                .values_list("pk", "course_id", "update_type")[:batch_size]
+            )
+            for pk, course_id, update_type in entries:
+                notify_course_subscribers.delay(course_id, update_type, notification_key=f"outbox:{pk}")
+            NotificationOutbox.objects.filter(pk__in=[entry[0] for entry in entries]).delete()
+        relayed += len(entries)
+        if len(entries) < batch_size:
+            return relayed
@@ -1,7 +1,63 @@
-from rest_framework import status
+import json
+import math
+import os
+import socketserver
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from io import StringIO
+from smtplib import SMTPException, SMTPRecipientsRefused, SMTPSenderRefused
+from unittest.mock import patch
+
+from celery.contrib.testing.worker import start_worker
+from celery.signals import worker_process_shutdown
+from django.conf import settings
+from django.core import mail
+from django.core.exceptions import ImproperlyConfigured, MiddlewareNotUsed
+from django.core.management import call_command
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from kombu.exceptions import OperationalError
+from rest_framework import generics, serializers, status
 from rest_framework.test import APITestCase
 
-from materials.models import Course, Lesson
+from config.celery import app as celery_app
+from config.celery_metrics import (
+    QUEUE_DEPTH,
+    TASK_FAILURES,
+    TASK_QUEUE_WAIT,
+    TASK_RETRIES,
+    TASK_RUNTIME,
+    collect_queue_depth,
+)
+from config.metrics import REGISTRY
+from config.testing import IndexUsageMixin, QueryBudgetMixin, requires_postgresql
+from config.middleware import (
+    DB_QUERIES, RENDER_DURATION, REQUEST_DURATION, RESPONSE_SIZE, SERIALIZER_DURATION, PerformanceMetricsMiddleware,
+)
+from materials.cache import CATALOG_VERSION_KEY, bump_course_version, get_cache_stats
+from materials.mailing import NOTIFICATION_FROM_EMAIL, CourseUpdateTemplate, deliver, is_permanent_error
+from materials.mixins import ConditionalRetrieveMixin
+from materials.models import Course, Lesson, NotificationOutbox, Subscription
+from materials.views import CourseViewSet
+from materials.services import (
+    change_course_counter, claim_notification_window, enqueue_course_notification, subscribe, toggle_subscription,
+    unsubscribe,
+)
+from materials.tasks import (
+    deactivate_inactive_users,
+    notify_course_subscribers,
+    relay_notification_outbox,
+    send_course_update_email,
+)
+from materials.validators import UrlValidator, extract_youtube_video_id
 from users.models import User
 
 
@@ -86,6 +142,15 @@ class MaterialsAPITestCase(APITestCase):
         response = self.client.put(f"/lessons/{self.lesson.pk}/update/", data=data)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
+    def test_lesson_video_id(self):
+        """Тестирование поиска одинакового видео в уроках со ссылками разного вида"""
+        data = {"title": "Short link", "video_url": "https://youtu.be/dQw4w9WgXcQ", "course": self.course.pk}
+        response = self.client.post("/lessons/create/", data=data)
+        self.assertEqual(response.json()["video_id"], "dQw4w9WgXcQ")
+        self.lesson.video_url = "https://m.youtube.com/watch?v=dQw4w9WgXcQ"
+        self.lesson.save(update_fields=["video_url"])
+        self.assertEqual(Lesson.objects.filter(video_id="dQw4w9WgXcQ").count(), 2)
+
     def test_delete_lessons(self):
         """Тестирование удаления урока"""
         response = self.client.delete(f"/lessons/{self.lesson.pk}/delete/")
@@ -100,3 +165,1004 @@ class MaterialsAPITestCase(APITestCase):
         response = self.client.post("/subscription/", data=data)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.json()["message"], "Подписка добавлена")
+
+    def test_courses_list_query_count(self):
+        """Тестирование постоянного числа запросов при выводе списка курсов"""
+        for i in range(20):
+            course = Course.objects.create(title=f"Course {i}", owner=self.user)
+            Lesson.objects.create(title=f"Lesson {i}", course=course, owner=self.user)
+        with self.assertNumQueries(3):
+            response = self.client.get("/courses/", {"page_size": 20})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["results"][0]["lesson_count"], 1)
+
+    def test_lessons_cursor_pagination(self):
+        """Тестирование курсорной пагинации списка уроков без COUNT-запроса"""
+        for i in range(5):
+            Lesson.objects.create(title=f"Lesson {i}", course=self.course, owner=self.user)
+        with self.assertNumQueries(1):
+            response = self.client.get("/lessons/", {"pagination": "cursor", "page_size": 4})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        first_page = response.json()
+        self.assertNotIn("count", first_page)
+        self.assertEqual(len(first_page["results"]), 4)
+
+        response = self.client.get(first_page["next"])
+        second_page = response.json()
+        self.assertEqual(len(second_page["results"]), 2)
+        self.assertGreater(second_page["results"][0]["id"], first_page["results"][-1]["id"])
+
+    def test_courses_cursor_pagination(self):
+        """Тестирование курсорной пагинации списка курсов"""
+        with self.assertNumQueries(2):
+            response = self.client.get("/courses/", {"pagination": "cursor"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["results"][0]["id"], self.course.pk)
+
+
+class MaterialsQueryBudgetTestCase(QueryBudgetMixin, APITestCase):
+    """
+        Бюджет SQL-запросов для маршрутов materials.urls.
+
+        Данные создаются один раз на класс и имитируют реальный объем каталога:
+        тест падает, если изменение снова добавляет запросы на каждую строку.
+        """
+    COURSES = 1000
+    LESSONS_PER_COURSE = 3
+    SUBSCRIBERS = 200
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(email="owner@example.com")
+        subscribers = User.objects.bulk_create(
+            User(email=f"subscriber{i}@example.com") for i in range(cls.SUBSCRIBERS)
+        )
+        courses = Course.objects.bulk_create(
+            Course(title=f"Course {i}", description="Description", owner=cls.user)
+            for i in range(cls.COURSES)
+        )
+        Lesson.objects.bulk_create(
+            Lesson(
+                title=f"Lesson {i}",
+                video_url="https://youtube.com/test",
+                course=course,
+                owner=cls.user,
+            )
+            for course in courses
+            for i in range(cls.LESSONS_PER_COURSE)
+        )
+        Subscription.objects.bulk_create(
+            Subscription(user=subscriber, course=course, is_active=True)
+            for subscriber in subscribers
+            for course in courses[:10]
+        )
+        call_command("recount_course_counters", stdout=StringIO())
+        cls.course = Course.objects.get(pk=courses[0].pk)
+        cls.lesson = cls.course.lessons.first()
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(user=self.user)
+
+    def test_courses_list(self):
+        self.assertBudget("get", "/courses/", 3, data={"page_size": 100})
+
+    def test_courses_list_cursor(self):
+        self.assertBudget("get", "/courses/", 2, data={"pagination": "cursor", "page_size": 100})
+
+    def test_courses_create(self):
+        self.assertBudget(
+            "post", "/courses/", 4, data={"title": "New"}, expected_status=status.HTTP_201_CREATED
+        )
+
+    def test_courses_retrieve(self):
+        self.assertBudget("get", f"/courses/{self.course.pk}/", 4)
+
+    def test_courses_update(self):
+        self.assertBudget("put", f"/courses/{self.course.pk}/", 5, data={"title": "Updated"})
+
+    def test_courses_destroy(self):
+        self.assertBudget(
+            "delete", f"/courses/{self.course.pk}/", 13, expected_status=status.HTTP_204_NO_CONTENT
+        )
+
+    def test_lessons_list(self):
+        self.assertBudget("get", "/lessons/", 2, data={"page_size": 100})
+
+    def test_lessons_list_cursor(self):
+        self.assertBudget("get", "/lessons/", 1, data={"pagination": "cursor", "page_size": 100})
+
+    def test_lessons_create(self):
+        data = {"title": "New", "video_url": "https://youtube.com/new", "course": self.course.pk}
+        self.assertBudget("post", "/lessons/create/", 3, data=data, expected_status=status.HTTP_201_CREATED)
+
+    def test_lessons_retrieve(self):
+        self.assertBudget("get", f"/lessons/{self.lesson.pk}/", 2)
+
+    def test_lessons_update(self):
+        data = {"title": "Updated", "video_url": "https://youtube.com/updated", "course": self.course.pk}
+        self.assertBudget("put", f"/lessons/{self.lesson.pk}/update/", 3, data=data)
+
+    def test_lessons_destroy(self):
+        self.assertBudget(
+            "delete", f"/lessons/{self.lesson.pk}/delete/", 5, expected_status=status.HTTP_204_NO_CONTENT
+        )
+
+    def test_subscription(self):
+        # PostgreSQL: WITH (DELETE/INSERT) и UPDATE счетчика; SQLite: DELETE, затем INSERT и UPDATE (+ SAVEPOINT)
+        budget = 4 if connection.vendor == "postgresql" else 7
+        self.assertBudget("post", "/subscription/", budget, data={"course": self.course.pk})
+
+
+class SubscriptionToggleTestCase(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(email="subscriber@example.com")
+        self.course = Course.objects.create(title="Test Course")
+        self.client.force_authenticate(user=self.user)
+
+    def test_toggle_updates_counter(self):
+        """Тестирование подписки и отписки с обновлением счетчика подписчиков"""
+        response = self.client.post("/subscription/", data={"course": self.course.pk})
+        self.assertEqual(response.json()["message"], "Подписка добавлена")
+        self.course.refresh_from_db()
+        self.assertEqual(self.course.subscriber_count, 1)
+        self.assertTrue(Subscription.objects.get(user=self.user, course=self.course).is_active)
+
+        response = self.client.post("/subscription/", data={"course": self.course.pk})
+        self.assertEqual(response.json()["message"], "Подписка удалена")
+        self.course.refresh_from_db()
+        self.assertEqual(self.course.subscriber_count, 0)
+        self.assertFalse(Subscription.objects.exists())
+
+    def test_toggle_unknown_course(self):
+        """Тестирование ответа 404 для несуществующего курса без создания подписки"""
+        for data in ({"course": 999}, {"course": "abc"}, {}):
+            response = self.client.post("/subscription/", data=data)
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertFalse(Subscription.objects.exists())
+
+    def capture_statements(self, func, *args):
+        with CaptureQueriesContext(connection) as queries:
+            result = func(*args)
+        return result, [query["sql"].split()[0] for query in queries if "SAVEPOINT" not in query["sql"]]
+
+    def test_subscribe_queries(self):
+        """Тестирование подписки за INSERT ... ON CONFLICT и UPDATE счетчика только при вставке"""
+        self.assertEqual(self.capture_statements(subscribe, self.user, self.course.pk), (True, ["INSERT", "UPDATE"]))
+        self.assertEqual(self.capture_statements(subscribe, self.user, self.course.pk), (False, ["INSERT"]))
+        self.course.refresh_from_db()
+        self.assertEqual(self.course.subscriber_count, 1)
+
+    def test_unsubscribe_queries(self):
+        """Тестирование отписки за DELETE и UPDATE счетчика только при удалении"""
+        subscribe(self.user, self.course.pk)
+        self.assertEqual(self.capture_statements(unsubscribe, self.user, self.course.pk), (True, ["DELETE", "UPDATE"]))
+        self.assertEqual(self.capture_statements(unsubscribe, self.user, self.course.pk), (False, ["DELETE"]))
+        self.course.refresh_from_db()
+        self.assertEqual(self.course.subscriber_count, 0)
+
+    @requires_postgresql
+    def test_toggle_queries(self):
+        """Тестирование переключения подписки одним запросом и UPDATE счетчика на PostgreSQL"""
+        toggle = toggle_subscription
+        self.assertEqual(self.capture_statements(toggle, self.user, self.course.pk), (True, ["WITH", "UPDATE"]))
+        self.assertEqual(self.capture_statements(toggle, self.user, self.course.pk), (False, ["WITH", "UPDATE"]))
+        with self.assertRaises(Course.DoesNotExist):
+            toggle_subscription(self.user, 999)
+        self.assertFalse(Subscription.objects.exists())
+
+
+class CourseCountersTestCase(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(email="owner@example.com")
+        self.course = Course.objects.create(title="Test Course", owner=self.user)
+        self.client.force_authenticate(user=self.user)
+
+    def test_counters_follow_create_and_delete(self):
+        """Тестирование инкрементального обновления счетчиков курса"""
+        lesson = Lesson.objects.create(title="Lesson", course=self.course)
+        Lesson.objects.create(title="Lesson 2", course=self.course)
+        Subscription.objects.create(user=self.user, course=self.course)
+        lesson.delete()
+        self.course.refresh_from_db()
+        self.assertEqual((self.course.lesson_count, self.course.subscriber_count), (1, 1))
+
+    def test_counters_follow_lesson_move(self):
+        """Тестирование счетчиков при переносе урока в другой курс"""
+        other = Course.objects.create(title="Other Course")
+        lesson = Lesson.objects.create(title="Lesson", course=self.course)
+        lesson = Lesson.objects.get(pk=lesson.pk)
+        lesson.course = other
+        lesson.save()
+        self.assertEqual(Course.objects.get(pk=self.course.pk).lesson_count, 0)
+        self.assertEqual(Course.objects.get(pk=other.pk).lesson_count, 1)
+
+    def test_recount_course_counters(self):
+        """Тестирование пересчета счетчиков и отчета о расхождениях"""
+        Lesson.objects.bulk_create([Lesson(title="Lesson", course=self.course)])
+        out = StringIO()
+        call_command("recount_course_counters", "--dry-run", stdout=out)
+        self.assertIn(f"Course {self.course.pk}: lesson_count 0 -> 1", out.getvalue())
+        self.assertEqual(Course.objects.get(pk=self.course.pk).lesson_count, 0)
+
+        call_command("recount_course_counters", stdout=StringIO())
+        self.assertEqual(Course.objects.get(pk=self.course.pk).lesson_count, 1)
+        out = StringIO()
+        call_command("recount_course_counters", stdout=out)
+        self.assertIn("No drift found.", out.getvalue())
+
+    def test_order_by_popularity(self):
+        """Тестирование сортировки курсов по числу подписчиков"""
+        popular = Course.objects.create(title="Popular Course")
+        Subscription.objects.create(user=self.user, course=popular)
+        response = self.client.get("/courses/", {"ordering": "-subscriber_count"})
+        self.assertEqual([course["id"] for course in response.json()["results"]], [popular.pk, self.course.pk])
+        self.assertEqual(response.json()["results"][0]["subscriber_count"], 1)
+
+    def test_order_by_popularity_tiebreaker(self):
+        """Тестирование устойчивого порядка курсов с одинаковым числом подписчиков"""
+        Course.objects.create(title="Another Course")
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/courses/", {"ordering": "-subscriber_count"})
+        sql = next(query["sql"] for query in queries if "ORDER BY" in query["sql"])
+        self.assertIn('ORDER BY "materials_course"."subscriber_count" DESC, "materials_course"."id" ASC', sql)
+        self.assertEqual(
+            [course["id"] for course in response.json()["results"]],
+            list(Course.objects.order_by("id").values_list("id", flat=True)),
+        )
+
+    def test_counter_change_keeps_updated_at(self):
+        """Тестирование изменения счетчика без изменения даты обновления курса"""
+        updated_at = Course.objects.get(pk=self.course.pk).updated_at
+        change_course_counter(self.course.pk, "subscriber_count", 1)
+        course = Course.objects.get(pk=self.course.pk)
+        self.assertEqual((course.subscriber_count, course.updated_at), (1, updated_at))
+
+
+class LessonImportTestCase(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(email="owner@example.com")
+        self.course = Course.objects.create(title="Test Course", owner=self.user)
+        self.client.force_authenticate(user=self.user)
+
+    def make_rows(self, count):
+        return [
+            {"title": f"Lesson {i}", "video_url": "https://youtube.com/test", "course": self.course.pk}
+            for i in range(count)
+        ]
+
+    def test_import_json_array(self):
+        """Тестирование импорта JSON-массива с ошибками в отдельных строках"""
+        rows = self.make_rows(3) + [
+            {"title": "Bad course", "video_url": "https://youtube.com/test", "course": 999},
+            {"title": "Bad url", "video_url": "https://example.com/test", "course": self.course.pk},
+            "not an object",
+        ]
+        rows[0]["video_url"] = "https://youtu.be/dQw4w9WgXcQ"
+        response = self.client.post("/lessons/import/", data=json.dumps(rows), content_type="application/json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["created"], 3)
+        self.assertEqual([error["index"] for error in response.json()["errors"]], [3, 4, 5])
+        self.assertEqual(Lesson.objects.filter(course=self.course, owner=self.user).count(), 3)
+        self.assertEqual(Lesson.objects.get(video_id="dQw4w9WgXcQ").title, "Lesson 0")
+
+    def test_import_ndjson_in_batches(self):
+        """Тестирование импорта NDJSON пачками с ограниченным числом запросов"""
+        row_count, batch_size = 10, 2
+        # На пачку: выборка курсов, SAVEPOINT, INSERT, UPDATE счетчика курса, RELEASE SAVEPOINT.
+        # Последняя пачка содержит только строку с ошибкой разбора и запросов не выполняет.
+        queries_per_batch = 5
+        body = "\n".join(json.dumps(row) for row in self.make_rows(row_count)) + "\n{broken\n"
+        with self.assertNumQueries(math.ceil(row_count / batch_size) * queries_per_batch):
+            response = self.client.post(
+                f"/lessons/import/?batch_size={batch_size}", data=body, content_type="application/x-ndjson"
+            )
+        self.assertEqual(response.json()["created"], row_count)
+        self.assertEqual(response.json()["errors"][0]["index"], row_count)
+        self.assertEqual(Lesson.objects.count(), row_count)
+
+    def test_import_malformed_json(self):
+        """Тестирование ответа 400 на некорректный JSON-массив"""
+        body = json.dumps(self.make_rows(2))[:-1]
+        response = self.client.post("/lessons/import/", data=body, content_type="application/json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("detail", response.json())
+
+    def test_import_unsupported_media_type(self):
+        """Тестирование отказа для неподдерживаемого типа данных"""
+        response = self.client.post("/lessons/import/", data="title", content_type="text/plain")
+        self.assertEqual(response.status_code, status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
+
+
+class MaterialsCacheTestCase(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(email="owner@example.com")
+        self.subscriber = User.objects.create(email="subscriber@example.com")
+        self.course = Course.objects.create(title="Test Course", owner=self.user)
+        self.lesson = Lesson.objects.create(title="Test Lesson", course=self.course, owner=self.user)
+        Subscription.objects.create(user=self.subscriber, course=self.course)
+
+    def test_courses_list_cached(self):
+        """Тестирование кеширования списка курсов с отдельным признаком подписки"""
+        self.client.force_authenticate(user=self.user)
+        self.client.get("/courses/")
+        with self.assertNumQueries(1):
+            response = self.client.get("/courses/")
+        self.assertFalse(response.json()["results"][0]["is_subscribed"])
+
+        self.client.force_authenticate(user=self.subscriber)
+        with self.assertNumQueries(1):
+            response = self.client.get("/courses/")
+        self.assertTrue(response.json()["results"][0]["is_subscribed"])
+        self.assertEqual(get_cache_stats(), {"hits": 2, "misses": 1})
+
+    def test_evicted_version_not_reused(self):
+        """Тестирование того, что вытесненный ключ версии не возвращает ответы старых версий"""
+        self.client.force_authenticate(user=self.user)
+        self.client.get("/courses/")
+        with self.captureOnCommitCallbacks(execute=True):
+            Course.objects.filter(pk=self.course.pk).update(title="Renamed")
+            bump_course_version(self.course.pk)
+        self.assertEqual(self.client.get("/courses/").json()["results"][0]["title"], "Renamed")
+
+        cache.delete(CATALOG_VERSION_KEY)
+        self.assertEqual(self.client.get("/courses/").json()["results"][0]["title"], "Renamed")
+
+    def test_course_detail_cached_and_invalidated(self):
+        """Тестирование кеширования курса и сброса кеша при изменении урока"""
+        self.client.force_authenticate(user=self.user)
+        self.client.get(f"/courses/{self.course.pk}/")
+        with self.assertNumQueries(2):
+            self.client.get(f"/courses/{self.course.pk}/")
+
+        self.lesson.title = "Updated Lesson"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.lesson.save()
+        response = self.client.get(f"/courses/{self.course.pk}/")
+        self.assertEqual(response.json()["lessons"][0]["title"], "Updated Lesson")
+
+    def test_course_detail_version_read_before_load(self):
+        """Тестирование: изменение между чтением версии и загрузкой курса не остается в кеше"""
+        get_object = CourseViewSet.get_object
+
+        def get_object_with_concurrent_write(view):
+            instance = get_object(view)
+            with self.captureOnCommitCallbacks(execute=True):
+                course = Course.objects.get(pk=self.course.pk)
+                course.title = "Updated Course"
+                course.save()
+            return instance
+
+        self.client.force_authenticate(user=self.user)
+        with patch.object(CourseViewSet, "get_object", get_object_with_concurrent_write):
+            self.assertEqual(self.client.get(f"/courses/{self.course.pk}/").json()["title"], "Test Course")
+        self.assertEqual(self.client.get(f"/courses/{self.course.pk}/").json()["title"], "Updated Course")
+
+    def test_lesson_move_invalidates_previous_course(self):
+        """Тестирование сброса кеша прежнего курса при переносе урока"""
+        other_course = Course.objects.create(title="Other Course", owner=self.user)
+        self.client.force_authenticate(user=self.user)
+        self.assertEqual(len(self.client.get(f"/courses/{self.course.pk}/").json()["lessons"]), 1)
+        self.client.get(f"/lessons/{self.lesson.pk}/")
+
+        data = {"title": "Test Lesson", "video_url": "https://youtube.com/test", "course": other_course.pk}
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.put(f"/lessons/{self.lesson.pk}/update/", data)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.client.get(f"/courses/{self.course.pk}/").json()["lessons"], [])
+        self.assertEqual(self.client.get(f"/lessons/{self.lesson.pk}/").json()["course"], other_course.pk)
+
+    def test_course_detail_cached_checks_permissions(self):
+        """Тестирование проверки прав при ответе из кеша"""
+        self.client.force_authenticate(user=self.user)
+        self.client.get(f"/courses/{self.course.pk}/")
+        self.client.force_authenticate(user=self.subscriber)
+        response = self.client.get(f"/courses/{self.course.pk}/")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_lessons_cached(self):
+        """Тестирование кеширования списка и карточки урока"""
+        self.client.force_authenticate(user=self.user)
+        self.client.get("/lessons/")
+        self.client.get(f"/lessons/{self.lesson.pk}/")
+        with self.assertNumQueries(1):
+            self.client.get("/lessons/")
+            response = self.client.get(f"/lessons/{self.lesson.pk}/")
+        self.assertEqual(response.json()["title"], "Test Lesson")
+
+
+class ConditionalGetTestCase(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(email="owner@example.com")
+        self.course = Course.objects.create(title="Test Course", owner=self.user)
+        self.lesson = Lesson.objects.create(title="Test Lesson", course=self.course, owner=self.user)
+        self.client.force_authenticate(user=self.user)
+
+    def test_course_not_modified(self):
+        """Тестирование ответа 304 для курса без сериализации"""
+        etag = self.client.get(f"/courses/{self.course.pk}/")["ETag"]
+        with self.assertNumQueries(1):
+            response = self.client.get(f"/courses/{self.course.pk}/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response["ETag"], etag)
+
+    def test_course_etag_changes_with_lessons(self):
+        """Тестирование смены ETag курса при изменении его урока"""
+        etag = self.client.get(f"/courses/{self.course.pk}/")["ETag"]
+        Lesson.objects.create(title="New Lesson", course=self.course, owner=self.user)
+        response = self.client.get(f"/courses/{self.course.pk}/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_course_not_modified_checks_permissions(self):
+        """Тестирование проверки прав перед ответом 304"""
+        etag = self.client.get(f"/courses/{self.course.pk}/")["ETag"]
+        self.client.force_authenticate(user=User.objects.create(email="other@example.com"))
+        response = self.client.get(f"/courses/{self.course.pk}/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_lesson_not_modified(self):
+        """Тестирование ответа 304 для урока и новой версии после изменения"""
+        etag = self.client.get(f"/lessons/{self.lesson.pk}/")["ETag"]
+        response = self.client.get(f"/lessons/{self.lesson.pk}/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.lesson.title = "Updated Lesson"
+        self.lesson.save()
+        response = self.client.get(f"/lessons/{self.lesson.pk}/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_etag_values_required(self):
+        """Тестирование ошибки конфигурации представления без get_etag_values"""
+        with self.assertRaises(ImproperlyConfigured):
+            type("NoEtagView", (ConditionalRetrieveMixin, generics.RetrieveAPIView), {})
+
+
+@override_settings(COURSE_UPDATE_EMAIL_BATCH_SIZE=2)
+class CourseNotificationTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.course = Course.objects.create(title="Test Course")
+        self.subscriptions = [
+            Subscription.objects.create(user=User.objects.create(email=f"user{i}@example.com"), course=self.course)
+            for i in range(5)
+        ]
+
+    def test_notify_course_subscribers(self):
+        """Тестирование пакетной рассылки всем подписчикам курса"""
+        result = notify_course_subscribers.apply(args=(self.course.pk, "курс"))
+        self.assertEqual(result.get(), 5)
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertEqual(mail.outbox[0].subject, "Обновление курса: Test Course")
+
+    def test_notify_course_subscribers_resumes(self):
+        """Тестирование продолжения рассылки после сбоя без повторной отправки"""
+        cache.set("materials:notify:retry", self.subscriptions[2].pk)
+        notify_course_subscribers.apply(args=(self.course.pk, "курс"), kwargs={"notification_key": "retry"})
+        self.assertEqual([message.to[0] for message in mail.outbox], ["user3@example.com", "user4@example.com"])
+        self.assertIsNone(cache.get("materials:notify:retry"))
+
+    @override_settings(NOTIFICATION_TASK_TIME_BUDGET=0)
+    def test_notify_course_subscribers_continues_after_time_budget(self):
+        """Тестирование передачи оставшихся писем новой задаче после исчерпания времени"""
+        with patch.object(notify_course_subscribers, "apply_async") as apply_async:
+            result = notify_course_subscribers.apply(args=(self.course.pk, "курс"), kwargs={"notification_key": "key"})
+        self.assertEqual(result.get(), 2)
+        apply_async.assert_called_once_with((self.course.pk, "курс"), {"notification_key": "key"})
+        self.assertEqual(cache.get("materials:notify:key"), self.subscriptions[1].pk)
+
+        with override_settings(NOTIFICATION_TASK_TIME_BUDGET=60):
+            notify_course_subscribers.apply(*apply_async.call_args.args)
+        self.assertEqual(len(mail.outbox), 5)
+
+    def test_claim_notification_window(self):
+        """Тестирование атомарного ограничения рассылки одним разом в 4 часа"""
+        self.assertTrue(claim_notification_window(self.course.pk))
+        self.assertFalse(claim_notification_window(self.course.pk))
+
+        Course.objects.filter(pk=self.course.pk).update(last_notified_at=timezone.now() - timedelta(hours=5))
+        self.assertTrue(claim_notification_window(self.course.pk))
+
+
+@override_settings(NOTIFICATION_OUTBOX_BATCH_SIZE=2)
+class NotificationOutboxTestCase(TestCase):
+
+    def setUp(self):
+        self.course = Course.objects.create(title="Test Course")
+
+    def test_enqueue_rolled_back_with_transaction(self):
+        """Тестирование отката уведомления и окна рассылки вместе с изменением курса"""
+        with self.assertRaises(ValueError), transaction.atomic():
+            self.assertTrue(enqueue_course_notification(self.course.pk, "курс"))
+            raise ValueError
+        self.assertFalse(NotificationOutbox.objects.exists())
+
+        self.assertTrue(enqueue_course_notification(self.course.pk, "курс"))
+        self.assertFalse(enqueue_course_notification(self.course.pk, "курс"))
+        self.assertEqual(NotificationOutbox.objects.count(), 1)
+
+    def test_relay_notification_outbox(self):
+        """Тестирование передачи уведомлений из outbox в Celery пачками"""
+        entries = [
+            NotificationOutbox.objects.create(course=self.course, update_type=f"урок {i}") for i in range(5)
+        ]
+        with patch.object(notify_course_subscribers, "delay") as delay:
+            self.assertEqual(relay_notification_outbox.apply().get(), 5)
+        self.assertEqual(
+            [call.kwargs["notification_key"] for call in delay.call_args_list],
+            [f"outbox:{entry.pk}" for entry in entries],
+        )
+        delay.assert_any_call(self.course.pk, "урок 0", notification_key=f"outbox:{entries[0].pk}")
+        self.assertFalse(NotificationOutbox.objects.exists())
+
+    def test_relay_keeps_entries_when_broker_unavailable(self):
+        """Тестирование сохранения записей outbox при недоступности брокера"""
+        NotificationOutbox.objects.create(course=self.course, update_type="курс")
+        with patch.object(notify_course_subscribers, "delay", side_effect=OperationalError), \
+                self.assertLogs("celery.app.trace", "ERROR"):
+            relay_notification_outbox.apply()
+        self.assertEqual(NotificationOutbox.objects.count(), 1)
+
+
+@override_settings(DEACTIVATE_USERS_BATCH_SIZE=2, DEACTIVATE_USERS_BATCH_PAUSE=0)
+class DeactivateInactiveUsersTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        long_ago = timezone.now() - timedelta(days=40)
+        self.inactive = [
+            User.objects.create(email=f"inactive{i}@example.com", last_login=long_ago) for i in range(5)
+        ]
+        self.active = User.objects.create(email="active@example.com", last_login=timezone.now())
+
+    def test_deactivate_inactive_users_in_batches(self):
+        """Тестирование деактивации неактивных пользователей пачками по pk"""
+        with patch("materials.tasks.time.sleep") as sleep:
+            stats = deactivate_inactive_users.apply().get()
+        self.assertEqual(stats, {"deactivated": 5, "batches": 3})
+        self.assertEqual(sleep.call_count, 2)
+        self.assertFalse(User.objects.filter(pk__in=[user.pk for user in self.inactive], is_active=True).exists())
+        self.assertTrue(User.objects.get(pk=self.active.pk).is_active)
+
+    def test_deactivate_inactive_users_rerun(self):
+        """Тестирование повторного запуска после прерванной деактивации"""
+        User.objects.filter(pk__in=[user.pk for user in self.inactive[:3]]).update(is_active=False)
+        stats = deactivate_inactive_users.apply().get()
+        self.assertEqual(stats["deactivated"], 2)
+        self.assertFalse(User.objects.filter(pk__in=[user.pk for user in self.inactive], is_active=True).exists())
+        self.assertEqual(deactivate_inactive_users.apply().get(), {"deactivated": 0, "batches": 0})
+
+
+class MultiprocessMetricsTestCase(SimpleTestCase):
+
+    def run_python(self, code, directory):
+        env = {**os.environ, "PROMETHEUS_MULTIPROC_DIR": directory}
+        return subprocess.run(
+            [sys.executable, "-c", code], env=env, check=True, capture_output=True, text=True, timeout=60
+        ).stdout
+
+    def test_metrics_aggregated_across_processes(self):
+        """Тестирование суммирования метрик процессов через общий каталог PROMETHEUS_MULTIPROC_DIR"""
+        increment = (
+            "from config.metrics import REGISTRY; "
+            "REGISTRY.counter('test_jobs', 'Jobs.', ('kind',)).inc(kind='import')"
+        )
+        render = (
+            "from config.metrics import REGISTRY; "
+            "REGISTRY.counter('test_jobs', 'Jobs.', ('kind',)); print(REGISTRY.render())"
+        )
+        with tempfile.TemporaryDirectory() as directory:
+            self.run_python(increment, directory)
+            self.run_python(increment, directory)
+            self.assertIn('test_jobs_total{kind="import"} 2.0', self.run_python(render, directory))
+
+
+@override_settings(PERFORMANCE_METRICS_ENABLED=True, PERFORMANCE_METRICS_SAMPLE_RATE=1.0)
+class PerformanceMetricsTestCase(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(email="user@example.com")
+        self.course = Course.objects.create(title="Course", owner=self.user)
+        self.client.force_authenticate(user=self.user)
+
+    def test_request_metrics_recorded_per_view(self):
+        """Тестирование записи метрик запроса по имени представления"""
+        view = "materials:courses-list"
+        requests = REQUEST_DURATION.get_count(view=view, method="GET")
+        renders = RENDER_DURATION.get_count(view=view)
+        serializations = SERIALIZER_DURATION.get_count(view=view)
+        response = self.client.get("/courses/")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(REQUEST_DURATION.get_count(view=view, method="GET"), requests + 1)
+        self.assertEqual(RENDER_DURATION.get_count(view=view), renders + 1)
+        self.assertEqual(SERIALIZER_DURATION.get_count(view=view), serializations + 1)
+        self.assertGreater(DB_QUERIES.get_count(view=view), 0)
+        self.assertGreater(RESPONSE_SIZE.get_count(view=view), 0)
+
+        metrics = self.client.get("/metrics").content.decode()
+        self.assertIn('http_request_db_queries_count{view="materials:courses-list"}', metrics)
+        self.assertIn("materials_cache_misses 1", metrics)
+
+    def test_cached_response_not_serialized(self):
+        """Тестирование отдельного замера сериализации: ответ из кеша не сериализуется заново"""
+        view = "materials:courses-list"
+        self.client.get("/courses/")
+        serializations = SERIALIZER_DURATION.get_count(view=view)
+        renders = RENDER_DURATION.get_count(view=view)
+        self.client.get("/courses/")
+        self.assertEqual(SERIALIZER_DURATION.get_count(view=view), serializations)
+        self.assertEqual(RENDER_DURATION.get_count(view=view), renders + 1)
+
+    def test_metrics_restricted_to_allowed_networks(self):
+        """Тестирование доступа к /metrics только из сетей METRICS_ALLOWED_NETWORKS"""
+        self.assertEqual(self.client.get("/metrics", REMOTE_ADDR="10.0.0.5").status_code, status.HTTP_403_FORBIDDEN)
+        with override_settings(METRICS_ALLOWED_NETWORKS=["10.0.0.0/8"]):
+            self.assertEqual(self.client.get("/metrics", REMOTE_ADDR="10.0.0.5").status_code, status.HTTP_200_OK)
+            self.assertEqual(self.client.get("/metrics").status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_duplicate_queries_logged(self):
+        """Тестирование записи в лог повторяющихся запросов (N+1)"""
+        def view(request):
+            for course_id in range(6):
+                list(Course.objects.filter(pk__in=[course_id, self.course.pk]))
+            return HttpResponse("ok")
+
+        middleware = PerformanceMetricsMiddleware(view)
+        with self.assertLogs("config.middleware", "WARNING") as logs:
+            middleware(RequestFactory().get("/"))
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn("Duplicate query in unresolved executed 6 times", logs.output[0])
+        self.assertIn("IN (...)", logs.output[0])
+
+    @override_settings(PERFORMANCE_METRICS_SAMPLE_RATE=0.0)
+    def test_unsampled_request_not_recorded(self):
+        """Тестирование пропуска запросов вне выборки"""
+        count = REQUEST_DURATION.get_count(view="materials:courses-list", method="GET")
+        self.client.get("/courses/")
+        self.assertEqual(REQUEST_DURATION.get_count(view="materials:courses-list", method="GET"), count)
+
+    @override_settings(PERFORMANCE_METRICS_ENABLED=False)
+    def test_middleware_disabled(self):
+        """Тестирование отключения middleware настройкой"""
+        with self.assertRaises(MiddlewareNotUsed):
+            PerformanceMetricsMiddleware(lambda request: HttpResponse())
+
+
+class FakeSMTPHandler(socketserver.StreamRequestHandler):
+    """Фейковый SMTP-сервер: отклоняет адреса rejected@..., может разорвать соединение после N писем."""
+    connections = []
+    messages = []
+    disconnect_after = None
+    busy_once = set()
+
+    def reply(self, line):
+        self.wfile.write(line.encode() + b"\r\n")
+
+    def handle(self):
+        self.connections.append(self.client_address[1])
+        received = 0
+        self.reply("220 localhost ESMTP")
+        while line := self.rfile.readline().decode():
+            command = line[:4].upper()
+            if command == "QUIT":
+                self.reply("221 Bye")
+                return
+            address = line[line.find("<") + 1:line.find(">")]
+            if command == "RCPT" and "rejected@" in line:
+                self.reply("550 No such user")
+            elif command == "RCPT" and address in self.busy_once:
+                self.busy_once.discard(address)
+                self.reply("451 Try again later")
+            elif command == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                while self.rfile.readline() != b".\r\n":
+                    pass
+                self.messages.append(self.client_address[1])
+                self.reply("250 OK")
+                received += 1
+                if received == self.disconnect_after:
+                    return
+            else:
+                self.reply("250 OK")
+
+
+class MailingTestCase(TestCase):
+    """
+        Доставка писем через SMTP-соединение потока против локального фейкового сервера.
+        """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), FakeSMTPHandler)
+        cls.server.daemon_threads = True
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        FakeSMTPHandler.connections = []
+        FakeSMTPHandler.messages = []
+        FakeSMTPHandler.disconnect_after = None
+        FakeSMTPHandler.busy_once = set()
+        self.template = CourseUpdateTemplate("Test Course", "курс")
+        smtp_settings = override_settings(
+            EMAIL_BACKEND="django.core.mail.backends.smtp.EmailBackend",
+            EMAIL_HOST="127.0.0.1",
+            EMAIL_PORT=self.server.server_address[1],
+            EMAIL_USE_TLS=False,
+            EMAIL_HOST_USER="",
+        )
+        smtp_settings.enable()
+        self.addCleanup(smtp_settings.disable)
+
+    def test_connection_reused_between_deliveries(self):
+        """Тестирование отправки писем нескольких задач через одно SMTP-соединение"""
+        for i in range(3):
+            deliver([self.template.personalize(f"user{i}@example.com")])
+        self.assertEqual(len(FakeSMTPHandler.connections), 1)
+        self.assertEqual(len(FakeSMTPHandler.messages), 3)
+
+    def test_rejected_recipient_status(self):
+        """Тестирование статуса доставки каждого письма при отказе сервера по одному адресу"""
+        emails = ["user@example.com", "rejected@example.com", "other@example.com"]
+        with self.assertLogs("materials.mailing", "WARNING"):
+            results = deliver(self.template.personalize(email) for email in emails)
+        self.assertEqual([result["status"] for result in results], ["sent", "failed", "sent"])
+        self.assertIn("550", results[1]["error"])
+        self.assertEqual(len(FakeSMTPHandler.connections), 1)
+
+    def test_permanent_errors(self):
+        """Тестирование разделения постоянных и временных отказов сервера"""
+        self.assertTrue(is_permanent_error(SMTPRecipientsRefused({"a@example.com": (550, b"No such user")})))
+        self.assertFalse(is_permanent_error(SMTPRecipientsRefused({"a@example.com": (452, b"Mailbox full")})))
+        self.assertFalse(is_permanent_error(SMTPSenderRefused(550, b"Sender rejected", NOTIFICATION_FROM_EMAIL)))
+
+    def test_temporary_recipient_error_resumes_after_last_sent(self):
+        """Тестирование повтора рассылки с письма, на котором сервер вернул временную ошибку"""
+        course = Course.objects.create(title="Test Course")
+        emails = ["user0@example.com", "user1@example.com", "busy@example.com", "user3@example.com"]
+        for email in emails:
+            Subscription.objects.create(user=User.objects.create(email=email), course=course)
+        FakeSMTPHandler.busy_once = {"busy@example.com"}
+
+        with patch("celery.app.task.Task.retry", wraps=notify_course_subscribers.retry) as retry:
+            result = notify_course_subscribers.apply(args=(course.pk, "курс"))
+        self.assertEqual(retry.call_count, 1)
+        self.assertEqual(result.get(), 2)
+        self.assertEqual(len(FakeSMTPHandler.messages), len(emails))
+
+    def test_reconnect_after_server_disconnect(self):
+        """Тестирование переподключения после разрыва соединения сервером"""
+        FakeSMTPHandler.disconnect_after = 2
+        results = deliver(self.template.personalize(f"user{i}@example.com") for i in range(3))
+        self.assertEqual([result["status"] for result in results], ["sent"] * 3)
+        self.assertEqual(len(FakeSMTPHandler.connections), 2)
+
+    def test_benchmark_mail_command(self):
+        """Тестирование сравнения способов отправки командой benchmark_mail"""
+        out = StringIO()
+        call_command("benchmark_mail", "--backend", "smtp", "--count", "3", "--port", self.server.server_address[1],
+                     stdout=out)
+        self.assertIn("send_mail: 3/3 sent", out.getvalue())
+        self.assertIn("pooled: 3/3 sent", out.getvalue())
+        self.assertEqual(len(FakeSMTPHandler.connections), 4)
+
+
+class CeleryMetricsTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.course = Course.objects.create(title="Test Course")
+        Subscription.objects.create(user=User.objects.create(email="user@example.com"), course=self.course)
+
+    def test_task_runtime_recorded(self):
+        """Тестирование записи времени выполнения задачи по имени и состоянию"""
+        name = deactivate_inactive_users.name
+        count = TASK_RUNTIME.get_count(task=name, state="SUCCESS")
+        deactivate_inactive_users.apply()
+        self.assertEqual(TASK_RUNTIME.get_count(task=name, state="SUCCESS"), count + 1)
+
+    def test_task_failure_recorded(self):
+        """Тестирование подсчета ошибок задачи по типу исключения"""
+        name = send_course_update_email.name
+        failures = TASK_FAILURES.get(task=name, exception="ValueError")
+        with patch("materials.tasks.deliver", side_effect=ValueError), self.assertLogs("celery.app.trace", "ERROR"):
+            send_course_update_email.apply(args=("user@example.com", "Test Course", "курс"))
+        self.assertEqual(TASK_FAILURES.get(task=name, exception="ValueError"), failures + 1)
+        self.assertGreater(TASK_RUNTIME.get_count(task=name, state="FAILURE"), 0)
+
+    def test_task_retry_recorded(self):
+        """Тестирование подсчета повторов задачи"""
+        name = notify_course_subscribers.name
+        retries = TASK_RETRIES.get(task=name)
+        outcomes = [SMTPException, None]
+
+        def deliver(messages, results):
+            if outcomes.pop(0) is SMTPException:
+                raise SMTPException
+            results.extend({"to": ", ".join(message.to), "status": "sent", "error": None} for message in messages)
+            return results
+
+        with patch("materials.tasks.deliver", side_effect=deliver):
+            result = notify_course_subscribers.apply(args=(self.course.pk, "курс"))
+        self.assertEqual(result.get(), 1)
+        self.assertEqual(TASK_RETRIES.get(task=name), retries + 1)
+
+
+class CeleryWorkerMetricsTestCase(TransactionTestCase):
+    """
+        Метрики воркера Celery с брокером в памяти.
+
+        Тестовый воркер закрывает соединения с БД, поэтому тест выполняется вне
+        транзакции TestCase: иначе на PostgreSQL следующие тесты получают закрытое соединение.
+        """
+
+    def test_queue_depth_and_wait_with_memory_broker(self):
+        """Тестирование глубины очереди и времени ожидания задачи через брокер в памяти"""
+        name = send_course_update_email.name
+        waits = TASK_QUEUE_WAIT.get_count(task=name)
+        broker_url = celery_app.conf.broker_url
+        celery_app.conf.update(CELERY_BROKER_URL="memory://")
+        self.addCleanup(celery_app.conf.update, CELERY_BROKER_URL=broker_url)
+        # worker_init регистрирует сборщик глубины очереди - после теста он не нужен
+        self.addCleanup(setattr, REGISTRY, "_collectors", list(REGISTRY._collectors))
+
+        send_course_update_email.delay("user@example.com", "Test Course", "курс")
+        with self.assertLogs("config.celery_metrics", "WARNING") as logs:
+            collect_queue_depth(celery_app)
+        self.assertEqual(QUEUE_DEPTH.get(queue="notifications"), 1)
+        # Очередь payments не объявлена: ошибка записывается в лог, остальные очереди собираются
+        self.assertTrue(any("Queue depth of payments is not collected" in line for line in logs.output))
+
+        with start_worker(celery_app, pool="solo", perform_ping_check=False):
+            deadline = time.monotonic() + 10
+            while TASK_QUEUE_WAIT.get_count(task=name) == waits and time.monotonic() < deadline:
+                time.sleep(0.05)
+        self.assertEqual(TASK_QUEUE_WAIT.get_count(task=name), waits + 1)
+        collect_queue_depth(celery_app)
+        self.assertEqual(QUEUE_DEPTH.get(queue="notifications"), 0)
+        self.assertIn("celery_task_queue_wait_seconds_count", self.client.get("/metrics").content.decode())
+
+    def test_prefork_child_marked_dead_on_shutdown(self):
+        """Тестирование исключения завершившегося дочернего процесса из общих метрик"""
+        with patch.dict(os.environ, {"PROMETHEUS_MULTIPROC_DIR": "/tmp/metrics"}), \
+                patch("config.celery_metrics.multiprocess.mark_process_dead") as mark_process_dead:
+            worker_process_shutdown.send(sender=None, pid=os.getpid(), exitcode=0)
+        mark_process_dead.assert_called_once_with(os.getpid())
+
+
+class CeleryRoutingTestCase(SimpleTestCase):
+
+    def test_tasks_routed_to_queues(self):
+        """Тестирование распределения задач по очередям рассылок, обслуживания и платежей"""
+        routes = {
+            "materials.tasks.send_course_update_email": "notifications",
+            "materials.tasks.notify_course_subscribers": "notifications",
+            "materials.tasks.relay_notification_outbox": "outbox",
+            "materials.tasks.deactivate_inactive_users": "maintenance",
+            "users.tasks.create_checkout_session": "payments",
+            "config.unknown_task": "default",
+        }
+        for task_name, queue in routes.items():
+            with self.subTest(task=task_name):
+                self.assertEqual(celery_app.amqp.router.route({}, task_name)["queue"].name, queue)
+
+    def test_visibility_timeout_exceeds_task_limits(self):
+        """Тестирование возврата сообщения Redis в очередь не раньше завершения самой долгой задачи"""
+        visibility_timeout = settings.CELERY_BROKER_TRANSPORT_OPTIONS["visibility_timeout"]
+        self.assertGreater(visibility_timeout, settings.CELERY_TASK_TIME_LIMIT)
+        longest_batch = settings.COURSE_UPDATE_EMAIL_BATCH_SIZE * settings.EMAIL_TIMEOUT
+        self.assertGreater(visibility_timeout, settings.NOTIFICATION_TASK_TIME_BUDGET + longest_batch)
+
+    def test_outbox_relay_expires(self):
+        """Тестирование отбрасывания просроченных запусков передачи outbox"""
+        entry = settings.CELERY_BEAT_SCHEDULE["relay-notification-outbox"]
+        self.assertEqual(entry["options"]["expires"], settings.NOTIFICATION_OUTBOX_RELAY_INTERVAL)
+
+    def test_notification_rate_limit(self):
+        """Тестирование ограничения частоты задач рассылки"""
+        self.assertEqual(send_course_update_email.rate_limit, "10/s")
+        self.assertTrue(send_course_update_email.acks_late)
+
+
+class UrlValidatorTestCase(SimpleTestCase):
+    validator = UrlValidator(field="video_url")
+
+    def test_valid_urls(self):
+        """Тестирование допустимых ссылок и пустого значения"""
+        for url in ("https://youtube.com/test", "youtube.com/test", "https://youtu.be/dQw4w9WgXcQ", None, ""):
+            self.validator({"video_url": url})
+        self.validator({"title": "Lesson"})
+
+    def test_invalid_urls(self):
+        """Тестирование отказа для сторонних сайтов"""
+        urls = (
+            "https://example.com/test", "https://youtube.com.evil.com/x", "https://youtube.com/", "ftp://youtube.com/x"
+        )
+        for url in urls:
+            with self.assertRaises(serializers.ValidationError):
+                self.validator({"video_url": url})
+
+    @override_settings(YOUTUBE_ALLOWED_HOSTS=("example.com",))
+    def test_allowed_hosts_from_settings(self):
+        """Тестирование списка разрешенных хостов из настроек"""
+        self.validator({"video_url": "https://example.com/test"})
+        with self.assertRaises(serializers.ValidationError):
+            self.validator({"video_url": "https://youtube.com/test"})
+
+    def test_extract_video_id(self):
+        """Тестирование приведения ссылок разных видов к ID видео"""
+        urls = (
+            "https://www.youtube.com/watch?v=dQw4w9WgXcQ",
+            "https://m.youtube.com/watch?feature=share&v=dQw4w9WgXcQ",
+            "youtu.be/dQw4w9WgXcQ?t=10",
+            "https://www.youtube.com/embed/dQw4w9WgXcQ",
+            "https://youtube.com/shorts/dQw4w9WgXcQ",
+        )
+        for url in urls:
+            self.assertEqual(extract_youtube_video_id(url), "dQw4w9WgXcQ", url)
+        self.assertIsNone(extract_youtube_video_id("https://youtube.com/test"))
+        self.assertIsNone(extract_youtube_video_id("https://example.com/watch?v=dQw4w9WgXcQ"))
+
+    def test_benchmark_urls_command(self):
+        """Тестирование сравнения разбора ссылок командой benchmark_urls"""
+        out = StringIO()
+        call_command("benchmark_urls", "--count", "10", stdout=out)
+        self.assertIn("per-call re.compile: 60 calls", out.getvalue())
+        self.assertIn("precompiled: 60 calls", out.getvalue())
+
+
+@requires_postgresql
+class IndexUsageTestCase(IndexUsageMixin, APITestCase):
+    """
+        Проверка, что запросы рассылки и подписки materials используют индексы PostgreSQL.
+        """
+    COURSES = 200
+    SUBSCRIBERS = 50
+
+    @classmethod
+    def setUpTestData(cls):
+        owner = User.objects.create(email="owner@example.com")
+        subscribers = User.objects.bulk_create(
+            User(email=f"subscriber{i}@example.com") for i in range(cls.SUBSCRIBERS)
+        )
+        courses = Course.objects.bulk_create(Course(title=f"Course {i}", owner=owner) for i in range(cls.COURSES))
+        Subscription.objects.bulk_create(
+            Subscription(user=subscriber, course=course) for subscriber in subscribers for course in courses
+        )
+        cls.analyze(User, Course, Subscription)
+        cls.course = courses[0]
+        cls.user = subscribers[0]
+
+    def test_subscribers_fan_out_uses_course_index(self):
+        """Тестирование выборки подписчиков задачей рассылки по индексу (course, id) без сортировки"""
+        sql = self.capture_query(
+            'FROM "materials_subscription"', notify_course_subscribers.apply, args=(self.course.pk, "курс")
+        )
+        self.assertUsesIndex(sql, "subscription_course_id_idx")
+
+    def test_unsubscribe_uses_unique_index(self):
+        """Тестирование отмены подписки по уникальному индексу (user, course)"""
+        self.client.force_authenticate(user=self.user)
+        sql = self.capture_query(
+            'DELETE FROM "materials_subscription"', self.client.post, "/subscription/", {"course": self.course.pk}
+        )
+        self.assertUsesIndex(sql, "_uniq")
@@ -1,7 +1,8 @@
 from rest_framework.routers import DefaultRouter
 from materials.apps import MaterialsConfig
 from materials.views import (CourseViewSet, LessonCreateAPIView, LessonListAPIView, LessonRetrieveAPIView,
-                             LessonUpdateAPIView, LessonDestroyAPIView, SubscriptionCreateAPIView)
+                             LessonUpdateAPIView, LessonDestroyAPIView, SubscriptionCreateAPIView,
+                             LessonImportAPIView)
 from django.urls import path
 
 app_name = MaterialsConfig.name
@@ -12,6 +13,7 @@ router.register(r'courses', CourseViewSet, basename='courses')
 
 urlpatterns = [
     path("lessons/create/", LessonCreateAPIView.as_view(), name="lesson-create"),
+    path("lessons/import/", LessonImportAPIView.as_view(), name="lesson-import"),
     path("lessons/", LessonListAPIView.as_view(), name="lesson-list"),
     path("lessons/<int:pk>/", LessonRetrieveAPIView.as_view(), name="lesson-get"),
     path(
@@ -1,11 +1,70 @@
 import re
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
 from rest_framework import serializers
 
+# Регулярные выражения компилируются один раз при импорте модуля
+URL_RE = re.compile(r"(?:https?://)?(?P<host>[^/?#:]+)(?::\d+)?(?P<rest>[/?#].*)?$", re.DOTALL)
+# Хост и непустой путь после него - все, что нужно валидатору
+VALID_URL_RE = re.compile(r"(?:https?://)?(?P<host>[^/?#:]+)(?::\d+)?[/?#].", re.DOTALL)
+VIDEO_ID = r"(?P<video_id>[A-Za-z0-9_-]{11})"
+VIDEO_ID_PATTERNS = (
+    re.compile(rf"^/(?:embed|shorts|live|v)/{VIDEO_ID}(?:[/?#]|$)"),
+    re.compile(rf"^/watch/?\?(?:.*&)?v={VIDEO_ID}(?:[&#]|$)"),
+)
+SHORT_LINK_PATTERN = re.compile(rf"^/{VIDEO_ID}(?:[/?#]|$)")
+SHORT_LINK_HOSTS = frozenset({"youtu.be"})
+
+
+@lru_cache(maxsize=1)
+def get_allowed_hosts():
+    """Возвращает множество разрешенных хостов из настройки YOUTUBE_ALLOWED_HOSTS."""
+    return frozenset(host.lower() for host in settings.YOUTUBE_ALLOWED_HOSTS)
+
+
+@receiver(setting_changed)
+def reset_allowed_hosts(setting, **kwargs):
+    if setting == "YOUTUBE_ALLOWED_HOSTS":
+        get_allowed_hosts.cache_clear()
+
+
+def extract_youtube_video_id(url):
+    """
+    Возвращает ID видео YouTube из ссылки любого поддерживаемого вида.
+
+    Поддерживаются youtube.com/watch?v=, m.youtube.com, youtu.be/, /embed/, /shorts/, /live/ и /v/.
+    Позволяет находить одинаковые видео в разных уроках независимо от формы ссылки.
+
+    Аргументы
+    - url (str): Ссылка на видео.
+
+    Результат
+    - str | None: ID видео или None, если ссылка не ведет на видео YouTube.
+    """
+    match = URL_RE.match(url or "")
+    if match is None:
+        return None
+    host = match["host"].lower()
+    if host not in get_allowed_hosts():
+        return None
+    rest = match["rest"] or ""
+    patterns = (SHORT_LINK_PATTERN,) if host in SHORT_LINK_HOSTS else VIDEO_ID_PATTERNS
+    for pattern in patterns:
+        video_match = pattern.match(rest)
+        if video_match:
+            return video_match["video_id"]
+    return None
+
 
 class UrlValidator:
     """
     Валидатор для проверки, что поле содержит корректный URL-адрес YouTube.
     Запрещает размещение ссылок на сторонние образовательные платформы или личные сайты.
+
+    Допустимые хосты задаются настройкой YOUTUBE_ALLOWED_HOSTS.
     """
 
     def __init__(self, field):
@@ -20,6 +79,7 @@ class UrlValidator:
     def __call__(self, value):
         """
         Проверяет, что значение поля соответствует формату URL YouTube.
+        Пустое значение пропускается, так как поле необязательное.
 
         Аргументы
         - value (dict): Словарь со значениями полей.
@@ -27,12 +87,12 @@ class UrlValidator:
         Исключения
         - serializers.ValidationError: Если значение не является URL YouTube.
         """
-        # Компилируем регулярное выражение для поиска URL YouTube
-        reg = re.compile("^(https?://)?(www.)?youtube.com/.+$")
-        # Получаем значение поля для проверки
-        tmp_val = dict(value).get(self.field)
-        # Если значение не соответствует шаблону — выбрасываем ошибку
-        if not bool(reg.match(tmp_val)):
+        url = value.get(self.field)
+        if not url:
+            return
+        match = VALID_URL_RE.match(url)
+        # Ссылка должна вести на разрешенный хост и содержать путь
+        if match is None or match["host"].lower() not in get_allowed_hosts():
             raise serializers.ValidationError(
                 "Неверный URL-адрес. Пожалуйста, укажите правильный URL-адрес YouTube."
                 "Нельзя размещать ссылки на сторонние образовательные платформы или личные сайты"
@@ -1,32 +1,106 @@
-from django.http import JsonResponse
+from io import BytesIO
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, Max, OuterRef, Value
+from django.http import Http404, JsonResponse
 from django.shortcuts import get_object_or_404
-from rest_framework import generics, viewsets
+from django_filters.rest_framework import DjangoFilterBackend
+from rest_framework import generics, status, viewsets
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.viewsets import ModelViewSet
+from materials.bulk_import import import_lessons, iter_json_array, iter_ndjson
+from materials.cache import get_lesson_version
+from materials.filters import StableOrderingFilter
+from materials.mixins import CachedResponseMixin, ConditionalRetrieveMixin
 from materials.models import Course, Lesson, Subscription
 from materials.paginators import CustomPagination
 from materials.serializers import CourseSerializer, LessonSerializer, SubscriptionSerializer
 from users.permissions import IsModerators, IsOwner
-from django.utils import timezone
-from datetime import timedelta
-from .tasks import send_course_update_email
+from .services import enqueue_course_notification, toggle_subscription
 
 
-class CourseViewSet(ModelViewSet):
+class CourseViewSet(ConditionalRetrieveMixin, CachedResponseMixin, ModelViewSet):
     """
         ViewSet для работы с курсами.
 
         Реализует стандартные CRUD-операции (создание, получение, изменение, удаление).
-        Использует пагинацию и настраиваемые permissions для разных типов запросов.
+        Использует пагинацию (в том числе курсорную, ?pagination=cursor) и настраиваемые permissions
+        для разных типов запросов. Ответы list и retrieve кешируются, признак is_subscribed
+        подставляется для каждого пользователя отдельно. retrieve поддерживает ETag и If-None-Match.
+        Сортировка по популярности: ?ordering=-subscriber_count (по индексу).
 
         Методы
+        - get_queryset: Возвращает курсы с аннотациями для сериализатора.
+        - get_etag_values: Возвращает версию курса для ETag.
+        - personalize: Заполняет is_subscribed в ответе из кеша.
         - get_permissions: Определяет права доступа для текущего действия (action).
         """
     queryset = Course.objects.all()
     serializer_class = CourseSerializer
     pagination_class = CustomPagination
+    filter_backends = [DjangoFilterBackend, StableOrderingFilter]
+    ordering_fields = ("id", "subscriber_count", "lesson_count")
+    ordering = ("id",)
+    cache_prefix = "materials:courses"
+    permission_object_attrs = ("owner_id",)
+    personal_fields = ("is_subscribed",)
+
+    def get_subscription_annotation(self):
+        """
+                Возвращает выражение-признак подписки текущего пользователя на курс.
+                """
+        user = self.request.user
+        if user.is_authenticated:
+            return Exists(Subscription.objects.filter(course=OuterRef("pk"), user=user))
+        return Value(False)
+
+    def get_queryset(self):
+        """
+                Добавляет к курсам признак подписки текущего пользователя и подгружает уроки
+                одним запросом, чтобы число запросов не зависело от размера страницы.
+                """
+        return (
+            super()
+            .get_queryset()
+            .annotate(is_subscribed=self.get_subscription_annotation())
+            .prefetch_related("lessons")
+            .order_by("id")
+        )
+
+    def get_etag_values(self, request, pk):
+        """
+                Возвращает версию курса одним запросом: время изменения курса и его уроков,
+                счетчики курса и признак подписки текущего пользователя.
+                """
+        return (
+            Course.objects.filter(pk=pk)
+            .annotate(
+                lessons_updated_at=Max("lessons__updated_at"),
+                is_subscribed=self.get_subscription_annotation(),
+            )
+            .values(
+                "pk", "owner_id", "updated_at", "lessons_updated_at", "lesson_count", "subscriber_count",
+                "is_subscribed",
+            )
+            .first()
+        )
+
+    def personalize(self, request, items):
+        """
+                Заполняет is_subscribed одним запросом для всех курсов из ответа.
+                """
+        if not request.user.is_authenticated:
+            return
+        subscribed = set(
+            Subscription.objects.filter(
+                user=request.user, course_id__in=[item["id"] for item in items]
+            ).values_list("course_id", flat=True)
+        )
+        for item in items:
+            item["is_subscribed"] = item["id"] in subscribed
 
     def get_permissions(self):
         """
@@ -48,23 +122,14 @@ class CourseViewSet(ModelViewSet):
 
     def update_course(request, course_id):
         course = get_object_or_404(Course, id=course_id)
-        now = timezone.now()
-
-        # Проверка времени последнего обновления (например, поле course.last_updated)
-        if course.last_updated and (now - course.last_updated) < timedelta(hours=4):
-            # Только сохраняем изменения, рассылку не делаем
-            course.save()
+        # Уведомление пишется в outbox в той же транзакции, что и изменение курса;
+        # рассылка не чаще раза в 4 часа: окно занимается атомарным UPDATE
+        with transaction.atomic():
+            course.save(update_fields=["updated_at"])
+            notified = enqueue_course_notification(course.id, "курс")
+        if not notified:
             return JsonResponse({'status': 'updated without notification'})
 
-        # Обновление курса
-        course.last_updated = now
-        course.save()
-
-        # Получение подписчиков курса
-        subscribers = course.subscriptions.all()
-        for subscriber in subscribers:
-            send_course_update_email.delay(subscriber.user.email, course.title, "курс")
-
         return JsonResponse({'status': 'update and notification sent'})
 
     # def get_permissions(self):
@@ -103,25 +168,15 @@ class LessonViewSet(viewsets.ModelViewSet):
 
     def update_lesson(request, course_id, lesson_id):
         course = get_object_or_404(Course, id=course_id)
-        now = timezone.now()
-
-        # Проверка на отправку уведомления (раз в 4 часа для курса)
-        if course.last_updated and (now - course.last_updated) < timedelta(hours=4):
-            # Только сохранить обновление урока
-            lesson = get_object_or_404(Lesson, id=lesson_id)
+        lesson = get_object_or_404(Lesson, id=lesson_id)
+        # Уведомление (раз в 4 часа для курса) пишется в outbox в транзакции изменения урока
+        with transaction.atomic():
             lesson.save()
+            course.save(update_fields=["updated_at"])
+            notified = enqueue_course_notification(course.id, f"урок {lesson.title}")
+        if not notified:
             return JsonResponse({'status': 'lesson updated, no notification'})
 
-        # Обновить урок и курс, рассылка
-        lesson = get_object_or_404(Lesson, id=lesson_id)
-        lesson.save()
-        course.last_updated = now
-        course.save()
-
-        subscribers = course.subscriptions.all()
-        for subscriber in subscribers:
-            send_course_update_email.delay(subscriber.user.email, course.title, f"урок {lesson.title}")
-
         return JsonResponse({'status': 'lesson updated, notification sent'})
 
 
@@ -133,22 +188,68 @@ class LessonCreateAPIView(generics.CreateAPIView):
     serializer_class = LessonSerializer
 
 
-class LessonListAPIView(generics.ListAPIView):
+class LessonImportAPIView(APIView):
+    """
+        Представление для массового импорта уроков.
+
+        Принимает JSON-массив (application/json) или NDJSON (application/x-ndjson),
+        читает тело запроса потоково и создает уроки пачками через bulk_create.
+        Размер пачки задается параметром ?batch_size= (не больше LESSON_IMPORT_MAX_BATCH_SIZE).
+        Владельцем уроков становится текущий пользователь.
+
+        Возвращает количество созданных уроков и ошибки по каждой невалидной строке.
+        """
+    parsers = {
+        "application/json": iter_json_array,
+        "application/x-ndjson": iter_ndjson,
+    }
+
+    def post(self, request, *args, **kwargs):
+        media_type = request.content_type.split(";")[0].strip()
+        parser = self.parsers.get(media_type)
+        if parser is None:
+            return Response(
+                {"detail": f"Неподдерживаемый тип данных: {media_type}."},
+                status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            )
+        try:
+            batch_size = int(request.query_params.get("batch_size", settings.LESSON_IMPORT_BATCH_SIZE))
+        except ValueError:
+            return Response({"detail": "batch_size должен быть числом."}, status=status.HTTP_400_BAD_REQUEST)
+        batch_size = min(max(batch_size, 1), settings.LESSON_IMPORT_MAX_BATCH_SIZE)
+
+        result = import_lessons(parser(request.stream or BytesIO()), request.user, batch_size)
+        if "detail" in result:
+            return Response(result, status=status.HTTP_400_BAD_REQUEST)
+        return Response(result)
+
+
+class LessonListAPIView(CachedResponseMixin, generics.ListAPIView):
     """
         Представление для просмотра списка всех уроков с поддержкой пагинации.
+        Для больших таблиц доступен курсорный режим (?pagination=cursor). Ответы кешируются.
         """
-    queryset = Lesson.objects.all()
+    cache_prefix = "materials:lessons"
+    queryset = Lesson.objects.order_by("id")
     serializer_class = LessonSerializer
     pagination_class = CustomPagination
 
 
-class LessonRetrieveAPIView(generics.RetrieveAPIView):
+class LessonRetrieveAPIView(ConditionalRetrieveMixin, CachedResponseMixin, generics.RetrieveAPIView):
     """
-        Представление для просмотра одного конкретного урока.
+        Представление для просмотра одного конкретного урока. Ответ кешируется по версии урока,
+        поддерживаются ETag и If-None-Match.
         """
+    cache_prefix = "materials:lessons"
     queryset = Lesson.objects.all()
     serializer_class = LessonSerializer
 
+    def get_etag_values(self, request, pk):
+        return Lesson.objects.filter(pk=pk).values("pk", "updated_at").first()
+
+    def get_cache_version(self, pk):
+        return get_lesson_version(pk)
+
 
 class LessonUpdateAPIView(generics.UpdateAPIView):
     """
@@ -173,6 +274,7 @@ class ToggleSubscriptionAPIView(APIView):
         POST-запрос с course_id:
         - Если подписка уже существует, она удаляется.
         - Если подписки нет, она создается.
+        Переключение выполняется атомарно (см. toggle_subscription).
 
         Возвращает сообщение об успешном действии.
         """
@@ -182,17 +284,11 @@ class ToggleSubscriptionAPIView(APIView):
         """
                 Обрабатывает подписку/отписку пользователя на курс по course_id.
                 """
-        user = request.user
-        course_id = request.data.get('course_id')
-        course_item = get_object_or_404(Course, pk=course_id)
-        subs_item = Subscription.objects.filter(user=user, course=course_item)
-
-        if subs_item.exists():
-            subs_item.delete()
-            message = 'подписка удалена'
-        else:
-            Subscription.objects.create(user=user, course=course_item)
-            message = 'подписка добавлена'
+        try:
+            subscribed = toggle_subscription(request.user, int(request.data.get('course_id')))
+        except (TypeError, ValueError, Course.DoesNotExist):
+            raise Http404
+        message = 'подписка добавлена' if subscribed else 'подписка удалена'
 
         return Response({"message": message})
 
@@ -207,19 +303,13 @@ class SubscriptionCreateAPIView(generics.CreateAPIView):
 
     def post(self, request, *args, **kwargs):
         """
-                Создание подписки, если она ещё не оформлена.
-                Если подписка уже есть, можно реализовать возврат соответствующего сообщения.
+                Создание подписки, если она ещё не оформлена, иначе её удаление.
+                Переключение выполняется атомарно (см. toggle_subscription).
                 """
-        user = self.request.user
-        course_id = self.request.data.get("course")
-        course_item = get_object_or_404(Course, id=course_id)
-        subs_item = Subscription.objects.filter(user=user, course=course_item)
-
-        if subs_item.exists():
-            subs_item.delete()
-            message = "Подписка удалена"
-        else:
-            Subscription.objects.create(user=user, course=course_item, is_active=True)
-            message = "Подписка добавлена"
+        try:
+            subscribed = toggle_subscription(self.request.user, int(self.request.data.get("course")), is_active=True)
+        except (TypeError, ValueError, Course.DoesNotExist):
+            raise Http404
+        message = "Подписка добавлена" if subscribed else "Подписка удалена"
 
         return Response({"message": message})
@@ -0,0 +1,70 @@
+import csv
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+EXPORT_FIELDS = (
+    "id",
+    "user_id",
+    "payment_date",
+    "paid_course_id",
+    "paid_lesson_id",
+    "payment_amount",
+    "payment_method",
+    "status",
+    "session_id",
+)
+CONTENT_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+
+
+class Echo:
+    """Псевдо-буфер для csv.writer: возвращает записанную строку вместо хранения."""
+
+    def write(self, value):
+        return value
+
+
+def iter_rows(queryset, chunk_size):
+    """Читает платежи с сервера БД частями по chunk_size строк, не кешируя queryset."""
+    return queryset.order_by("pk").values_list(*EXPORT_FIELDS).iterator(chunk_size=chunk_size)
+
+
+def iter_csv(queryset, chunk_size):
+    """Построчно формирует CSV с заголовком."""
+    writer = csv.writer(Echo())
+    yield writer.writerow(EXPORT_FIELDS)
+    for row in iter_rows(queryset, chunk_size):
+        yield writer.writerow(row)
+
+
+def iter_ndjson(queryset, chunk_size):
+    """Построчно формирует NDJSON: по одному JSON-объекту платежа в строке."""
+    encoder = DjangoJSONEncoder(ensure_ascii=False)
+    for row in iter_rows(queryset, chunk_size):
+        yield encoder.encode(dict(zip(EXPORT_FIELDS, row))) + "\n"
+
+
+EXPORTERS = {
+    "csv": iter_csv,
+    "ndjson": iter_ndjson,
+}
+
+
+def export_payments(queryset, fmt, chunk_size):
+    """
+    Возвращает генератор строк выгрузки платежей в формате fmt.
+
+    Память не зависит от числа строк: данные читаются iterator(chunk_size)
+    и сразу отдаются клиенту через StreamingHttpResponse.
+
+    Аргументы
+    - queryset (QuerySet): Отфильтрованные платежи.
+    - fmt (str): Формат выгрузки - "csv" или "ndjson".
+    - chunk_size (int): Количество строк, читаемых из БД за раз.
+
+    Результат
+    - Iterator[str]: Строки выгрузки.
+    """
+    return EXPORTERS[fmt](queryset, chunk_size)
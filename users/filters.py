@@ -1,12 +1,15 @@
 from django_filters import rest_framework as filters
-from .models import Payment
+from .models import Payments
 
 
 class PaymentFilter(filters.FilterSet):
     paid_course = filters.NumberFilter(field_name='paid_course_id')
     paid_lesson = filters.NumberFilter(field_name='paid_lesson_id')
-    payment_method = filters.ChoiceFilter(choices=Payment.PAYMENT_METHOD_CHOICES)
+    payment_method = filters.ChoiceFilter(choices=Payments.METHOD_CHOICES)
+    status = filters.ChoiceFilter(choices=Payments.STATUS_CHOICES)
+    date_from = filters.IsoDateTimeFilter(field_name='payment_date', lookup_expr='gte')
+    date_to = filters.IsoDateTimeFilter(field_name='payment_date', lookup_expr='lt')
 
     class Meta:
-        model = Payment
-        fields = ['paid_course', 'paid_lesson', 'payment_method']
+        model = Payments
+        fields = ['paid_course', 'paid_lesson', 'payment_method', 'status', 'date_from', 'date_to']
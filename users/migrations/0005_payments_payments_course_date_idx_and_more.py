@@ -0,0 +1,42 @@
+# Generated by Django 5.1.7 on 2026-10-17 23:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("auth", "0012_alter_user_first_name_max_length"),
+        ("materials", "0010_subscription_course_id_idx"),
+        ("users", "0004_payments"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="payments",
+            index=models.Index(
+                fields=["paid_course", "payment_date"], name="payments_course_date_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="payments",
+            index=models.Index(
+                fields=["paid_lesson", "payment_date"], name="payments_lesson_date_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="payments",
+            index=models.Index(
+                fields=["payment_method", "payment_date"],
+                name="payments_method_date_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="user",
+            index=models.Index(
+                condition=models.Q(("is_active", True)),
+                fields=["last_login"],
+                name="user_active_last_login_idx",
+            ),
+        ),
+    ]
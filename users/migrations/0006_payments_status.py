@@ -0,0 +1,27 @@
+# Generated by Django 5.1.7 on 2026-10-17 23:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0005_payments_payments_course_date_idx_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="payments",
+            name="status",
+            field=models.CharField(
+                choices=[
+                    ("pending", "Ожидает ссылку на оплату"),
+                    ("ready", "Ссылка на оплату готова"),
+                    ("failed", "Ошибка"),
+                ],
+                default="pending",
+                max_length=10,
+                verbose_name="Статус",
+            ),
+        ),
+    ]
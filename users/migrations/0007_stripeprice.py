@@ -0,0 +1,82 @@
+# Generated by Django 5.1.7 on 2026-10-17 23:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("materials", "0010_subscription_course_id_idx"),
+        ("users", "0006_payments_status"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StripePrice",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("amount", models.PositiveIntegerField(verbose_name="Сумма")),
+                (
+                    "product_id",
+                    models.CharField(max_length=255, verbose_name="ID продукта"),
+                ),
+                ("price_id", models.CharField(max_length=255, verbose_name="ID цены")),
+                (
+                    "created_at",
+                    models.DateTimeField(
+                        auto_now_add=True, verbose_name="Дата создания"
+                    ),
+                ),
+                (
+                    "paid_course",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="stripe_prices",
+                        to="materials.course",
+                        verbose_name="Курс",
+                    ),
+                ),
+                (
+                    "paid_lesson",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="stripe_prices",
+                        to="materials.lesson",
+                        verbose_name="Урок",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Цена Stripe",
+                "verbose_name_plural": "Цены Stripe",
+                "constraints": [
+                    models.UniqueConstraint(
+                        condition=models.Q(("paid_course__isnull", False)),
+                        fields=("paid_course", "amount"),
+                        name="stripe_price_course_amount_uniq",
+                    ),
+                    models.UniqueConstraint(
+                        condition=models.Q(
+                            ("paid_course__isnull", True),
+                            ("paid_lesson__isnull", False),
+                        ),
+                        fields=("paid_lesson", "amount"),
+                        name="stripe_price_lesson_amount_uniq",
+                    ),
+                ],
+            },
+        ),
+    ]
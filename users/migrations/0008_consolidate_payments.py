@@ -0,0 +1,144 @@
+from decimal import Decimal
+
+import django.core.validators
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+BATCH_SIZE = 1000
+METHODS = {"cash": "Наличные", "transfer": "Перевод на счет"}
+LEGACY_METHODS = {value: key for key, value in METHODS.items()}
+
+
+def copy_payments(apps, schema_editor):
+    """Переносит записи Payment в журнал Payments без изменения сумм и запоминает их исходные ID."""
+    Payment = apps.get_model("users", "Payment")
+    Payments = apps.get_model("users", "Payments")
+    Payments.objects.filter(payment_date__isnull=True).update(payment_date=timezone.now())
+
+    batch = []
+    for payment in Payment.objects.order_by("pk").iterator(chunk_size=BATCH_SIZE):
+        batch.append(
+            Payments(
+                user_id=payment.user_id,
+                payment_date=payment.date,
+                paid_course_id=payment.paid_course_id,
+                paid_lesson_id=payment.paid_lesson_id,
+                payment_amount=payment.amount,
+                payment_method=METHODS.get(payment.payment_method, payment.payment_method),
+                status="ready",
+                legacy_payment_id=payment.pk,
+            )
+        )
+        if len(batch) >= BATCH_SIZE:
+            Payments.objects.bulk_create(batch)
+            batch = []
+    Payments.objects.bulk_create(batch)
+    # Следующие операции меняют таблицу, а PostgreSQL не выполняет ALTER TABLE при отложенных проверках
+    # внешних ключей вставленных строк: проверки выполняются сразу
+    schema_editor.connection.check_constraints()
+
+
+def restore_payments(apps, schema_editor):
+    """Возвращает перенесенные записи в Payment с исходными ID и удаляет их из Payments."""
+    Payment = apps.get_model("users", "Payment")
+    Payments = apps.get_model("users", "Payments")
+    migrated = Payments.objects.filter(legacy_payment_id__isnull=False).order_by("pk")
+
+    batch = []
+    for payment in migrated.iterator(chunk_size=BATCH_SIZE):
+        batch.append(
+            Payment(
+                pk=payment.legacy_payment_id,
+                user_id=payment.user_id,
+                date=payment.payment_date,
+                paid_course_id=payment.paid_course_id,
+                paid_lesson_id=payment.paid_lesson_id,
+                amount=payment.payment_amount,
+                payment_method=LEGACY_METHODS.get(payment.payment_method, payment.payment_method),
+            )
+        )
+        if len(batch) >= BATCH_SIZE:
+            restore_batch(Payment, batch)
+            batch = []
+    restore_batch(Payment, batch)
+    migrated.delete()
+    schema_editor.connection.check_constraints()
+
+
+def restore_batch(Payment, batch):
+    # date объявлено с auto_now_add, поэтому bulk_create подставляет текущее время: исходное время
+    # оплаты записывается отдельно, bulk_update не вызывает pre_save
+    dates = [payment.date for payment in batch]
+    Payment.objects.bulk_create(batch)
+    for payment, date in zip(batch, dates):
+        payment.date = date
+    Payment.objects.bulk_update(batch, ["date"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('materials', '0010_subscription_course_id_idx'),
+        ('users', '0007_stripeprice'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='payments',
+            name='payment_amount',
+            field=models.DecimalField(
+                decimal_places=2, max_digits=10, verbose_name='Сумма оплаты',
+                validators=[django.core.validators.MinValueValidator(Decimal('0'))],
+            ),
+        ),
+        migrations.AlterField(
+            model_name='stripeprice',
+            name='amount',
+            field=models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Сумма'),
+        ),
+        migrations.AddField(
+            model_name='payments',
+            name='legacy_payment_id',
+            field=models.PositiveBigIntegerField(
+                blank=True, editable=False, null=True, verbose_name='ID записи бывшей модели Payment'
+            ),
+        ),
+        migrations.AlterField(
+            model_name='payments',
+            name='payment_date',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Дата оплаты'),
+        ),
+        migrations.RunPython(copy_payments, restore_payments),
+        migrations.AlterField(
+            model_name='payments',
+            name='payment_date',
+            field=models.DateTimeField(auto_now_add=True, verbose_name='Дата оплаты'),
+        ),
+        migrations.DeleteModel(
+            name='Payment',
+        ),
+        migrations.AlterField(
+            model_name='payments',
+            name='paid_course',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE,
+                                    related_name='payments', to='materials.course', verbose_name='Оплаченный курс'),
+        ),
+        migrations.AlterField(
+            model_name='payments',
+            name='paid_lesson',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE,
+                                    related_name='payments', to='materials.lesson', verbose_name='Оплаченный урок'),
+        ),
+        migrations.AlterField(
+            model_name='payments',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='payments',
+                                    to=settings.AUTH_USER_MODEL, verbose_name='Пользователь'),
+        ),
+        migrations.AddIndex(
+            model_name='payments',
+            index=models.Index(fields=['user', 'payment_date'], name='payments_user_date_idx'),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.1.7 on 2026-10-17 23:37
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("materials", "0011_notificationoutbox"),
+        ("users", "0008_consolidate_payments"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="payments",
+            name="paid_course",
+            field=models.ForeignKey(
+                blank=True,
+                db_index=False,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="payments",
+                to="materials.course",
+                verbose_name="Оплаченный курс",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="payments",
+            name="paid_lesson",
+            field=models.ForeignKey(
+                blank=True,
+                db_index=False,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="payments",
+                to="materials.lesson",
+                verbose_name="Оплаченный урок",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="payments",
+            name="user",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="payments",
+                to=settings.AUTH_USER_MODEL,
+                verbose_name="Пользователь",
+            ),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.1.7 on 2026-10-17 23:47
+
+import uuid
+
+from django.db import migrations, models
+
+
+BATCH_SIZE = 1000
+
+
+def fill_idempotency_keys(apps, schema_editor):
+    # default вычисляется один раз на всю AddField, поэтому существующим платежам ключ выдается отдельно
+    Payments = apps.get_model("users", "Payments")
+    batch = []
+    for payment in Payments.objects.only("pk").iterator(chunk_size=BATCH_SIZE):
+        payment.idempotency_key = uuid.uuid4()
+        batch.append(payment)
+        if len(batch) == BATCH_SIZE:
+            Payments.objects.bulk_update(batch, ["idempotency_key"])
+            batch = []
+    if batch:
+        Payments.objects.bulk_update(batch, ["idempotency_key"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0009_drop_payments_fk_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="payments",
+            name="idempotency_key",
+            field=models.UUIDField(editable=False, null=True, verbose_name="Ключ идемпотентности Stripe"),
+        ),
+        migrations.RunPython(fill_idempotency_keys, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="payments",
+            name="idempotency_key",
+            field=models.UUIDField(
+                default=uuid.uuid4,
+                editable=False,
+                verbose_name="Ключ идемпотентности Stripe",
+            ),
+        ),
+    ]
@@ -1,5 +1,8 @@
-from django.conf import settings
+import uuid
+from decimal import Decimal
+
 from django.contrib.auth.models import AbstractUser
+from django.core.validators import MinValueValidator
 from django.db import models
 
 from materials.models import Course, Lesson
@@ -39,102 +42,78 @@ class User(AbstractUser):
     class Meta:
         verbose_name = "Пользователь"
         verbose_name_plural = "Пользователи"
-
-
-class Payment(models.Model):
-    PAYMENT_METHOD_CHOICES = [
-        ('cash', 'Наличные'),
-        ('transfer', 'Перевод на счет'),
-    ]
-
-    user = models.ForeignKey(
-        settings.AUTH_USER_MODEL,
-        on_delete=models.CASCADE,
-        verbose_name="Пользователь",
-        related_name='payments'
-    )
-    date = models.DateTimeField(auto_now_add=True, verbose_name="Дата оплаты")
-    paid_course = models.ForeignKey(
-        Course,
-        on_delete=models.CASCADE,
-        verbose_name="Оплаченный курс",
-        blank=True,
-        null=True
-    )
-    paid_lesson = models.ForeignKey(
-        Lesson,
-        on_delete=models.CASCADE,
-        verbose_name="Оплаченный урок",
-        blank=True,
-        null=True
-    )
-    amount = models.DecimalField(
-        max_digits=10,
-        decimal_places=2,
-        verbose_name="Сумма оплаты"
-    )
-    payment_method = models.CharField(
-        max_length=10,
-        choices=PAYMENT_METHOD_CHOICES,
-        verbose_name="Способ оплаты"
-    )
-
-    class Meta:
-        verbose_name = "Платеж"
-        verbose_name_plural = "Платежи"
+        indexes = [
+            models.Index(
+                fields=["last_login"], condition=models.Q(is_active=True), name="user_active_last_login_idx"
+            ),
+        ]
 
 
 class Payments(models.Model):
     """
     Модель для хранения информации о платежах, произведенных пользователями за курсы или уроки.
+    Единый журнал платежей: сюда же перенесены записи бывшей модели Payment.
 
     Атрибуты:
         CASH (str): Строковое представление оплаты наличными.
         TRANSFER_TO_AN_ACCOUNT (str): Строковое представление оплаты переводом на счет.
         METHOD_CHOICES (tuple): Набор возможных способов оплаты.
         user (User): Ссылка на пользователя, совершившего оплату.
-        payment_date (date): Дата совершения платежа (заполняется автоматически).
+        payment_date (datetime): Дата и время совершения платежа (заполняется при создании).
         paid_course (Course): Ссылка на оплаченный курс (может быть пустым, если оплачен урок).
         paid_lesson (Lesson): Ссылка на оплаченный урок (может быть пустым, если оплачен курс).
-        payment_amount (int): Сумма оплаты (в целых единицах).
+        payment_amount (Decimal): Сумма оплаты (с копейками).
         payment_method (str): Способ оплаты (наличные или перевод на счет).
         payment_url (str): Ссылка на платежную сессию или квитанцию (необязательна).
         session_id (str): Идентификатор платежной сессии (необязателен).
+        status (str): Состояние создания платежной сессии Stripe (ожидание, готова, ошибка).
+        legacy_payment_id (int): ID записи бывшей модели Payment (нужен для отката миграции 0008).
+        idempotency_key (UUID): Основа ключей идемпотентности запросов Stripe для платежа,
+            уникальная между окружениями (pk платежей в них повторяются).
     """
     CASH = "Наличные"
     TRANSFER_TO_AN_ACCOUNT = "Перевод на счет"
 
     METHOD_CHOICES = ((CASH, "Наличные"), (TRANSFER_TO_AN_ACCOUNT, "Перевод на счет"))
 
+    PENDING = "pending"
+    READY = "ready"
+    FAILED = "failed"
+
+    STATUS_CHOICES = ((PENDING, "Ожидает ссылку на оплату"), (READY, "Ссылка на оплату готова"), (FAILED, "Ошибка"))
+
     user = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
-        related_name="users",
+        related_name="payments",
         verbose_name="Пользователь",
+        db_index=False,
     )
-    payment_date = models.DateField(
-        auto_now=True,
+    payment_date = models.DateTimeField(
+        auto_now_add=True,
         verbose_name="Дата оплаты",
-        null=True,
-        blank=True,
     )
     paid_course = models.ForeignKey(
         Course,
         on_delete=models.CASCADE,
-        related_name="courses",
+        related_name="payments",
         verbose_name="Оплаченный курс",
+        db_index=False,
         null=True,
         blank=True,
     )
     paid_lesson = models.ForeignKey(
         Lesson,
         on_delete=models.CASCADE,
-        related_name="lessons",
+        related_name="payments",
         verbose_name="Оплаченный урок",
+        db_index=False,
         null=True,
         blank=True,
     )
-    payment_amount = models.PositiveIntegerField(verbose_name="Сумма оплаты")
+    payment_amount = models.DecimalField(
+        max_digits=10, decimal_places=2, verbose_name="Сумма оплаты", validators=[MinValueValidator(Decimal("0"))]
+    )
     payment_method = models.CharField(
         max_length=50, verbose_name="Способ оплаты", choices=METHOD_CHOICES
     )
@@ -144,6 +123,15 @@ class Payments(models.Model):
     session_id = models.CharField(
         max_length=255, verbose_name="ID сессии", blank=True, null=True
     )
+    status = models.CharField(
+        max_length=10, verbose_name="Статус", choices=STATUS_CHOICES, default=PENDING
+    )
+    legacy_payment_id = models.PositiveBigIntegerField(
+        null=True, blank=True, editable=False, verbose_name="ID записи бывшей модели Payment"
+    )
+    idempotency_key = models.UUIDField(
+        default=uuid.uuid4, editable=False, verbose_name="Ключ идемпотентности Stripe"
+    )
 
     def __str__(self):
         """
@@ -157,3 +145,65 @@ class Payments(models.Model):
     class Meta:
         verbose_name = "Платеж"
         verbose_name_plural = "Платежи"
+        # Составные индексы начинаются с внешних ключей и заменяют их одиночные индексы
+        indexes = [
+            models.Index(fields=["user", "payment_date"], name="payments_user_date_idx"),
+            models.Index(fields=["paid_course", "payment_date"], name="payments_course_date_idx"),
+            models.Index(fields=["paid_lesson", "payment_date"], name="payments_lesson_date_idx"),
+            models.Index(fields=["payment_method", "payment_date"], name="payments_method_date_idx"),
+        ]
+
+
+class StripePrice(models.Model):
+    """
+    Цена Stripe, созданная для курса или урока с определенной суммой.
+
+    Позволяет переиспользовать продукт и цену Stripe для всех платежей за один
+    курс (урок) с той же суммой: на каждый платеж создается только платежная сессия.
+
+    Атрибуты:
+        paid_course (Course): Курс, для которого создана цена (пусто, если цена урока).
+        paid_lesson (Lesson): Урок, для которого создана цена (пусто, если цена курса).
+        amount (Decimal): Сумма (с копейками).
+        product_id (str): ID продукта в Stripe.
+        price_id (str): ID цены в Stripe.
+    """
+    paid_course = models.ForeignKey(
+        Course,
+        on_delete=models.CASCADE,
+        related_name="stripe_prices",
+        verbose_name="Курс",
+        null=True,
+        blank=True,
+    )
+    paid_lesson = models.ForeignKey(
+        Lesson,
+        on_delete=models.CASCADE,
+        related_name="stripe_prices",
+        verbose_name="Урок",
+        null=True,
+        blank=True,
+    )
+    amount = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Сумма")
+    product_id = models.CharField(max_length=255, verbose_name="ID продукта")
+    price_id = models.CharField(max_length=255, verbose_name="ID цены")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
+
+    def __str__(self):
+        return f"{self.paid_course or self.paid_lesson} - {self.amount}"
+
+    class Meta:
+        verbose_name = "Цена Stripe"
+        verbose_name_plural = "Цены Stripe"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["paid_course", "amount"],
+                condition=models.Q(paid_course__isnull=False),
+                name="stripe_price_course_amount_uniq",
+            ),
+            models.UniqueConstraint(
+                fields=["paid_lesson", "amount"],
+                condition=models.Q(paid_course__isnull=True, paid_lesson__isnull=False),
+                name="stripe_price_lesson_amount_uniq",
+            ),
+        ]
@@ -1,17 +1,47 @@
+from django.conf import settings
+from django.core.cache import cache
 from rest_framework import permissions
 
+MODERATORS_GROUP = "Moderators"
+
+
+def moderator_cache_key(user_id):
+    """Возвращает ключ кеша с признаком членства пользователя в группе модераторов."""
+    return f"users:{user_id}:is_moderator"
+
+
+def is_moderator(request):
+    """
+    Проверяет членство пользователя в группе модераторов.
+
+    Результат запоминается на объекте запроса и в кеше на MODERATORS_CACHE_TIMEOUT секунд,
+    поэтому повторные проверки не обращаются к базе данных. Кеш сбрасывается
+    сигналом m2m_changed при изменении групп пользователя.
+    """
+    user = request.user
+    if not user.is_authenticated:
+        return False
+    if not hasattr(request, "_is_moderator"):
+        key = moderator_cache_key(user.pk)
+        value = cache.get(key)
+        if value is None:
+            value = user.groups.filter(name=MODERATORS_GROUP).exists()
+            cache.set(key, value, settings.MODERATORS_CACHE_TIMEOUT)
+        request._is_moderator = value
+    return request._is_moderator
+
 
 class IsModerators(permissions.BasePermission):
     """Проверяет, относится ли пользователь группе модераторов."""
 
     def has_permission(self, request, view):
-        return request.user.groups.filter(name="Moderators").exists()
+        return is_moderator(request)
 
 
 class IsOwner(permissions.BasePermission):
     """Проверяет, является ли пользователь владельцем."""
 
     def has_object_permission(self, request, view, obj):
-        if obj.owner == request.user:
+        if request.user.is_authenticated and obj.owner_id == request.user.pk:
             return True
         return False
@@ -0,0 +1,66 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Avg, Count, F, Sum
+from django.db.models.functions import TruncDay, TruncMonth
+
+from materials.cache import bump_versions, get_version
+
+REPORT_VERSION_KEY = "users:payments:report:version"
+GROUPINGS = {
+    "course": F("paid_course_id"),
+    "lesson": F("paid_lesson_id"),
+    "method": F("payment_method"),
+    "day": TruncDay("payment_date"),
+    "month": TruncMonth("payment_date"),
+}
+
+
+def bump_report_version():
+    """Делает недействительными все закешированные отчеты по платежам после фиксации транзакции."""
+    bump_versions(REPORT_VERSION_KEY)
+
+
+def build_report(queryset, group_by):
+    """
+    Считает сумму, количество и средний платеж по группам одним GROUP BY-запросом.
+
+    Аргументы
+    - queryset (QuerySet): Отфильтрованные платежи.
+    - group_by (str): Группировка - course, lesson, method, day или month.
+
+    Результат
+    - list[dict]: [{"key": ..., "total": int, "count": int, "average": float}, ...] по возрастанию key.
+    """
+    return [
+        {"key": row["key"], "total": row["total"], "count": row["count"], "average": float(row["average"])}
+        for row in queryset.order_by()
+        .annotate(key=GROUPINGS[group_by])
+        .values("key")
+        .annotate(total=Sum("payment_amount"), count=Count("id"), average=Avg("payment_amount"))
+        .order_by("key")
+    ]
+
+
+def get_report(queryset, group_by, params):
+    """
+    Возвращает отчет из кеша или строит его.
+
+    Ключ кеша строится из версии отчетов и параметров запроса; версия увеличивается
+    сигналом post_save платежей, удалением пользователя, курса или урока (платежи
+    удаляются каскадом) и задачей create_checkout_session, которая меняет статус
+    платежа через update().
+
+    Аргументы
+    - queryset (QuerySet): Отфильтрованные платежи.
+    - group_by (str): Группировка.
+    - params (QueryDict): Параметры запроса, определяющие фильтры.
+    """
+    digest = hashlib.md5(repr(sorted(params.lists())).encode()).hexdigest()
+    key = f"users:payments:report:{get_version(REPORT_VERSION_KEY)}:{group_by}:{digest}"
+    report = cache.get(key)
+    if report is None:
+        report = build_report(queryset, group_by)
+        cache.set(key, report, settings.PAYMENTS_REPORT_CACHE_TIMEOUT)
+    return report
@@ -1,23 +1,82 @@
 from rest_framework import serializers
-from .models import Payment, User
+from rest_framework.permissions import SAFE_METHODS
+from .models import Payments, User
 from rest_framework.serializers import ModelSerializer
 
+from config.middleware import TimedSerializerMixin
 
-class PaymentSerializer(serializers.ModelSerializer):
+
+class PaymentsSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    """
+        Сериализатор для модели Payments.
+
+        Пользователь, ссылка на оплату, ID сессии и статус заполняются на сервере.
+        """
+    class Meta:
+        model = Payments
+        fields = "__all__"
+        read_only_fields = ("user", "payment_url", "session_id", "status")
+
+
+def get_requested_fields(request):
+    """
+    Возвращает множество полей из параметра ?fields=id,email или None, если параметр не передан.
+
+    Параметр учитывается только для чтения (GET, HEAD, OPTIONS): при записи сокращенный
+    сериализатор молча отбросил бы поля запроса, например пароль при регистрации.
+    """
+    if request is None or request.method not in SAFE_METHODS:
+        return None
+    value = request.query_params.get("fields")
+    if not value:
+        return None
+    return {name.strip() for name in value.split(",") if name.strip()}
+
+
+class SparseFieldsetMixin:
+    """
+        Оставляет в ответе на запрос чтения только поля, перечисленные в параметре ?fields=.
+
+        Неизвестные имена игнорируются; если не найдено ни одного поля, ответ не сокращается.
+        """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        requested = get_requested_fields(self.context.get("request"))
+        if requested and requested & set(self.fields):
+            for name in set(self.fields) - requested:
+                self.fields.pop(name)
+
+
+class ProfilePaymentSerializer(serializers.ModelSerializer):
+    """Краткое представление платежа в профиле пользователя."""
     class Meta:
-        model = Payment
-        fields = ['id', 'amount', 'date', 'paid_course', 'paid_lesson', 'payment_method']
+        model = Payments
+        fields = ("id", "payment_date", "paid_course", "paid_lesson", "payment_amount", "payment_method", "status")
+
 
+class UserProfileSerializer(TimedSerializerMixin, SparseFieldsetMixin, serializers.ModelSerializer):
+    """
+        Профиль пользователя с историей платежей.
 
-class UserProfileSerializer(serializers.ModelSerializer):
-    payments = PaymentSerializer(many=True, read_only=True)
+        Платежи должны быть предзагружены представлением (prefetch_related), иначе
+        каждый профиль в списке выполнит отдельный запрос.
+        """
+    payments = ProfilePaymentSerializer(many=True, read_only=True)
 
     class Meta:
         model = User
-        fields = ['id', 'username', 'email', 'payments']
+        fields = ("id", "email", "phone", "city", "avatar", "payments")
 
 
-class UserSerializer(ModelSerializer):
+class UserSerializer(TimedSerializerMixin, SparseFieldsetMixin, ModelSerializer):
+    """
+        Сериализатор пользователя.
+
+        Поля перечислены явно: хеш пароля, группы и права в ответ не попадают,
+        пароль принимается только на запись.
+        """
     class Meta:
         model = User
-        fields = "__all__"
+        fields = ("id", "email", "password", "phone", "city", "avatar")
+        extra_kwargs = {"password": {"write_only": True}}
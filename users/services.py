@@ -1,7 +1,72 @@
+import time
+from functools import cache as memoize
+from urllib.parse import urlsplit
+
+import requests
 import stripe
-from config.settings import STRIPE_API_KEY
+from django.conf import settings
+from django.core.cache import cache
+from django.core.signals import setting_changed
+from django.db import IntegrityError, transaction
+from django.dispatch import receiver
+from requests.adapters import HTTPAdapter
+
+from config.metrics import REGISTRY
+from users.models import StripePrice
+
+STRIPE_REQUEST_DURATION = REGISTRY.histogram(
+    "stripe_request_duration_seconds",
+    "Длительность запросов к API Stripe (каждая попытка отдельно).",
+    ("method", "endpoint", "status"),
+)
+
+
+class InstrumentedRequestsClient(stripe.RequestsClient):
+    """HTTP-клиент Stripe, записывающий длительность каждой попытки запроса в гистограмму."""
+
+    def request(self, method, url, headers, post_data=None):
+        started = time.perf_counter()
+        status = "error"
+        try:
+            content, status, response_headers = super().request(method, url, headers, post_data)
+            return content, status, response_headers
+        finally:
+            STRIPE_REQUEST_DURATION.observe(
+                time.perf_counter() - started, method=method.upper(), endpoint=urlsplit(url).path, status=status
+            )
+
+
+@memoize
+def get_stripe_client():
+    """
+    Возвращает клиент Stripe процесса с пулом keep-alive соединений.
+
+    Одна сессия requests переиспользует TCP/TLS-соединения между запросами.
+    Таймаут, число повторов сетевых ошибок и размер пула задаются настройками
+    STRIPE_TIMEOUT, STRIPE_MAX_NETWORK_RETRIES и STRIPE_POOL_SIZE. Повторы выполняет
+    сам клиент Stripe с экспоненциальной задержкой и случайным разбросом (jitter).
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=settings.STRIPE_POOL_SIZE)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return stripe.StripeClient(
+        settings.STRIPE_API_KEY,
+        base_addresses={"api": settings.STRIPE_API_BASE},
+        max_network_retries=settings.STRIPE_MAX_NETWORK_RETRIES,
+        http_client=InstrumentedRequestsClient(timeout=settings.STRIPE_TIMEOUT, session=session),
+    )
+
+
+@receiver(setting_changed)
+def reset_stripe_client(setting, **kwargs):
+    if setting.startswith("STRIPE_"):
+        get_stripe_client.cache_clear()
 
-stripe.api_key = STRIPE_API_KEY
+
+def idempotency_key(payment, operation):
+    """Возвращает ключ идемпотентности запроса Stripe для платежа (повтор не создаст дубликат)."""
+    return f"payment-{payment.idempotency_key}-{operation}"
 
 
 def create_product_in_stripe(instance):
@@ -9,25 +74,84 @@ def create_product_in_stripe(instance):
     title_product = (
         f"{instance.paid_course}" if instance.paid_course else f"{instance.paid_lesson}"
     )
-    stripe_product = stripe.Product.create(name=f"{title_product}")
+    stripe_product = get_stripe_client().products.create(
+        params={"name": f"{title_product}"},
+        options={"idempotency_key": idempotency_key(instance, "product")},
+    )
     return stripe_product.get("id")
 
 
-def create_price_in_stripe(stripe_product_id, amount):
+def create_price_in_stripe(stripe_product_id, amount, key=None):
     """Создаёт цену в Stripe API."""
-    return stripe.Price.create(
-        currency="rub",
-        unit_amount=amount * 100,
-        product=stripe_product_id,
+    return get_stripe_client().prices.create(
+        params={
+            "currency": "rub",
+            "unit_amount": int(amount * 100),
+            "product": stripe_product_id,
+        },
+        options={"idempotency_key": key} if key else {},
     )
 
 
-def create_session_in_stripe(price):
+def stripe_price_cache_key(payment):
+    """Возвращает ключ кеша цены Stripe для курса (урока) и суммы платежа."""
+    if payment.paid_course_id:
+        return f"users:stripe_price:course:{payment.paid_course_id}:{payment.payment_amount}"
+    return f"users:stripe_price:lesson:{payment.paid_lesson_id}:{payment.payment_amount}"
+
+
+def get_stripe_price_id(payment):
+    """
+    Возвращает ID цены Stripe для платежа, создавая продукт и цену только при первом обращении.
+
+    Соответствие курс (урок) + сумма -> цена хранится в таблице StripePrice и кешируется,
+    поэтому для повторных платежей за тот же курс в Stripe создается только платежная сессия.
+
+    Аргументы
+    - payment (Payments): Платеж.
+
+    Результат
+    - str: ID цены в Stripe.
+    """
+    if not payment.paid_course_id and not payment.paid_lesson_id:
+        product_id = create_product_in_stripe(payment)
+        return create_price_in_stripe(product_id, payment.payment_amount, idempotency_key(payment, "price")).get("id")
+
+    key = stripe_price_cache_key(payment)
+    price_id = cache.get(key)
+    if price_id is not None:
+        return price_id
+
+    lookup = {"amount": payment.payment_amount}
+    if payment.paid_course_id:
+        lookup["paid_course_id"] = payment.paid_course_id
+    else:
+        lookup.update(paid_course_id=None, paid_lesson_id=payment.paid_lesson_id)
+    price_id = StripePrice.objects.filter(**lookup).values_list("price_id", flat=True).first()
+    if price_id is None:
+        product_id = create_product_in_stripe(payment)
+        price_id = create_price_in_stripe(
+            product_id, payment.payment_amount, idempotency_key(payment, "price")
+        ).get("id")
+        try:
+            with transaction.atomic():
+                StripePrice.objects.create(product_id=product_id, price_id=price_id, **lookup)
+        except IntegrityError:
+            # Параллельная задача уже сохранила цену - используем ее
+            price_id = StripePrice.objects.filter(**lookup).values_list("price_id", flat=True).get()
+    cache.set(key, price_id, settings.STRIPE_PRICE_CACHE_TIMEOUT)
+    return price_id
+
+
+def create_session_in_stripe(price_id, key=None):
     """Создаёт сессию на оплату в Stripe API."""
-    session = stripe.checkout.Session.create(
-        success_url="http://127.0.0.1:8000/users/payments/",
-        line_items=[{"price": price.get("id"), "quantity": 1}],
-        mode="payment",
+    session = get_stripe_client().checkout.sessions.create(
+        params={
+            "success_url": "http://127.0.0.1:8000/users/payments/",
+            "line_items": [{"price": price_id, "quantity": 1}],
+            "mode": "payment",
+        },
+        options={"idempotency_key": key} if key else {},
     )
     return session.get("id"), session.get("url")
 
@@ -0,0 +1,38 @@
+from django.core.cache import cache
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from materials.models import Course, Lesson
+from users.models import Payments, User
+from users.permissions import moderator_cache_key
+from users.reports import bump_report_version
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def reset_moderator_cache(sender, instance, action, reverse, pk_set, **kwargs):
+    """Сбрасывает кешированный признак модератора при изменении групп пользователя."""
+    if action not in ("post_add", "post_remove", "pre_clear"):
+        return
+    if not reverse:
+        user_ids = [instance.pk]
+    elif action == "pre_clear":
+        user_ids = list(instance.user_set.values_list("pk", flat=True))
+    else:
+        user_ids = pk_set
+    cache.delete_many([moderator_cache_key(user_id) for user_id in user_ids])
+
+
+@receiver(post_save, sender=Payments)
+@receiver(post_delete, sender=User)
+@receiver(post_delete, sender=Course)
+@receiver(post_delete, sender=Lesson)
+def reset_payments_report_cache(sender, **kwargs):
+    """
+    Сбрасывает закешированные отчеты по платежам при создании или изменении платежа
+    и при удалении пользователя, курса или урока.
+
+    Платежи удаляются только каскадом от этих моделей, поэтому post_delete подключен к ним:
+    приемник post_delete самих Payments отключил бы быстрое каскадное удаление
+    (один DELETE по внешнему ключу) и загружал бы каждый платеж удаляемого пользователя.
+    """
+    bump_report_version()
@@ -0,0 +1,60 @@
+import stripe
+from celery import shared_task
+
+from users.models import Payments
+from users.reports import bump_report_version
+from users.services import create_session_in_stripe, get_stripe_price_id, idempotency_key
+
+# Ошибки сети и лимитов Stripe временные - запрос повторяется, остальные ошибки окончательные
+RETRYABLE_STRIPE_ERRORS = (stripe.APIConnectionError, stripe.RateLimitError)
+
+
+@shared_task(bind=True, max_retries=3)
+def create_checkout_session(self, payment_id):
+    """
+    Создает в Stripe платежную сессию для платежа.
+
+    Продукт и цена создаются только для первого платежа за курс (урок) с данной суммой,
+    дальше используются сохраненные в StripePrice.
+
+    Выполняется вне потока запроса: представление сохраняет платеж со статусом "pending",
+    а задача заполняет session_id и payment_url и переводит платеж в статус "ready".
+    Временные ошибки Stripe повторяются с экспоненциальной задержкой, при окончательной
+    ошибке платеж получает статус "failed".
+
+    Аргументы
+    - payment_id (int): ID платежа.
+
+    Результат
+    - str | None: Статус платежа или None, если платеж не найден или уже обработан.
+    """
+    payment = (
+        Payments.objects.select_related("paid_course", "paid_lesson")
+        .filter(pk=payment_id, status=Payments.PENDING)
+        .first()
+    )
+    if payment is None:
+        return None
+
+    try:
+        price_id = get_stripe_price_id(payment)
+        session_id, payment_url = create_session_in_stripe(price_id, idempotency_key(payment, "session"))
+    except RETRYABLE_STRIPE_ERRORS as error:
+        if self.request.retries < self.max_retries:
+            raise self.retry(exc=error, countdown=2 ** self.request.retries)
+        return set_payment_status(payment_id, Payments.FAILED)
+    except stripe.StripeError:
+        return set_payment_status(payment_id, Payments.FAILED)
+
+    return set_payment_status(payment_id, Payments.READY, session_id=session_id, payment_url=payment_url)
+
+
+def set_payment_status(payment_id, status, **fields):
+    """
+    Записывает статус платежа одним UPDATE и сбрасывает кеш отчетов по платежам.
+
+    update() не отправляет post_save, поэтому версия отчетов увеличивается явно.
+    """
+    Payments.objects.filter(pk=payment_id).update(status=status, **fields)
+    bump_report_version()
+    return status
@@ -0,0 +1,656 @@
+import csv
+import io
+import json
+import threading
+from datetime import timedelta
+from decimal import Decimal
+from importlib import import_module
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+from urllib.parse import parse_qs
+
+from django.contrib.auth.models import Group
+from django.core.cache import cache
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from config.metrics import REGISTRY
+from config.testing import IndexUsageMixin, QueryBudgetMixin, requires_postgresql
+from materials.models import Course, Lesson
+from materials.tasks import deactivate_inactive_users
+from users.models import Payments, StripePrice, User
+from users.permissions import IsModerators, IsOwner
+from users.services import STRIPE_REQUEST_DURATION, get_stripe_price_id
+from users.tasks import create_checkout_session, set_payment_status
+
+
+class PermissionsTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(email="moderator@example.com")
+        self.group = Group.objects.create(name="Moderators")
+
+    def make_request(self):
+        request = RequestFactory().get("/")
+        request.user = self.user
+        return request
+
+    def test_is_moderators_cached(self):
+        """Тестирование кеширования признака модератора в пределах запроса и между запросами"""
+        request = self.make_request()
+        with self.assertNumQueries(1):
+            self.assertFalse(IsModerators().has_permission(request, None))
+            self.assertFalse(IsModerators().has_permission(request, None))
+        with self.assertNumQueries(0):
+            self.assertFalse(IsModerators().has_permission(self.make_request(), None))
+
+    def test_is_moderators_cache_reset_on_groups_change(self):
+        """Тестирование сброса кеша при изменении групп пользователя"""
+        self.assertFalse(IsModerators().has_permission(self.make_request(), None))
+        self.user.groups.add(self.group)
+        self.assertTrue(IsModerators().has_permission(self.make_request(), None))
+        self.group.user_set.clear()
+        self.assertFalse(IsModerators().has_permission(self.make_request(), None))
+
+    def test_is_owner_without_queries(self):
+        """Тестирование проверки владельца без запросов к базе данных"""
+        course = Course.objects.get(pk=Course.objects.create(title="Course", owner=self.user).pk)
+        with self.assertNumQueries(0):
+            self.assertTrue(IsOwner().has_object_permission(self.make_request(), None, course))
+
+
+class UsersQueryBudgetTestCase(QueryBudgetMixin, APITestCase):
+    """
+        Бюджет SQL-запросов для маршрутов users.urls.
+
+        Данные создаются один раз на класс: тысячи пользователей и платежей,
+        чтобы запросы на каждую строку сразу выходили за бюджет.
+        """
+    USERS = 1000
+    PAYMENTS = 2000
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User(email="owner@example.com")
+        cls.user.set_password("password")
+        cls.user.save()
+        users = User.objects.bulk_create(User(email=f"user{i}@example.com") for i in range(cls.USERS))
+        cls.course = Course.objects.create(title="Course", owner=cls.user)
+        cls.lesson = Lesson.objects.create(title="Lesson", course=cls.course, owner=cls.user)
+        Payments.objects.bulk_create(
+            Payments(
+                user=users[i % cls.USERS],
+                paid_course=cls.course if i % 2 else None,
+                paid_lesson=None if i % 2 else cls.lesson,
+                payment_amount=1000,
+                payment_method=Payments.CASH if i % 3 else Payments.TRANSFER_TO_AN_ACCOUNT,
+            )
+            for i in range(cls.PAYMENTS)
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(user=self.user)
+
+    def test_register(self):
+        data = {"email": "new@example.com", "password": "password"}
+        self.assertBudget("post", "/users/register/", 3, data=data, expected_status=status.HTTP_201_CREATED)
+
+    def test_register_ignores_sparse_fields(self):
+        data = {"email": "new@example.com", "password": "password", "city": "Moscow"}
+        response = self.client.post("/users/register/?fields=email", data)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.json()["city"], "Moscow")
+        self.assertTrue(User.objects.get(email="new@example.com").check_password("password"))
+
+    def test_login(self):
+        self.client.force_authenticate(user=None)
+        data = {"email": "owner@example.com", "password": "password"}
+        self.assertBudget("post", "/users/login/", 1, data=data)
+
+    def test_token_refresh(self):
+        refresh = RefreshToken.for_user(self.user)
+        self.assertBudget("post", "/users/token/refresh/", 1, data={"refresh": str(refresh)})
+
+    def test_user_detail(self):
+        response = self.assertBudget("get", f"/users/{self.user.pk}/", 1)
+        self.assertEqual(set(response.json()), {"id", "email", "phone", "city", "avatar"})
+
+    def test_user_detail_sparse_fields(self):
+        response = self.assertBudget("get", f"/users/{self.user.pk}/", 1, data={"fields": "id,email"})
+        self.assertEqual(response.json(), {"id": self.user.pk, "email": self.user.email})
+
+    def test_profiles_list(self):
+        self.user.is_staff = True
+        response = self.assertBudget("get", "/users/profiles/", 2)
+        self.assertEqual(len(response.json()), self.USERS + 1)
+        self.assertEqual(sum(len(profile["payments"]) for profile in response.json()), self.PAYMENTS)
+
+    def test_profiles_list_sparse_fields(self):
+        self.user.is_staff = True
+        response = self.assertBudget("get", "/users/profiles/", 1, data={"fields": "id,email"})
+        self.assertEqual(set(response.json()[0]), {"id", "email"})
+
+    def test_profiles_list_own_profile_only(self):
+        response = self.assertBudget("get", "/users/profiles/", 2)
+        self.assertEqual([profile["id"] for profile in response.json()], [self.user.pk])
+
+    def test_user_update(self):
+        self.assertBudget("patch", f"/users/{self.user.pk}/update/", 2, data={"city": "Moscow"})
+
+    def test_user_delete(self):
+        self.assertBudget(
+            "delete", f"/users/{self.user.pk}/delete/", 19, expected_status=status.HTTP_204_NO_CONTENT
+        )
+
+    def test_payments_list(self):
+        self.assertBudget("get", "/users/payments/", 1, data={"paid_course": self.course.pk})
+
+    @patch("users.views.create_checkout_session")
+    def test_payments_create(self, create_checkout_session):
+        data = {"paid_course": self.course.pk, "payment_amount": 1000, "payment_method": Payments.CASH}
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertBudget(
+                "post", "/users/payments/create/", 2, data=data, expected_status=status.HTTP_201_CREATED
+            )
+        create_checkout_session.delay.assert_called_once()
+
+    def test_payments_detail(self):
+        payment = Payments.objects.create(user=self.user, paid_course=self.course, payment_amount=1000)
+        self.assertBudget("get", f"/users/payments/{payment.pk}/", 1)
+
+
+class UserProfileAccessTestCase(APITestCase):
+    """
+        Доступ к профилям users/profiles/: профиль содержит историю платежей,
+        поэтому пользователь видит только свой профиль, администратор - все.
+        """
+
+    def setUp(self):
+        self.user = User.objects.create(email="user@example.com")
+        self.other = User.objects.create(email="other@example.com")
+        self.admin = User.objects.create(email="admin@example.com", is_staff=True)
+        Payments.objects.create(user=self.other, payment_amount=100)
+
+    def test_user_sees_only_own_profile(self):
+        """Тестирование скрытия чужих профилей от обычного пользователя"""
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get("/users/profiles/")
+        self.assertEqual([profile["id"] for profile in response.json()], [self.user.pk])
+        self.assertEqual(self.client.get(f"/users/profiles/{self.user.pk}/").status_code, status.HTTP_200_OK)
+        self.assertEqual(self.client.get(f"/users/profiles/{self.other.pk}/").status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_staff_sees_all_profiles(self):
+        """Тестирование доступа администратора к профилям и платежам всех пользователей"""
+        self.client.force_authenticate(user=self.admin)
+        response = self.client.get("/users/profiles/")
+        self.assertEqual({profile["id"] for profile in response.json()}, {self.user.pk, self.other.pk, self.admin.pk})
+        response = self.client.get(f"/users/profiles/{self.other.pk}/")
+        self.assertEqual(len(response.json()["payments"]), 1)
+
+    def test_profiles_read_only(self):
+        """Тестирование запрета изменения профилей и доступа без авторизации"""
+        self.client.force_authenticate(user=self.user)
+        response = self.client.patch(f"/users/profiles/{self.user.pk}/", {"city": "Moscow"})
+        self.assertEqual(response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+        self.client.force_authenticate(user=None)
+        self.assertEqual(self.client.get("/users/profiles/").status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class FakeStripeHandler(BaseHTTPRequestHandler):
+    """Фейковый API Stripe: отвечает на создание продукта, цены и платежной сессии."""
+    responses = {
+        "/v1/products": {"id": "prod_test", "object": "product"},
+        "/v1/prices": {"id": "price_test", "object": "price"},
+        "/v1/checkout/sessions": {
+            "id": "cs_test", "object": "checkout.session", "url": "https://checkout.stripe.com/c/cs_test",
+        },
+    }
+    protocol_version = "HTTP/1.1"
+    fail_paths = set()
+    unavailable_once = set()
+    requests = []
+    bodies = []
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.requests.append((self.path, self.headers.get("Idempotency-Key"), self.client_address[1]))
+        self.bodies.append((self.path, parse_qs(body.decode())))
+        if self.path in self.unavailable_once:
+            self.unavailable_once.discard(self.path)
+            code, body = 503, {"error": {"type": "api_error", "message": "Service unavailable"}}
+        elif self.path in self.fail_paths or self.path not in self.responses:
+            code, body = 400, {"error": {"type": "invalid_request_error", "message": "Invalid request"}}
+        else:
+            code, body = 200, self.responses[self.path]
+        payload = json.dumps(body).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class MigrationTestMixin:
+    """Переход базы к состоянию миграций теста и возврат к последним миграциям после теста."""
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        self.migrate(MigrationExecutor(connection).loader.graph.leaf_nodes())
+
+
+class ConsolidatePaymentsMigrationTestCase(MigrationTestMixin, TransactionTestCase):
+    """
+        Перенос записей Payment в Payments миграцией 0008 и ее откат.
+        """
+    migrate_from = [("users", "0007_stripeprice")]
+    migrate_to = [("users", "0008_consolidate_payments")]
+
+    def test_fractional_amount_kept_and_restored(self):
+        """Тестирование переноса суммы с копейками без округления и восстановления Payment при откате"""
+        apps = self.migrate(self.migrate_from)
+        user = apps.get_model("users", "User").objects.create(email="legacy@example.com")
+        legacy = apps.get_model("users", "Payment").objects.create(
+            user=user, amount=Decimal("10.55"), payment_method="transfer"
+        )
+
+        apps = self.migrate(self.migrate_to)
+        payment = apps.get_model("users", "Payments").objects.get()
+        self.assertEqual(payment.payment_amount, Decimal("10.55"))
+        self.assertEqual(payment.payment_method, Payments.TRANSFER_TO_AN_ACCOUNT)
+        self.assertEqual((payment.legacy_payment_id, payment.payment_date), (legacy.pk, legacy.date))
+
+        apps = self.migrate(self.migrate_from)
+        restored = apps.get_model("users", "Payment").objects.get()
+        self.assertEqual(
+            (restored.pk, restored.amount, restored.payment_method, restored.date, restored.user_id),
+            (legacy.pk, Decimal("10.55"), "transfer", legacy.date, user.pk),
+        )
+        self.assertFalse(apps.get_model("users", "Payments").objects.exists())
+
+
+class IdempotencyKeyMigrationTestCase(MigrationTestMixin, TransactionTestCase):
+    """
+        Выдача ключей идемпотентности существующим платежам миграцией 0010.
+        """
+    migrate_from = [("users", "0009_drop_payments_fk_indexes")]
+    migrate_to = [("users", "0010_payments_idempotency_key")]
+
+    def test_keys_filled_in_chunks(self):
+        """Тестирование выдачи уникальных ключей всем платежам при обработке пачками"""
+        apps = self.migrate(self.migrate_from)
+        user = apps.get_model("users", "User").objects.create(email="legacy@example.com")
+        apps.get_model("users", "Payments").objects.bulk_create(
+            apps.get_model("users", "Payments")(user=user, payment_amount=100) for _ in range(5)
+        )
+
+        with patch.object(import_module("users.migrations.0010_payments_idempotency_key"), "BATCH_SIZE", 2):
+            apps = self.migrate(self.migrate_to)
+        keys = list(apps.get_model("users", "Payments").objects.values_list("idempotency_key", flat=True))
+        self.assertEqual(len(keys), 5)
+        self.assertNotIn(None, keys)
+        self.assertEqual(len(set(keys)), 5)
+
+
+class StripeCheckoutTestCase(APITestCase):
+    """
+        Создание платежной сессии задачей Celery против локального фейкового сервера Stripe.
+        """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), FakeStripeHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.stripe_settings = override_settings(
+            STRIPE_API_KEY="sk_test",
+            STRIPE_API_BASE=f"http://127.0.0.1:{cls.server.server_port}",
+            STRIPE_MAX_NETWORK_RETRIES=1,
+        )
+        cls.stripe_settings.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.stripe_settings.disable()
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        FakeStripeHandler.requests.clear()
+        FakeStripeHandler.bodies.clear()
+        self.user = User.objects.create(email="payer@example.com")
+        self.course = Course.objects.create(title="Course", owner=self.user)
+        self.client.force_authenticate(user=self.user)
+
+    def tearDown(self):
+        FakeStripeHandler.fail_paths = set()
+        FakeStripeHandler.unavailable_once = set()
+
+    def request_paths(self):
+        return [path for path, _, _ in FakeStripeHandler.requests]
+
+    def test_payment_created_pending_and_filled_by_task(self):
+        """Тестирование создания платежа без ожидания Stripe и последующего заполнения ссылки"""
+        data = {"paid_course": self.course.pk, "payment_amount": 1000, "payment_method": Payments.CASH}
+        delay = patch.object(
+            create_checkout_session, "delay", side_effect=lambda pk: create_checkout_session.apply(args=(pk,))
+        )
+        with delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post("/users/payments/create/", data)
+                self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+                self.assertEqual(response.json()["status"], Payments.PENDING)
+                self.assertIsNone(response.json()["payment_url"])
+
+        response = self.client.get(f"/users/payments/{response.json()['id']}/")
+        self.assertEqual(response.json()["status"], Payments.READY)
+        self.assertEqual(response.json()["session_id"], "cs_test")
+        self.assertEqual(response.json()["payment_url"], "https://checkout.stripe.com/c/cs_test")
+
+    def test_stripe_error_marks_payment_failed(self):
+        """Тестирование перевода платежа в статус failed при ошибке Stripe"""
+        FakeStripeHandler.fail_paths = {"/v1/prices"}
+        payment = Payments.objects.create(user=self.user, paid_course=self.course, payment_amount=1000)
+        self.assertEqual(create_checkout_session.apply(args=(payment.pk,)).get(), Payments.FAILED)
+        payment.refresh_from_db()
+        self.assertEqual(payment.status, Payments.FAILED)
+        self.assertIsNone(payment.payment_url)
+
+    def test_stripe_price_reused_for_same_course_and_amount(self):
+        """Тестирование создания продукта и цены Stripe один раз для курса и суммы"""
+        for amount in (1000, 1000, 2000):
+            payment = Payments.objects.create(user=self.user, paid_course=self.course, payment_amount=amount)
+            self.assertEqual(create_checkout_session.apply(args=(payment.pk,)).get(), Payments.READY)
+
+        self.assertEqual(self.request_paths().count("/v1/products"), 2)
+        self.assertEqual(self.request_paths().count("/v1/prices"), 2)
+        self.assertEqual(self.request_paths().count("/v1/checkout/sessions"), 3)
+        self.assertEqual(StripePrice.objects.filter(paid_course=self.course).count(), 2)
+
+    def test_fractional_amount_sent_in_minor_units(self):
+        """Тестирование передачи в Stripe суммы с копейками без округления"""
+        payment = Payments.objects.create(user=self.user, paid_course=self.course, payment_amount=Decimal("10.55"))
+        self.assertEqual(create_checkout_session.apply(args=(payment.pk,)).get(), Payments.READY)
+        prices = [body for path, body in FakeStripeHandler.bodies if path == "/v1/prices"]
+        self.assertEqual(prices[0]["unit_amount"], ["1055"])
+        self.assertEqual(StripePrice.objects.get().amount, Decimal("10.55"))
+
+    def test_stripe_price_loaded_from_table_without_cache(self):
+        """Тестирование использования сохраненной цены Stripe при пустом кеше"""
+        StripePrice.objects.create(paid_course=self.course, amount=1000, product_id="prod_old", price_id="price_old")
+        payment = Payments.objects.create(user=self.user, paid_course=self.course, payment_amount=1000)
+        self.assertEqual(get_stripe_price_id(payment), "price_old")
+        with self.assertNumQueries(0):
+            self.assertEqual(get_stripe_price_id(payment), "price_old")
+        self.assertEqual(FakeStripeHandler.requests, [])
+
+    def test_stripe_requests_reuse_connection_and_idempotency_keys(self):
+        """Тестирование переиспользования соединения и ключей идемпотентности по ID платежа"""
+        payment = Payments.objects.create(user=self.user, paid_course=self.course, payment_amount=1000)
+        create_checkout_session.apply(args=(payment.pk,))
+
+        self.assertEqual(
+            [(path, key) for path, key, _ in FakeStripeHandler.requests],
+            [
+                ("/v1/products", f"payment-{payment.idempotency_key}-product"),
+                ("/v1/prices", f"payment-{payment.idempotency_key}-price"),
+                ("/v1/checkout/sessions", f"payment-{payment.idempotency_key}-session"),
+            ],
+        )
+        self.assertEqual(len({port for _, _, port in FakeStripeHandler.requests}), 1)
+
+    @patch("stripe._http_client.HTTPClient._sleep_time_seconds", return_value=0)
+    def test_stripe_server_error_retried_with_same_key(self, sleep_time):
+        """Тестирование повтора запроса после ошибки сервера Stripe с тем же ключом идемпотентности"""
+        FakeStripeHandler.unavailable_once = {"/v1/checkout/sessions"}
+        payment = Payments.objects.create(user=self.user, paid_course=self.course, payment_amount=1000)
+        count = STRIPE_REQUEST_DURATION.get_count(method="POST", endpoint="/v1/checkout/sessions", status=503)
+
+        self.assertEqual(create_checkout_session.apply(args=(payment.pk,)).get(), Payments.READY)
+        sessions = [key for path, key, _ in FakeStripeHandler.requests if path == "/v1/checkout/sessions"]
+        self.assertEqual(sessions, [f"payment-{payment.idempotency_key}-session"] * 2)
+        self.assertEqual(
+            STRIPE_REQUEST_DURATION.get_count(method="POST", endpoint="/v1/checkout/sessions", status=503), count + 1
+        )
+        self.assertIn(
+            'stripe_request_duration_seconds_count{endpoint="/v1/checkout/sessions",method="POST"', REGISTRY.render()
+        )
+
+    def test_processed_payment_is_skipped(self):
+        """Тестирование повторного запуска задачи для уже обработанного платежа"""
+        payment = Payments.objects.create(
+            user=self.user, paid_course=self.course, payment_amount=1000, status=Payments.READY
+        )
+        self.assertIsNone(create_checkout_session.apply(args=(payment.pk,)).get())
+
+    def test_other_user_payment_not_found(self):
+        """Тестирование недоступности чужого платежа"""
+        other = User.objects.create(email="other@example.com")
+        payment = Payments.objects.create(user=other, paid_course=self.course, payment_amount=1000)
+        response = self.client.get(f"/users/payments/{payment.pk}/")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+@requires_postgresql
+class IndexUsageTestCase(IndexUsageMixin, APITestCase):
+    """
+        Проверка, что запросы эндпоинтов платежей и задачи деактивации используют индексы PostgreSQL.
+        """
+    USERS = 200
+    PAYMENTS = 1000
+
+    @classmethod
+    def setUpTestData(cls):
+        users = User.objects.bulk_create(
+            User(email=f"user{i}@example.com", is_active=bool(i % 2)) for i in range(cls.USERS)
+        )
+        cls.user = users[1]
+        cls.course = Course.objects.create(title="Course", owner=users[0])
+        cls.lesson = Lesson.objects.create(title="Lesson", course=cls.course, owner=users[0])
+        Payments.objects.bulk_create(
+            Payments(
+                user=users[i % cls.USERS],
+                paid_course=cls.course if i % 2 else None,
+                paid_lesson=None if i % 2 else cls.lesson,
+                payment_amount=1000,
+                payment_method=Payments.CASH if i % 3 else Payments.TRANSFER_TO_AN_ACCOUNT,
+            )
+            for i in range(cls.PAYMENTS)
+        )
+        cls.analyze(User, Payments)
+
+    def setUp(self):
+        self.client.force_authenticate(user=self.user)
+
+    def get_payments_sql(self, url, params):
+        return self.capture_query('FROM "users_payments"', self.client.get, url, params)
+
+    def test_profile_payments_use_user_date_index(self):
+        """Тестирование выборки платежей профиля с сортировкой по дате"""
+        sql = self.get_payments_sql("/users/profiles/", {})
+        self.assertUsesIndex(sql, "payments_user_date_idx")
+
+    def test_payments_by_course_use_course_date_index(self):
+        """Тестирование фильтрации платежей по курсу с сортировкой по дате"""
+        sql = self.get_payments_sql("/users/payments/", {"paid_course": self.course.pk, "ordering": "payment_date"})
+        self.assertUsesIndex(sql, "payments_course_date_idx")
+
+    def test_payments_by_lesson_use_lesson_date_index(self):
+        """Тестирование фильтрации платежей по уроку с сортировкой по дате"""
+        sql = self.get_payments_sql("/users/payments/", {"paid_lesson": self.lesson.pk, "ordering": "payment_date"})
+        self.assertUsesIndex(sql, "payments_lesson_date_idx")
+
+    def test_payments_by_method_use_method_date_index(self):
+        """Тестирование фильтрации платежей по способу оплаты с сортировкой по дате"""
+        sql = self.get_payments_sql("/users/payments/", {"payment_method": Payments.CASH, "ordering": "-payment_date"})
+        self.assertUsesIndex(sql, "payments_method_date_idx")
+
+    def test_inactive_users_lookup_uses_partial_index(self):
+        """Тестирование выборки давно не заходивших активных пользователей задачей деактивации"""
+        sql = self.capture_query('"users_user"."last_login" <', deactivate_inactive_users.apply)
+        self.assertUsesIndex(sql, "user_active_last_login_idx")
+
+
+@override_settings(PAYMENTS_EXPORT_CHUNK_SIZE=7)
+class PaymentsExportTestCase(APITestCase):
+    """
+        Потоковая выгрузка журнала платежей в CSV и NDJSON.
+        """
+    PAYMENTS = 30
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create(email="admin@example.com", is_staff=True)
+        cls.user = User.objects.create(email="user@example.com")
+        cls.course = Course.objects.create(title="Course", owner=cls.admin)
+        Payments.objects.bulk_create(
+            Payments(
+                user=cls.user,
+                paid_course=cls.course,
+                payment_amount=100 + i,
+                payment_method=Payments.CASH if i % 3 else Payments.TRANSFER_TO_AN_ACCOUNT,
+            )
+            for i in range(cls.PAYMENTS)
+        )
+
+    def setUp(self):
+        self.client.force_authenticate(user=self.admin)
+
+    def test_export_csv(self):
+        """Тестирование потоковой выгрузки платежей в CSV"""
+        response = self.client.get("/users/payments/export/csv/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Disposition"], 'attachment; filename="payments.csv"')
+        with self.assertNumQueries(1):
+            content = b"".join(response.streaming_content).decode()
+
+        rows = list(csv.reader(io.StringIO(content)))
+        self.assertEqual(rows[0][:3], ["id", "user_id", "payment_date"])
+        self.assertEqual(len(rows), self.PAYMENTS + 1)
+        self.assertEqual([Decimal(row[5]) for row in rows[1:]], list(range(100, 100 + self.PAYMENTS)))
+
+    def test_export_ndjson_filtered(self):
+        """Тестирование потоковой выгрузки платежей в NDJSON с фильтром по способу оплаты"""
+        params = {"payment_method": Payments.TRANSFER_TO_AN_ACCOUNT}
+        response = self.client.get("/users/payments/export/ndjson/", params)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        rows = [json.loads(line) for line in b"".join(response.streaming_content).decode().splitlines()]
+        self.assertEqual(len(rows), 10)
+        self.assertTrue(all(row["payment_method"] == Payments.TRANSFER_TO_AN_ACCOUNT for row in rows))
+        self.assertEqual(rows[0]["user_id"], self.user.pk)
+
+    def test_export_requires_admin(self):
+        """Тестирование запрета выгрузки для обычного пользователя"""
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get("/users/payments/export/csv/")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_export_unknown_format(self):
+        """Тестирование неизвестного формата выгрузки"""
+        response = self.client.get("/users/payments/export/xml/")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class PaymentsReportTestCase(APITestCase):
+    """
+        Отчет по платежам с группировкой в БД и кешированием.
+        """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create(email="admin@example.com", is_staff=True)
+        cls.course = Course.objects.create(title="Course", owner=cls.admin)
+        cls.other_course = Course.objects.create(title="Other", owner=cls.admin)
+        for course, amount, method in (
+            (cls.course, 100, Payments.CASH),
+            (cls.course, 300, Payments.TRANSFER_TO_AN_ACCOUNT),
+            (cls.other_course, 50, Payments.CASH),
+        ):
+            Payments.objects.create(user=cls.admin, paid_course=course, payment_amount=amount, payment_method=method)
+        Payments.objects.filter(payment_amount=300).update(payment_date=timezone.now() - timedelta(days=40))
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(user=self.admin)
+
+    def test_report_by_course(self):
+        """Тестирование суммы, количества и среднего платежа по курсам"""
+        response = self.client.get("/users/payments/report/", {"group_by": "course"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["results"], [
+            {"key": self.course.pk, "total": 400, "count": 2, "average": 200.0},
+            {"key": self.other_course.pk, "total": 50, "count": 1, "average": 50.0},
+        ])
+
+    def test_report_by_method_filtered(self):
+        """Тестирование отчета по способам оплаты с фильтром по курсу"""
+        response = self.client.get("/users/payments/report/", {"group_by": "method", "paid_course": self.course.pk})
+        self.assertEqual(
+            [(row["key"], row["total"]) for row in response.json()["results"]],
+            [(Payments.CASH, 100), (Payments.TRANSFER_TO_AN_ACCOUNT, 300)],
+        )
+
+    def test_report_by_month(self):
+        """Тестирование группировки платежей по месяцам"""
+        response = self.client.get("/users/payments/report/", {"group_by": "month"})
+        results = response.json()["results"]
+        self.assertEqual(len(results), 2 if timezone.now().month != (timezone.now() - timedelta(days=40)).month else 1)
+        self.assertEqual(sum(row["count"] for row in results), 3)
+        self.assertTrue(all(row["key"].endswith("T00:00:00Z") for row in results))
+
+    def test_report_cached_until_new_payment(self):
+        """Тестирование кеширования отчета и его сброса при новом платеже"""
+        self.client.get("/users/payments/report/")
+        with self.assertNumQueries(0):
+            response = self.client.get("/users/payments/report/")
+        self.assertEqual(response.json()["results"][0]["total"], 400)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Payments.objects.create(user=self.admin, paid_course=self.course, payment_amount=600)
+        response = self.client.get("/users/payments/report/")
+        self.assertEqual(response.json()["results"][0]["total"], 1000)
+
+    def test_report_reset_on_cascade_delete(self):
+        """Тестирование сброса отчета при каскадном удалении платежей вместе с курсом"""
+        self.client.get("/users/payments/report/")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.other_course.delete()
+        response = self.client.get("/users/payments/report/")
+        self.assertEqual([row["key"] for row in response.json()["results"]], [self.course.pk])
+
+    def test_report_reset_after_checkout_status_update(self):
+        """Тестирование сброса отчета после смены статуса платежа задачей (update без post_save)"""
+        self.client.get("/users/payments/report/", {"group_by": "course", "status": Payments.FAILED})
+        payment = Payments.objects.filter(paid_course=self.other_course).get()
+        with self.captureOnCommitCallbacks(execute=True):
+            set_payment_status(payment.pk, Payments.FAILED)
+        response = self.client.get("/users/payments/report/", {"group_by": "course", "status": Payments.FAILED})
+        self.assertEqual([row["key"] for row in response.json()["results"]], [self.other_course.pk])
+
+    def test_report_invalid_group_by(self):
+        """Тестирование неизвестной группировки"""
+        response = self.client.get("/users/payments/report/", {"group_by": "year"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_report_requires_admin(self):
+        """Тестирование запрета отчета для обычного пользователя"""
+        self.client.force_authenticate(user=User.objects.create(email="user@example.com"))
+        response = self.client.get("/users/payments/report/")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
@@ -1,4 +1,5 @@
 from django.urls import path
+from rest_framework.routers import DefaultRouter
 from rest_framework.permissions import AllowAny
 
 from .apps import UsersConfig
@@ -8,10 +9,14 @@ from rest_framework_simplejwt.views import (
 )
 
 from .views import (UserCreateAPIView, UserDestroyAPIView, UserUpdateAPIView, UserRetrieveAPIView, PaymentsListApiView,
-                    PaymentsCreateAPIView)
+                    PaymentsCreateAPIView, PaymentsRetrieveAPIView, PaymentsExportAPIView,
+                    PaymentsReportAPIView, UserProfileViewSet)
 
 app_name = UsersConfig.name
 
+router = DefaultRouter()
+router.register(r"profiles", UserProfileViewSet, basename="profiles")
+
 urlpatterns = [
     path('register/', UserCreateAPIView.as_view(), name='register'),
     path('login/', TokenObtainPairView.as_view(permission_classes=(AllowAny,)), name='token_obtain_pair'),
@@ -20,5 +25,10 @@ urlpatterns = [
     path("<int:pk>/update/", UserUpdateAPIView.as_view(), name="user-update"),
     path("<int:pk>/", UserRetrieveAPIView.as_view(), name="user-detail"),
     path("payments/", PaymentsListApiView.as_view(), name="payments-list"),
+    path("payments/report/", PaymentsReportAPIView.as_view(), name="payments-report"),
     path("payments/create/", PaymentsCreateAPIView.as_view(), name="create-payments"),
+    path("payments/<int:pk>/", PaymentsRetrieveAPIView.as_view(), name="payments-detail"),
+    path("payments/export/<str:fmt>/", PaymentsExportAPIView.as_view(), name="payments-export"),
 ]
+
+urlpatterns += router.urls
@@ -1,29 +1,55 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Prefetch
+from django.http import Http404, StreamingHttpResponse
 from rest_framework import viewsets, generics
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import OrderingFilter
-from rest_framework.permissions import AllowAny
-
-from .models import Payment, User, Payments
-from .serializers import PaymentSerializer, UserProfileSerializer
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import AllowAny, IsAdminUser
+from rest_framework.response import Response
+
+from .exports import CONTENT_TYPES, export_payments
+from .models import User, Payments
+from .reports import GROUPINGS, get_report
+from .serializers import PaymentsSerializer, ProfilePaymentSerializer, UserProfileSerializer
 from .filters import PaymentFilter
 from rest_framework.generics import CreateAPIView
 from users.serializers import UserSerializer
-from .services import create_product_in_stripe, create_price_in_stripe, create_session_in_stripe
+from .tasks import create_checkout_session
 
 
 class PaymentViewSet(viewsets.ModelViewSet):
-    queryset = Payment.objects.all()
-    serializer_class = PaymentSerializer
-    filter_backends = [DjangoFilterBackend]
+    queryset = Payments.objects.all()
+    serializer_class = PaymentsSerializer
+    filter_backends = [DjangoFilterBackend, OrderingFilter]
     filterset_class = PaymentFilter
-    ordering_fields = ['date']
-    ordering = ['date']  # Сортировка по умолчанию
+    ordering_fields = ['payment_date']
+    ordering = ['payment_date']  # Сортировка по умолчанию
 
 
-class UserProfileViewSet(viewsets.ModelViewSet):
-    queryset = User.objects.all()
+class UserProfileViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+        Профили пользователей с платежами (только чтение).
+
+        Загружаются только поля, попавшие в ответ (с учетом ?fields=), а платежи
+        предзагружаются одним запросом, поэтому число запросов не зависит от числа профилей.
+        Профиль содержит историю платежей, поэтому администратор видит все профили,
+        остальные пользователи - только свой. Изменение пользователя выполняется через
+        users/<pk>/update/, поэтому набор профилей только для чтения.
+        """
     serializer_class = UserProfileSerializer
 
+    def get_queryset(self):
+        fields = self.get_serializer().fields
+        queryset = User.objects.only(*(name for name in fields if name != "payments")).order_by("pk")
+        if "payments" in fields:
+            payments = Payments.objects.only(*ProfilePaymentSerializer.Meta.fields, "user").order_by("-payment_date")
+            queryset = queryset.prefetch_related(Prefetch("payments", queryset=payments))
+        if not self.request.user.is_staff:
+            queryset = queryset.filter(pk=self.request.user.pk)
+        return queryset
+
 
 class UserCreateAPIView(CreateAPIView):
     serializer_class = UserSerializer
@@ -38,7 +64,9 @@ class UserCreateAPIView(CreateAPIView):
 
 class UserRetrieveAPIView(generics.RetrieveAPIView):
     serializer_class = UserSerializer
-    queryset = User.objects.all()
+
+    def get_queryset(self):
+        return User.objects.only(*self.get_serializer().fields)
 
 
 class UserUpdateAPIView(generics.UpdateAPIView):
@@ -63,20 +91,39 @@ class PaymentsListApiView(generics.ListAPIView):
            serializer_class (PaymentsSerializer): Сериализатор для вывода платежей;
            queryset (QuerySet): Все объекты модели Payments;
            filter_backends (list): Список фильтров для поиска и сортировки;
-           filterset_fields (tuple): Поля, по которым можно фильтровать;
+           filterset_class (PaymentFilter): Фильтр по курсу, уроку, способу оплаты и периоду;
            ordering_fields (tuple): Поля, по которым можно сортировать.
        """
-    serializer_class = PaymentSerializer
+    serializer_class = PaymentsSerializer
     queryset = Payments.objects.all()
     filter_backends = [DjangoFilterBackend, OrderingFilter]
-    filterset_fields = (
-        "paid_course",
-        "paid_lesson",
-        "payment_method",
-    )
+    filterset_class = PaymentFilter
     ordering_fields = ("payment_date",)
 
 
+class PaymentsReportAPIView(generics.GenericAPIView):
+    """
+        Отчет по платежам: сумма, количество и средний платеж по группам.
+
+        Агрегаты считаются в БД одним GROUP BY-запросом; поддерживаются те же фильтры,
+        что и у списка платежей. Результат кешируется до следующего изменения платежей.
+
+        Параметры запроса:
+            group_by (str): course, lesson, method, day или month (по умолчанию course).
+        """
+    queryset = Payments.objects.all()
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = PaymentFilter
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request):
+        group_by = request.query_params.get("group_by", "course")
+        if group_by not in GROUPINGS:
+            raise ValidationError({"group_by": [f"Допустимые значения: {', '.join(GROUPINGS)}."]})
+        queryset = self.filter_queryset(self.get_queryset())
+        return Response({"group_by": group_by, "results": get_report(queryset, group_by, request.query_params)})
+
+
 class PaymentsCreateAPIView(generics.CreateAPIView):
     """
         Представление для создания нового платежа.
@@ -86,11 +133,14 @@ class PaymentsCreateAPIView(generics.CreateAPIView):
             - Привязывает пользователя к платежу автоматически;
             - Интегрируется с платежной системой Stripe (создание продукта, цены и платежной сессии).
 
+        Обращения к Stripe выполняются задачей Celery после фиксации транзакции: ответ возвращается
+        сразу со статусом "pending", а ссылку на оплату клиент получает из PaymentsRetrieveAPIView.
+
         Атрибуты:
             serializer_class (PaymentsSerializer): Сериализатор для создания платежа;
             queryset (QuerySet): Все объекты модели Payments.
         """
-    serializer_class = PaymentSerializer
+    serializer_class = PaymentsSerializer
     queryset = Payments.objects.all()
 
     def perform_create(self, serializer):
@@ -98,20 +148,50 @@ class PaymentsCreateAPIView(generics.CreateAPIView):
             Дополнительная логика при создании платежа.
 
             Действия:
-                1. Сохраняет платеж с помощью сериализатора, связывает с текущим пользователем.
-                2. Создаёт продукт в Stripe по данным платежа.
-                3. Создаёт цену для этого продукта в Stripe.
-                4. Запускает платёжную сессию в Stripe, получает ID сессии и ссылку на оплату.
-                5. Сохраняет session_id и payment_url в объекте платежа.
+                1. Сохраняет платеж со статусом "pending", связывает с текущим пользователем.
+                2. После фиксации транзакции ставит в очередь задачу create_checkout_session,
+                   которая создает продукт, цену и платежную сессию в Stripe.
 
             Аргументы:
                 serializer (PaymentsSerializer): Сериализатор для сохранения данных платежа.
             """
-        payment = serializer.save()
-        payment.user = self.request.user
-        stripe_product_id = create_product_in_stripe(payment)
-        price = create_price_in_stripe(stripe_product_id, payment.payment_amount)
-        session_id, payment_link = create_session_in_stripe(price)
-        payment.session_id = session_id
-        payment.payment_url = payment_link
-        payment.save()
+        payment = serializer.save(user=self.request.user)
+        transaction.on_commit(lambda: create_checkout_session.delay(payment.pk))
+
+
+class PaymentsRetrieveAPIView(generics.RetrieveAPIView):
+    """
+        Представление для получения платежа текущего пользователя.
+
+        Клиент опрашивает его после создания платежа, пока статус не станет
+        "ready" (ссылка на оплату в payment_url) или "failed".
+        """
+    serializer_class = PaymentsSerializer
+
+    def get_queryset(self):
+        return Payments.objects.filter(user=self.request.user)
+
+
+class PaymentsExportAPIView(generics.GenericAPIView):
+    """
+        Потоковая выгрузка журнала платежей в CSV или NDJSON для финансовой отчетности.
+
+        Поддерживает те же фильтры, что и список платежей. Строки читаются из БД
+        частями (PAYMENTS_EXPORT_CHUNK_SIZE) и сразу отправляются клиенту, поэтому
+        выгрузка миллионов строк не требует памяти под весь результат.
+        Доступна только администраторам.
+        """
+    queryset = Payments.objects.all()
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = PaymentFilter
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request, fmt):
+        if fmt not in CONTENT_TYPES:
+            raise Http404
+        queryset = self.filter_queryset(self.get_queryset())
+        response = StreamingHttpResponse(
+            export_payments(queryset, fmt, settings.PAYMENTS_EXPORT_CHUNK_SIZE), content_type=CONTENT_TYPES[fmt]
+        )
+        response["Content-Disposition"] = f'attachment; filename="payments.{fmt}"'
+        return response